@@ -1,13 +1,23 @@
-import os
+import time
+
+# Mark the moment the package starts importing, used to report startup cost
+_IMPORT_STARTED = time.perf_counter()
+
 from flask import Flask
 
 from config import Config
-from .services.db import init_db
+from .cli import register_cli
+from .encoding import register_json
 from .routes.dashboard_routes import bp as dashboard_bp
+from .services.binance.analytics_store import preload_analytics
 
 def create_app():
     """
     Application factory for the crypto portfolio app.
+
+    Startup is kept cheap: services, Binance clients and heavy libraries
+    (pandas) are only loaded on first use, and the database schema is
+    managed by the ``flask init-db`` migration step instead of at boot.
     """
     # Initialize Flask app
     app = Flask(__name__, instance_relative_config=False)
@@ -15,10 +25,21 @@ def create_app():
     # Load configuration from Config class
     app.config.from_object(Config)
 
-    # Initialize database (create tables if they don't exist)
-    init_db()
+    # JSON responses: orjson fast path, NumPy / pandas support, compression
+    register_json(app)
 
     # Register blueprints
     app.register_blueprint(dashboard_bp, url_prefix="")
 
-    return app
\ No newline at end of file
+    # Register CLI commands (init-db, import-time, ...)
+    register_cli(app)
+
+    # Memory-map the on-disk analytics cache in the background (no-op if empty)
+    preload_analytics(app.logger)
+
+    # Report how long import + app construction took for this process
+    startup_ms = (time.perf_counter() - _IMPORT_STARTED) * 1000
+    app.config["STARTUP_TIME_MS"] = startup_ms
+    app.logger.info("Application ready in %.1f ms", startup_ms)
+
+    return app
@@ -0,0 +1,201 @@
+# app/cli.py
+
+import json
+import os
+import re
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import click
+
+
+def _parse_years(value: str) -> list:
+    """
+    Years of --years: "2023", "2021-2024" or "2021,2023" (combinable).
+    """
+    years = set()
+    for part in value.split(","):
+        part = part.strip()
+        match = re.fullmatch(r"(\d{4})(?:-(\d{4}))?", part)
+        if not match:
+            raise click.BadParameter(f"invalid year or range: {part!r}", param_hint="--years")
+        first, last = int(match.group(1)), int(match.group(2) or match.group(1))
+        if last < first:
+            raise click.BadParameter(f"empty range: {part!r}", param_hint="--years")
+        years.update(range(first, last + 1))
+    return sorted(years)
+
+
+def _parse_date(value: str) -> int:
+    """
+    Timestamp (ms, UTC) of a --since date (YYYY-MM-DD).
+    """
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise click.BadParameter(f"expected YYYY-MM-DD, got {value!r}", param_hint="--since")
+    return int(day.timestamp() * 1000)
+
+
+def _account_names(account: str) -> list:
+    from .services.accounts import get_account_registry
+
+    registry = get_account_registry()
+    if account:
+        try:
+            return [registry.get(account).name]
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--account")
+    return [a.name for a in registry.all()]
+
+
+def _processes_option(fn):
+    from .services.jobs import JOB_PROCESSES
+
+    return click.option("--processes", "-p", default=JOB_PROCESSES, show_default=True, type=click.IntRange(1),
+                        help="Worker processes (1: in process).")(fn)
+
+
+def _restart_option(fn):
+    return click.option("--restart", is_flag=True,
+                        help="Ignore the progress of an unfinished previous run.")(fn)
+
+
+def register_cli(app):
+    """
+    Attach the maintenance commands to the Flask CLI (``flask <command>``).
+    Command bodies import their dependencies lazily so that ``flask --help``
+    and unrelated commands stay cheap.
+    """
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create or upgrade the database schema (migration step)."""
+        from .services.db import migrate
+
+        added = migrate()
+        for column in added:
+            click.echo(f"added column {column}")
+        click.echo("Database schema is up to date.")
+
+    @app.cli.command("import-time")
+    @click.option("--top", default=15, show_default=True,
+                  help="Number of slowest modules to display.")
+    def import_time_command(top):
+        """Measure the cold import cost of the application."""
+        # Run in a fresh interpreter so nothing is already cached in sys.modules
+        code = "from app import create_app; create_app()"
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            click.echo(proc.stderr, err=True)
+            raise SystemExit(proc.returncode)
+
+        # Lines look like: "import time:   self [us] |   cumulative | module"
+        rows = []
+        for line in proc.stderr.splitlines():
+            match = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                rows.append((int(cumulative_us), int(self_us), len(indent), module))
+
+        total_us = sum(r[0] for r in rows if r[2] == 1)
+        click.echo(f"Total import time: {total_us / 1000:.1f} ms")
+        click.echo(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for cumulative_us, self_us, _, module in sorted(rows, reverse=True)[:top]:
+            click.echo(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {module}")
+
+    # Offline jobs, for cron: progress is saved after each task so that an
+    # interrupted or partly failed run is resumed by the next one (except
+    # sync, incremental by itself). Exit codes: 0 done, 1 some tasks failed, 75 Binance unavailable or already
+    # running (retry later), 130 interrupted.
+
+    @app.cli.command("sync")
+    @click.option("--account", help="Only this account (default: all accounts).")
+    @_processes_option
+    def sync_command(account, processes):
+        """Download new deposits, withdrawals and trades, one process per account."""
+        from .services.jobs import run_job, sync_account
+
+        names = _account_names(account)
+        raise SystemExit(run_job(
+            "sync", names, sync_account, processes=processes, unit="rows", echo=click.echo,
+            # every account is synced on each run: sync resumes from last_sync
+            resumable=False,
+        ))
+
+    @app.cli.command("backfill-prices")
+    @click.option("--symbol", "symbols", multiple=True,
+                  help="Market to backfill, repeatable (default: every market valuing the ledger).")
+    @click.option("--interval", default="1d", show_default=True, help="Kline interval.")
+    @click.option("--since", help="First day to fetch, YYYY-MM-DD (default: first movement of each asset).")
+    @_processes_option
+    @_restart_option
+    def backfill_prices_command(symbols, interval, since, processes, restart):
+        """Download the missing candles of each market, split by symbol across processes."""
+        from .services.jobs import backfill_symbol, backfill_symbols, run_job
+        from .services.price_history import INTERVAL_MS
+
+        if interval not in INTERVAL_MS:
+            raise click.BadParameter(f"expected one of {', '.join(INTERVAL_MS)}", param_hint="--interval")
+        since = _parse_date(since) if since else None
+        starts = {s.upper(): since or 0 for s in symbols} if symbols else backfill_symbols(since)
+        raise SystemExit(run_job(
+            "backfill-prices", sorted(starts), backfill_symbol, args=(interval, starts),
+            params={"interval": interval, "since": since},
+            processes=processes, restart=restart, unit="candles", echo=click.echo,
+        ))
+
+    @app.cli.command("recompute-snapshots")
+    @click.option("--account", help="Only this account (default: all accounts).")
+    @click.option("--full", is_flag=True, help="Rebuild the invested capital aggregates from scratch.")
+    @_processes_option
+    @_restart_option
+    def recompute_snapshots_command(account, full, processes, restart):
+        """Update lot books, invested capital and the analytics cache, one process per account."""
+        from .services.jobs import recompute_account, run_job
+
+        names = _account_names(account)
+        raise SystemExit(run_job(
+            "recompute-snapshots", names, recompute_account, args=(full,), params={"full": full},
+            processes=processes, restart=restart, unit="points", echo=click.echo,
+        ))
+
+    @app.cli.command("tax-report")
+    @click.option("--years", required=True, help='Fiscal years: "2023", "2021-2024" or "2021,2023".')
+    @click.option("--account", help="Only this account (default: all accounts, netted).")
+    @click.option("--currency", help="Report currency (default: TAX_CURRENCY).")
+    @click.option("--output", "-o", type=click.Path(file_okay=False),
+                  help="Write one <year>.json report per year in this directory.")
+    @_processes_option
+    @_restart_option
+    def tax_report_command(years, account, currency, output, processes, restart):
+        """Generate the tax reports of several years, split by year across processes."""
+        from .services.jobs import run_job, tax_report
+
+        years = [str(year) for year in _parse_years(years)]
+        if account:
+            _account_names(account)
+        currency = currency.upper() if currency else None
+        reports = {}
+        code = run_job(
+            "tax-report", years, tax_report, args=(account, currency),
+            params={"account": account, "currency": currency},
+            processes=processes, restart=restart, unit="reports", echo=click.echo, results=reports,
+        )
+        for year in years:
+            if year not in reports:
+                continue
+            report = reports[year]
+            if output:
+                os.makedirs(output, exist_ok=True)
+                with open(os.path.join(output, f"{year}.json"), "w", encoding="utf-8") as fh:
+                    json.dump(report, fh, indent=2, default=str)
+            else:
+                click.echo(f"{year}: net gain {report['net_gain']:,.2f} {report['currency']},"
+                           f" tax due {report['tax_due']:,.2f} {report['currency']}")
+        raise SystemExit(code)
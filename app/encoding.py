@@ -0,0 +1,235 @@
+# app/encoding.py
+
+import gzip
+import os
+import sys
+from typing import Any, Optional
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# Responses of /api/* routes larger than this (bytes) are compressed when
+# the client accepts it (brotli if installed, else gzip); 0 disables it
+JSON_COMPRESS_MIN_SIZE = int(os.getenv("JSON_COMPRESS_MIN_SIZE", 1024))
+# Fast levels: the payloads are generated per request, not stored
+JSON_GZIP_LEVEL = int(os.getenv("JSON_GZIP_LEVEL", 5))
+JSON_BROTLI_QUALITY = int(os.getenv("JSON_BROTLI_QUALITY", 4))
+
+_MISSING = object()
+_orjson_module: Any = _MISSING
+_brotli_module: Any = _MISSING
+
+
+def _orjson():
+    """
+    The orjson module, or None if it is not installed (imported on first use).
+    """
+    global _orjson_module
+    if _orjson_module is _MISSING:
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        _orjson_module = orjson
+    return _orjson_module
+
+
+def _brotli():
+    """
+    The brotli module, or None if it is not installed (imported on first use).
+    """
+    global _brotli_module
+    if _brotli_module is _MISSING:
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        _brotli_module = brotli
+    return _brotli_module
+
+
+def _nullable(values: list) -> list:
+    # NaN / inf are not valid JSON
+    return [None if isinstance(v, float) and (v != v or v in (float("inf"), float("-inf"))) else v for v in values]
+
+
+def _array(values) -> list:
+    """
+    JSON list of a 1-D NumPy array or pandas array: datetimes as epoch ms,
+    missing / non-finite numbers as null.
+    """
+    import numpy as np
+
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        ms = values.astype("datetime64[ms]")
+        missing = np.isnat(ms)
+        ms = ms.astype("int64").tolist()
+        return [None if m else t for t, m in zip(ms, missing)] if missing.any() else ms
+    if values.dtype.kind == "f":
+        finite = np.isfinite(values)
+        if finite.all():
+            return values.tolist()
+        return [v if ok else None for v, ok in zip(values.tolist(), finite)]
+    return _nullable(values.tolist())
+
+
+def _index(index) -> dict:
+    """
+    Index of a pandas object: {"t": [epoch ms]} for a DatetimeIndex (same
+    shape as the chart series), {"index": [...]} otherwise.
+    """
+    import pandas as pd
+
+    if isinstance(index, pd.DatetimeIndex):
+        from .services.utils.utils import to_timestamps
+        return {"t": to_timestamps(index).tolist()}
+    return {"index": _array(index)}
+
+
+def encode_columnar(o: Any) -> Any:
+    """
+    JSON-ready form of NumPy / pandas objects, column-oriented:
+    - ndarray: list (nested for N-D arrays), NumPy scalar: Python scalar
+    - Series: {"t" | "index": [...], "v": [...]}
+    - DataFrame: {"t" | "index": [...], "columns": {name: [...]}}
+    Returns the object unchanged if it is none of these.
+    """
+    # Without numpy loaded, o cannot be a NumPy / pandas object
+    if "numpy" not in sys.modules:
+        return o
+    import numpy as np
+
+    if isinstance(o, np.ndarray):
+        return _array(o) if o.ndim == 1 else [encode_columnar(row) for row in o]
+    if isinstance(o, np.generic):
+        return _nullable([o.item()])[0]
+    if "pandas" in sys.modules:
+        import pandas as pd
+
+        if isinstance(o, pd.Series):
+            return {**_index(o.index), "v": _array(o.to_numpy())}
+        if isinstance(o, pd.DataFrame):
+            return {
+                **_index(o.index),
+                "columns": {str(name): _array(o[name].to_numpy()) for name in o.columns},
+            }
+    return o
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider used by jsonify() in every route:
+    - orjson fast path when installed (serializes straight to bytes), the
+      standard library encoder otherwise;
+    - NumPy arrays and pandas Series / DataFrames encoded as columnar
+      arrays (see encode_columnar) instead of failing;
+    - other types as with Flask's default provider (dates as HTTP dates,
+      Decimal as strings, dataclasses as dicts).
+    """
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        encoded = encode_columnar(o)
+        if encoded is not o:
+            return encoded
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_options(self, indent: bool = False) -> int:
+        orjson = _orjson()
+        # NumPy objects go through default() (one C-level tolist() per array)
+        # rather than OPT_SERIALIZE_NUMPY: orjson builds predating NumPy 2
+        # crash on some of its dtypes (datetime64)
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        """
+        UTF-8 JSON of obj (pretty-printed if indent).
+        """
+        orjson = _orjson()
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+            except TypeError:
+                # e.g. int beyond 64 bits or a non-str key orjson cannot
+                # serialize: the standard encoder handles them
+                pass
+        return super().dumps(obj, indent=2 if indent else None).encode()
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs or _orjson() is None:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        orjson = _orjson()
+        if kwargs or orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def compress_response(response, min_size: Optional[int] = None):
+    """
+    Compress a buffered response body with the best encoding the client
+    accepts (br, then gzip) if it is at least min_size bytes
+    (default JSON_COMPRESS_MIN_SIZE). Streamed responses (SSE) and bodies
+    already encoded are left alone.
+    """
+    min_size = JSON_COMPRESS_MIN_SIZE if min_size is None else min_size
+    if (
+        min_size <= 0
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or not 200 <= response.status_code < 300
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    offered = ["br", "gzip"] if _brotli() is not None else ["gzip"]
+    encoding = request.accept_encodings.best_match(offered)
+    if encoding == "br":
+        compressed = _brotli().compress(body, quality=JSON_BROTLI_QUALITY)
+    elif encoding == "gzip":
+        compressed = gzip.compress(body, compresslevel=JSON_GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def register_json(app) -> None:
+    """
+    Serialize responses with FastJSONProvider and compress large /api/*
+    responses.
+    """
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress_api_response(response):
+        if request.path.startswith("/api/"):
+            return compress_response(response)
+        return response
+
+
+__all__ = [
+    "JSON_COMPRESS_MIN_SIZE",
+    "FastJSONProvider",
+    "encode_columnar",
+    "compress_response",
+    "register_json",
+]
@@ -1,11 +1,135 @@
-from flask import Blueprint, render_template, request, jsonify
-from app.services.binance_service import BinanceService
+import threading
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    g,
+    render_template,
+    request,
+    jsonify,
+    stream_with_context,
+)
 
 # Define the Blueprint for dashboard routes
 bp = Blueprint('dashboard', __name__)
 
-# Initialize the BinanceService once for the blueprint
-binance_service = BinanceService()
+# Services are built on first request, not at import time
+_accounts_service = None
+_accounts_service_lock = threading.Lock()
+
+
+def get_accounts_service():
+    """
+    Return the process-wide MultiAccountService, creating it on first use.
+    The import is deferred too, so spawning a worker does not load the
+    service layer (SQLAlchemy, pandas, HTTP clients) until it is needed.
+    """
+    global _accounts_service
+    if _accounts_service is None:
+        with _accounts_service_lock:
+            if _accounts_service is None:
+                from app.services.multi_account_service import MultiAccountService
+                service = MultiAccountService()
+                _start_price_stream(service.service())
+                _accounts_service = service
+    return _accounts_service
+
+
+def get_binance_service(account=None):
+    """
+    Return the BinanceService of one account (the first configured one by default).
+    Raises ValueError for an unknown account name.
+    """
+    return get_accounts_service().service(account)
+
+
+def get_portfolio_service():
+    """
+    Service answering a request: the account named by the `account` query
+    parameter, or every account aggregated when it is absent.
+    Raises ValueError for an unknown account name.
+    """
+    account = request.args.get('account')
+    if account:
+        return get_binance_service(account)
+    return get_accounts_service()
+
+
+@bp.before_request
+def _open_snapshot_scope():
+    """
+    Every service reading account balances during this request shares one
+    /api/v3/account fetch per account (see binance.snapshot), and the
+    last-known-good values served instead of fresh ones are tracked
+    (see resilience.note_stale).
+    """
+    from app.services.binance.snapshot import open_scope
+    from app.services.resilience import open_stale_scope
+    g.snapshot_scope = open_scope()
+    g.stale_scope = open_stale_scope()
+
+
+@bp.after_request
+def _stale_header(response):
+    """
+    X-Stale-Since: fetch time (epoch ms) of the oldest last-known-good
+    value the response was built from, while Binance was unavailable.
+    """
+    from app.services.resilience import stale_since
+    since = stale_since()
+    if since is not None:
+        response.headers['X-Stale-Since'] = str(int(since * 1000))
+    return response
+
+
+@bp.teardown_request
+def _close_snapshot_scope(_exc=None):
+    token = g.pop('snapshot_scope', None)
+    if token is not None:
+        from app.services.binance.snapshot import close_scope
+        close_scope(token)
+    token = g.pop('stale_scope', None)
+    if token is not None:
+        from app.services.resilience import close_stale_scope
+        close_stale_scope(token)
+
+
+def error_response(e: Exception):
+    """
+    JSON error for a failed request: 503 with Retry-After when Binance is
+    unavailable (circuit open), 500 otherwise.
+    """
+    from app.services.resilience import BREAKER_RESET_SECONDS, CircuitOpenError
+    if isinstance(e, CircuitOpenError):
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(int(BREAKER_RESET_SECONDS))
+        return response, 503
+    return jsonify({'error': str(e)}), 500
+
+
+def _start_price_stream(service):
+    """
+    Start the optional live price feed (PRICE_STREAM config) for the held assets.
+    A failure only disables live prices: valuations fall back to REST.
+    """
+    kind = current_app.config.get('PRICE_STREAM')
+    if not kind:
+        return
+    try:
+        service.start_price_stream(kind)
+    except Exception:
+        current_app.logger.exception("Could not start the live price stream")
+
+
+def requested_currency():
+    """
+    Reporting currency from the `currency` query parameter
+    (default REPORTING_CURRENCY). Raises ValueError if unsupported.
+    """
+    from app.services.fx import normalize_currency
+    return normalize_currency(request.args.get('currency'))
+
 
 @bp.route('/')
 def dashboard():
@@ -13,7 +137,7 @@ def dashboard():
     Render the main dashboard page with portfolio overview.
     """
     # Fetch current portfolio data
-    portfolio = binance_service.get_portfolio_data()
+    portfolio = get_accounts_service().get_portfolio_data()
     # Render the template with portfolio context
     return render_template('dashboard.html', portfolio=portfolio)
 
@@ -21,9 +145,10 @@ def dashboard():
 def sync_data():
     """
     Trigger an incremental sync with Binance and return status.
+    Syncs every account in parallel, or only ?account=<name>.
     """
     try:
-        binance_service.sync()
+        get_portfolio_service().sync()
         return jsonify({'status': 'success', 'message': 'Sync completed'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -32,33 +157,200 @@ def sync_data():
 def api_portfolio():
     """
     Provide portfolio data as JSON for frontend consumption.
+    Query params: year (int), currency (str), account (str, default: all accounts)
     """
+    year = request.args.get('year', type=int)
+    try:
+        currency = requested_currency()
+        service = get_portfolio_service()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
-        portfolio = binance_service.get_portfolio_data()
+        portfolio = service.get_portfolio_data(year=year, currency=currency)
         return jsonify(portfolio)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@bp.route('/api/portfolio/stream', methods=['GET'])
+def api_portfolio_stream():
+    """
+    Server-Sent Events stream of the portfolio value.
+    The first event carries every asset value; later events carry the new
+    total and only the assets whose value changed, at most once per second.
+    Query param: currency (str)
+    """
+    try:
+        currency = requested_currency()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        live = get_binance_service().live_portfolio()
+        subscription = live.subscribe(currency)
+    except Exception as e:
+        return error_response(e)
+
+    def events():
+        try:
+            while True:
+                message = subscription.pop(timeout=15)
+                if message is None:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"data: {current_app.json.dumps(message)}\n\n"
+        finally:
+            # Client disconnected (GeneratorExit) or server shutting down
+            live.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 @bp.route('/api/performance', methods=['GET'])
 def api_performance():
     """
-    Return performance metrics (returns, drawdowns) as JSON.
+    Return performance metrics (returns, drawdowns) as JSON, the series
+    as columns: {"t": [epoch ms], "v": [values]}.
+    Query params: currency (str), account (str, default: all accounts)
     """
     try:
-        perf = binance_service.get_performance_metrics()
+        currency = requested_currency()
+        service = get_portfolio_service()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        perf = service.get_performance_data(currency=currency)
         return jsonify(perf)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@bp.route('/api/performance/chart', methods=['GET'])
+def api_performance_chart():
+    """
+    Return a chart-ready series downsampled to at most `points` points
+    (shape-preserving LTTB), as columns: {"t": [epoch ms], "v": [values]}.
+    Query params: series (value|cumulative|returns), range (1d|1w|1m|3m|6m|1y|ytd|all),
+    start / end (ISO dates, override range), points (int), currency (str),
+    account (str, default: all accounts)
+    """
+    from datetime import datetime
+    from app.services.binance.charts import check_chart_params
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        kwargs = {
+            'series': request.args.get('series', 'value'),
+            'period': request.args.get('range', 'all'),
+            'start_date': datetime.fromisoformat(start) if start else None,
+            'end_date': datetime.fromisoformat(end) if end else None,
+        }
+        kwargs['points'] = check_chart_params(
+            kwargs['series'], kwargs['period'], request.args.get('points', type=int))
+        currency = requested_currency()
+        service = get_portfolio_service()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(service.get_chart_series(currency=currency, **kwargs))
+    except Exception as e:
+        return error_response(e)
+
+@bp.route('/api/performance/attribution', methods=['GET'])
+def api_performance_attribution():
+    """
+    Return per-asset P&L and contribution to return and drawdown, the
+    covariance / correlation matrices of the asset returns and the split
+    of the portfolio volatility (marginal / component risk), per asset of
+    the `assets` list. Query params: range (1d|1w|1m|3m|6m|1y|ytd|all),
+    start / end (ISO dates, override range), window (days), currency (str),
+    account (str, default: all accounts)
+    """
+    from datetime import datetime
+    from app.services.binance.attribution import check_attribution_params
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        kwargs = {
+            'period': request.args.get('range', 'all'),
+            'start_date': datetime.fromisoformat(start) if start else None,
+            'end_date': datetime.fromisoformat(end) if end else None,
+        }
+        kwargs['window'] = check_attribution_params(kwargs['period'], request.args.get('window', type=int))
+        currency = requested_currency()
+        service = get_portfolio_service()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(service.get_attribution(currency=currency, **kwargs))
+    except Exception as e:
+        return error_response(e)
+
+@bp.route('/api/performance/backtest', methods=['POST'])
+def api_performance_backtest():
+    """
+    Simulate target weights against the account's real deposits.
+    JSON body: weights ({asset: weight}, summing to at most 1, the rest held
+    in USDT), rebalance (none|daily|weekly|monthly|quarterly|yearly),
+    fee_rate (float, optional).
+    Query params: currency (str), account (str, default: first account)
+    """
+    body = request.get_json(silent=True) or {}
+    weights = body.get('weights')
+    if not isinstance(weights, dict) or not weights:
+        return jsonify({'error': 'weights must be a non-empty object'}), 400
+    try:
+        currency = requested_currency()
+        service = get_binance_service(request.args.get('account'))
+        weights = {str(asset).upper(): float(weight) for asset, weight in weights.items()}
+        fee_rate = body.get('fee_rate')
+        fee_rate = None if fee_rate is None else float(fee_rate)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(service.get_backtest(
+            weights, rebalance=body.get('rebalance', 'monthly'), fee_rate=fee_rate, currency=currency))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return error_response(e)
+
+@bp.route('/api/positions', methods=['GET'])
+def api_positions():
+    """
+    Return open positions with their cost basis (average entry price,
+    realized / unrealized P/L) as JSON.
+    Query params: account (str, default: first account),
+    currency (str, default REPORTING_CURRENCY)
+    """
+    try:
+        currency = requested_currency()
+        service = get_binance_service(request.args.get('account'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(service.get_positions(currency=currency))
+    except Exception as e:
+        return error_response(e)
 
 @bp.route('/api/taxes', methods=['GET'])
 def api_taxes():
     """
     Return tax calculation results for the given year.
-    Query param: year (int)
+    Query params: year (int), currency (str, default EUR),
+    account (str, default: all accounts)
     """
     year = request.args.get('year', type=int)
     try:
-        tax_info = binance_service.calculate_taxes(year)
+        # Without a currency parameter the report uses TAX_CURRENCY, not
+        # the reporting currency
+        currency = requested_currency() if 'currency' in request.args else None
+        service = get_portfolio_service()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        tax_info = service.get_tax_report(year, currency=currency)
         return jsonify(tax_info)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
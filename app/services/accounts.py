@@ -0,0 +1,111 @@
+# app/services/accounts.py
+
+import json
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from .db import Account, DEFAULT_ACCOUNT_ID, SessionLocal
+
+# JSON file listing the accounts to manage:
+#   [{"name": "main", "api_key": "...", "api_secret": "..."}, ...]
+# Without it, a single "default" account uses BINANCE_API_KEY / BINANCE_API_SECRET.
+ACCOUNTS_FILE = os.getenv("BINANCE_ACCOUNTS_FILE", "")
+
+DEFAULT_ACCOUNT_NAME = "default"
+
+
+class AccountCredentials(NamedTuple):
+    id: int
+    name: str
+    api_key: Optional[str]
+    api_secret: Optional[str]
+
+
+class AccountRegistry:
+    """
+    Accounts (main, sub-accounts, family accounts) managed by the app.
+
+    Credentials come from ACCOUNTS_FILE (or the environment for the single
+    default account); each account name is mapped to a stable id stored in
+    the `accounts` table, which is what Deposit/Withdrawal/Trade/SyncMeta
+    rows reference. The first account registered gets DEFAULT_ACCOUNT_ID,
+    so data synced before multi-account support stays attached to it.
+    """
+
+    def __init__(self, accounts_file: str = ACCOUNTS_FILE):
+        self.accounts_file = accounts_file
+        self._accounts: Optional[Dict[str, AccountCredentials]] = None
+        self._lock = threading.Lock()
+
+    def _read_config(self) -> List[dict]:
+        if not self.accounts_file:
+            return [{
+                "name": DEFAULT_ACCOUNT_NAME,
+                "api_key": os.getenv("BINANCE_API_KEY"),
+                "api_secret": os.getenv("BINANCE_API_SECRET"),
+            }]
+        with open(self.accounts_file, "r", encoding="utf-8") as fh:
+            entries = json.load(fh)
+        if not entries:
+            raise ValueError(f"No account defined in {self.accounts_file}")
+        return entries
+
+    def load(self) -> Dict[str, AccountCredentials]:
+        """
+        Read the configured accounts and make sure each one has a DB id.
+        """
+        entries = self._read_config()
+        db = SessionLocal()
+        try:
+            ids = {a.name: a.id for a in db.query(Account).all()}
+            for entry in entries:
+                if entry["name"] in ids:
+                    continue
+                account = Account(name=entry["name"])
+                if not ids:
+                    account.id = DEFAULT_ACCOUNT_ID
+                db.add(account)
+                db.flush()
+                ids[account.name] = account.id
+            db.commit()
+        finally:
+            db.close()
+
+        return {
+            e["name"]: AccountCredentials(ids[e["name"]], e["name"], e.get("api_key"), e.get("api_secret"))
+            for e in entries
+        }
+
+    def all(self) -> List[AccountCredentials]:
+        """
+        Every configured account, in configuration order.
+        """
+        if self._accounts is None:
+            with self._lock:
+                if self._accounts is None:
+                    self._accounts = self.load()
+        return list(self._accounts.values())
+
+    def get(self, name: str) -> AccountCredentials:
+        """
+        :raises ValueError: if no account has this name
+        """
+        for account in self.all():
+            if account.name == name:
+                return account
+        raise ValueError(f"Unknown account: {name}")
+
+
+# Shared registry instance, created on first use
+_registry: Optional[AccountRegistry] = None
+
+
+def get_account_registry() -> AccountRegistry:
+    """
+    Return the process-wide AccountRegistry.
+    """
+    global _registry
+    if _registry is None:
+        _registry = AccountRegistry()
+    return _registry
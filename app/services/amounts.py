@@ -0,0 +1,187 @@
+# app/services/amounts.py
+
+import threading
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Dict, Iterable, Optional, Union
+
+from sqlalchemy import BigInteger, cast, func, select, update
+
+from .db import Asset, Deposit, SessionLocal, Trade, Withdrawal
+
+# Scale of the assets exchangeInfo does not describe (Binance uses 8 decimals
+# for nearly every asset)
+DEFAULT_DECIMALS = 8
+
+Amount = Union[str, int, float, Decimal]
+
+
+def to_units(value: Amount, decimals: int) -> int:
+    """
+    Exact integer amount in 10**-decimals units, e.g. ('0.015', 8) -> 1500000.
+    Pass the decimal strings of the API rather than floats when available.
+    """
+    if isinstance(value, float):
+        # str() gives the shortest repr: 0.1 -> '0.1', not 0.1000000000000000055...
+        value = str(value)
+    return int(Decimal(value).scaleb(decimals).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def format_units(units: int, decimals: int) -> str:
+    """
+    Decimal string of an amount in units, e.g. (1500000, 8) -> '0.01500000'.
+    This is the only conversion used for amounts returned by the API.
+    """
+    sign = "-" if units < 0 else ""
+    whole, fraction = divmod(abs(int(units)), 10 ** decimals)
+    if decimals == 0:
+        return f"{sign}{whole}"
+    return f"{sign}{whole}.{fraction:0{decimals}d}"
+
+
+def format_amount(value: Optional[Amount], decimals: int) -> Optional[str]:
+    """
+    Decimal string of an amount rounded to `decimals`, e.g. (0.015, 8) ->
+    '0.01500000', or None for None. For values computed in floats (prices x
+    quantities) that reach the API.
+    """
+    if value is None:
+        return None
+    return format_units(to_units(value, decimals), decimals)
+
+
+def units_to_float(units, decimals: int):
+    """
+    Float value of an amount in units, for valuation (amount x price) only.
+    Works element-wise on numpy arrays and pandas Series.
+    """
+    return units / 10 ** decimals
+
+
+class AssetPrecisions:
+    """
+    Per-asset fixed-point scale, persisted in the `assets` table.
+
+    An asset's scale is taken from exchangeInfo the first time the asset is
+    stored and then kept forever: the integers already stored depend on it.
+    Known scales are cached in memory.
+    """
+
+    def __init__(self):
+        self._decimals: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def _known(self, session) -> Dict[str, int]:
+        if self._decimals is None:
+            with self._lock:
+                if self._decimals is None:
+                    self._decimals = {a.asset: a.decimals for a in session.query(Asset).all()}
+        return self._decimals
+
+    def get_many(self, assets: Iterable[str], session=None) -> Dict[str, int]:
+        """
+        Scale of each asset, registering the unknown ones.
+
+        :param assets: asset names
+        :param session: Optional SQLAlchemy session. New assets are added to it
+            (and committed by the caller); if not provided, a new session is
+            created, committed and closed internally.
+        """
+        own_session = session is None
+        if own_session:
+            session = SessionLocal()
+        try:
+            known = self._known(session)
+            missing = [a for a in set(assets) if a not in known]
+            for asset in missing:
+                record = session.get(Asset, asset)
+                if record is None:
+                    record = Asset(asset=asset, decimals=self._exchange_decimals(asset))
+                    session.add(record)
+                known[asset] = record.decimals
+            if own_session and missing:
+                session.commit()
+            return {a: known[a] for a in assets}
+        finally:
+            if own_session:
+                session.close()
+
+    def get(self, asset: str, session=None) -> int:
+        return self.get_many([asset], session)[asset]
+
+    @staticmethod
+    def _exchange_decimals(asset: str) -> int:
+        from .binance.symbols import get_symbol_registry
+
+        try:
+            decimals = get_symbol_registry().asset_precision(asset)
+        except RuntimeError:
+            # Binance unreachable and no exchangeInfo snapshot on disk
+            decimals = None
+        return DEFAULT_DECIMALS if decimals is None else decimals
+
+
+# Shared instance, created on first use
+_precisions: Optional[AssetPrecisions] = None
+
+
+def get_asset_precisions() -> AssetPrecisions:
+    """
+    Return the process-wide AssetPrecisions.
+    """
+    global _precisions
+    if _precisions is None:
+        _precisions = AssetPrecisions()
+    return _precisions
+
+
+def backfill_units() -> None:
+    """
+    Fill the *_units columns of rows stored before fixed-point amounts,
+    from their float columns (the best information left for them).
+    """
+    from .binance.symbols import get_symbol_registry
+
+    precisions = get_asset_precisions()
+    db = SessionLocal()
+    try:
+        def scaled(expr, decimals):
+            return cast(func.round(expr * 10 ** decimals), BigInteger)
+
+        for model in (Deposit, Withdrawal):
+            assets = db.scalars(select(model.asset).where(model.amount_units.is_(None)).distinct()).all()
+            for asset, decimals in precisions.get_many(assets, db).items():
+                db.execute(
+                    update(model)
+                    .where(model.asset == asset, model.amount_units.is_(None))
+                    .values(amount_units=scaled(model.amount, decimals))
+                )
+
+        symbols = db.scalars(select(Trade.symbol).where(Trade.qty_units.is_(None)).distinct()).all()
+        if symbols:
+            registry = get_symbol_registry()
+            legs = {symbol: registry.split_symbol(symbol) for symbol in symbols}
+            decimals = precisions.get_many({a for pair in legs.values() for a in pair}, db)
+            for symbol, (base, quote) in legs.items():
+                db.execute(
+                    update(Trade)
+                    .where(Trade.symbol == symbol, Trade.qty_units.is_(None))
+                    .values(
+                        qty_units=scaled(Trade.qty, decimals[base]),
+                        quote_qty_units=scaled(Trade.qty * Trade.price, decimals[quote]),
+                    )
+                )
+        db.commit()
+    finally:
+        db.close()
+
+
+__all__ = [
+    "DEFAULT_DECIMALS",
+    "to_units",
+    "format_units",
+    "format_amount",
+    "units_to_float",
+    "AssetPrecisions",
+    "get_asset_precisions",
+    "backfill_units",
+]
@@ -0,0 +1,504 @@
+# app/services/binance/analytics_store.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from .symbols import CACHE_DIR
+
+if TYPE_CHECKING:  # numpy / pandas / pyarrow are imported lazily, on first use
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+try:  # advisory file locks, so worker processes do not rebuild the same tables
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+# Persist the ledger, value series and price matrix as Arrow files (needs
+# pyarrow; without it everything is rebuilt in memory as before)
+ANALYTICS_CACHE = os.getenv("ANALYTICS_CACHE", "1").lower() in ("1", "true", "yes")
+ANALYTICS_CACHE_DIR = os.getenv("ANALYTICS_CACHE_DIR", os.path.join(CACHE_DIR, "analytics"))
+# Appended partitions of a table before they are compacted into one file
+ANALYTICS_MAX_PARTITIONS = int(os.getenv("ANALYTICS_MAX_PARTITIONS", 16))
+
+DAY_MS = 86_400_000
+
+_MISSING = object()
+_pyarrow_module: Any = _MISSING
+
+
+def _pyarrow():
+    """
+    The pyarrow module (with pyarrow.ipc loaded), or None if it is not
+    installed (imported on first use).
+    """
+    global _pyarrow_module
+    if _pyarrow_module is _MISSING:
+        try:
+            import pyarrow
+            import pyarrow.ipc  # noqa: F401
+        except ImportError:
+            pyarrow = None
+        _pyarrow_module = pyarrow
+    return _pyarrow_module
+
+
+def _write_atomic(path: str, write: Callable[[str], None]) -> None:
+    """
+    Write a file through write(tmp_path), then move it in place: readers
+    never see a partial file.
+    """
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class ArrowTable:
+    """
+    One table on disk: Arrow IPC partition files plus a JSON manifest
+    listing them with the table's metadata (data version, last time, ...).
+
+    Partitions are uncompressed Arrow files, memory-mapped when read: the
+    pages are shared by every worker process through the OS page cache,
+    and numeric columns are read without copying. New rows are appended as
+    new partitions; past ANALYTICS_MAX_PARTITIONS they are compacted into
+    one file.
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.directory = directory
+        self.name = name
+        self.manifest_path = os.path.join(directory, f"{name}.json")
+        self._lock = threading.RLock()
+        # (partition files, mapped table, derived values cache)
+        self._mapped: Optional[tuple] = None
+
+    def manifest(self) -> Optional[dict]:
+        """
+        Current manifest, or None if the table was never written.
+        """
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive access to the table for an update, across threads and
+        (where supported) processes.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, f"{self.name}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self, manifest: Optional[dict] = None) -> Optional["pa.Table"]:
+        """
+        The table, its partitions memory-mapped (kept mapped until the
+        partition list changes), or None if it was never written.
+        """
+        manifest = manifest or self.manifest()
+        if manifest is None:
+            return None
+        parts = tuple(manifest["parts"])
+        with self._lock:
+            if self._mapped is not None and self._mapped[0] == parts:
+                return self._mapped[1]
+        pa = _pyarrow()
+        tables = []
+        for part in parts:
+            source = pa.memory_map(os.path.join(self.directory, part), "r")
+            tables.append(pa.ipc.open_file(source).read_all())
+        table = pa.concat_tables(tables) if tables else None
+        with self._lock:
+            self._mapped = (parts, table, {})
+        return table
+
+    def derived(self, key: str, build: Callable[["pa.Table"], Any], manifest: Optional[dict] = None):
+        """
+        Value computed from the mapped table (e.g. a DataFrame), built once
+        per partition list.
+        """
+        table = self.read(manifest)
+        with self._lock:
+            cache = self._mapped[2] if self._mapped is not None and self._mapped[1] is table else {}
+            if key not in cache:
+                cache[key] = build(table)
+            return cache[key]
+
+    def _write_part(self, table: "pa.Table") -> str:
+        pa = _pyarrow()
+        name = f"{self.name}-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.arrow"
+
+        def write(path):
+            with pa.OSFile(path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+        _write_atomic(os.path.join(self.directory, name), write)
+        return name
+
+    def _commit(self, parts: List[str], meta: dict, old_parts: List[str] = ()) -> dict:
+        manifest = {**meta, "parts": parts, "updated": int(time.time() * 1000)}
+
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(manifest, f)
+
+        _write_atomic(self.manifest_path, write)
+        # other processes may still map the old files: unlinking keeps their pages
+        for part in set(old_parts) - set(parts):
+            try:
+                os.remove(os.path.join(self.directory, part))
+            except OSError:
+                pass
+        return manifest
+
+    def replace(self, table: "pa.Table", meta: dict) -> dict:
+        """
+        Rewrite the table as one partition (call within locked()).
+        """
+        old = (self.manifest() or {}).get("parts", [])
+        return self._commit([self._write_part(table)], meta, old)
+
+    def append(self, table: Optional["pa.Table"], meta: dict) -> dict:
+        """
+        Add rows as a new partition and update the metadata (call within
+        locked()); compacts the partitions past ANALYTICS_MAX_PARTITIONS.
+        """
+        manifest = self.manifest()
+        if manifest is None:
+            return self.replace(table, meta)
+        parts = list(manifest["parts"])
+        if table is not None and table.num_rows:
+            parts.append(self._write_part(table))
+        if len(parts) > ANALYTICS_MAX_PARTITIONS:
+            merged = self.read({"parts": parts})
+            return self._commit([self._write_part(merged.combine_chunks())], meta, parts)
+        return self._commit(parts, meta)
+
+
+def _numpy(column) -> "np.ndarray":
+    """
+    NumPy array of an Arrow column: a view of the mapped pages for a single
+    chunk without nulls, one copy otherwise.
+    """
+    import numpy as np
+
+    if column.num_chunks == 1 and column.null_count == 0:
+        return column.chunk(0).to_numpy(zero_copy_only=False)
+    return np.concatenate([chunk.to_numpy(zero_copy_only=False) for chunk in column.chunks]) \
+        if column.num_chunks else np.empty(0)
+
+
+class AnalyticsStore:
+    """
+    On-disk cache of the expensive reconstructions of the performance layer,
+    keyed by data version (see sync_utils.data_version):
+
+    - ledger: running balances (time, asset, balance) of an account (or of
+      all accounts), as streamed by performance._running_balances;
+    - values: the value series (time, value in USDT) at each ledger
+      timestamp, each valued through the historical prices;
+    - prices: daily USDT closes of assets (time + one column per asset).
+
+    A sync that only adds later rows appends one partition per table: the
+    new ledger rows, and the values of the new timestamps only. Anything
+    else (rows inserted in the past) rewrites the table.
+    """
+
+    def __init__(self, root: str = ANALYTICS_CACHE_DIR):
+        self.root = root
+        self._tables: Dict[tuple, ArrowTable] = {}
+        self._lock = threading.Lock()
+
+    def table(self, scope: str, name: str) -> ArrowTable:
+        with self._lock:
+            key = (scope, name)
+            if key not in self._tables:
+                self._tables[key] = ArrowTable(os.path.join(self.root, scope), name)
+            return self._tables[key]
+
+    @staticmethod
+    def _scope(account_id: Optional[int]) -> str:
+        return "all" if account_id is None else f"account-{account_id}"
+
+    def preload(self) -> int:
+        """
+        Memory-map every table found on disk (worker startup), so the first
+        requests do not pay for it. Returns the number of tables mapped.
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        mapped = 0
+        for scope in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, scope)
+            if not os.path.isdir(directory):
+                continue
+            for entry in sorted(os.listdir(directory)):
+                if entry.endswith(".json"):
+                    if self.table(scope, entry[:-len(".json")]).read() is not None:
+                        mapped += 1
+        return mapped
+
+    # -- ledger ------------------------------------------------------------
+
+    def _ledger_table(self, rows: list) -> "pa.Table":
+        pa = _pyarrow()
+        times, assets, balances = zip(*rows) if rows else ((), (), ())
+        return pa.table({
+            "time": pa.array(times, type=pa.int64()),
+            "asset": pa.array(assets, type=pa.string()).dictionary_encode(),
+            "balance": pa.array(balances, type=pa.float64()),
+        })
+
+    def ledger(self, db, account_id: Optional[int] = None, version: Optional[str] = None) -> tuple:
+        """
+        Running balances of an account, brought up to date with the
+        database. Returns (table, manifest).
+        """
+        from ..sync_utils import data_version
+        from .performance import _running_balances, count_ledger_rows
+
+        table = self.table(self._scope(account_id), "ledger")
+        version = version or data_version(account_id, db)
+        manifest = table.manifest()
+        if manifest is not None and manifest["version"] == version:
+            return table.read(manifest), manifest
+        with table.locked():
+            manifest = table.manifest()
+            if manifest is not None and manifest["version"] == version:
+                return table.read(manifest), manifest
+            last = manifest and manifest["last_time"]
+            if manifest is not None and (
+                last is None or count_ledger_rows(db, account_id, until=last) == manifest["rows"]
+            ):
+                # only later rows were added: append them
+                rows = list(_running_balances(db, account_id, after=last))
+                meta = {
+                    "version": version,
+                    "generation": manifest["generation"],
+                    "rows": manifest["rows"] + len(rows),
+                    "last_time": rows[-1][0] if rows else last,
+                }
+                manifest = table.append(self._ledger_table(rows), meta)
+            else:
+                rows = list(_running_balances(db, account_id))
+                meta = {
+                    "version": version,
+                    "generation": (manifest or {}).get("generation", 0) + 1,
+                    "rows": len(rows),
+                    "last_time": rows[-1][0] if rows else None,
+                }
+                manifest = table.replace(self._ledger_table(rows), meta)
+            return table.read(manifest), manifest
+
+    def balance_frame(self, db, account_id: Optional[int] = None, version: Optional[str] = None) -> "pd.DataFrame":
+        """
+        performance.build_balance_frame() from the cached ledger.
+        """
+        from .performance import balance_frame
+
+        _, manifest = self.ledger(db, account_id, version)
+        table = self.table(self._scope(account_id), "ledger")
+        return table.derived("balance_frame", lambda t: balance_frame(t.to_pandas()), manifest)
+
+    # -- value series ------------------------------------------------------
+
+    def value_timeseries(self, db, account_id: Optional[int] = None, version: Optional[str] = None) -> "pd.Series":
+        """
+        performance.build_value_timeseries() from the cached values: only
+        the ledger timestamps after the last cached one are valued.
+        """
+        import numpy as np
+
+        from .performance import value_records, value_series
+
+        ledger, ledger_manifest = self.ledger(db, account_id, version)
+        table = self.table(self._scope(account_id), "values")
+        version = ledger_manifest["version"]
+        manifest = table.manifest()
+        if manifest is None or manifest["version"] != version:
+            with table.locked():
+                manifest = table.manifest()
+                if manifest is None or manifest["version"] != version:
+                    manifest = self._update_values(table, manifest, ledger, ledger_manifest, value_records)
+
+        def build(values):
+            return value_series(_numpy(values.column("time")), _numpy(values.column("value")))
+
+        if not manifest["rows"]:
+            return value_series(np.empty(0, dtype="int64"), np.empty(0))
+        return table.derived("series", build, manifest)
+
+    def _update_values(self, table: ArrowTable, manifest, ledger, ledger_manifest, value_records) -> dict:
+        import numpy as np
+
+        pa = _pyarrow()
+        times = _numpy(ledger.column("time")) if ledger is not None else np.empty(0, dtype="int64")
+        append = manifest is not None and manifest["generation"] == ledger_manifest["generation"]
+        last = manifest["last_time"] if append else None
+        start = 0 if last is None else int(np.searchsorted(times, last, side="right"))
+
+        # balances before the first new row: the last one of each asset
+        balances = {}
+        if start:
+            head = ledger.slice(0, start).to_pandas()
+            balances = head.groupby("asset", observed=True)["balance"].last().to_dict()
+        rows = ledger.slice(start).to_pandas().itertuples(index=False, name=None) if ledger is not None else []
+        records = list(value_records(rows, balances))
+        new = pa.table({
+            "time": pa.array([t for t, _ in records], type=pa.int64()),
+            "value": pa.array([v for _, v in records], type=pa.float64()),
+        })
+        meta = {
+            "version": ledger_manifest["version"],
+            "generation": ledger_manifest["generation"],
+            "rows": (manifest["rows"] if append else 0) + len(records),
+            "last_time": records[-1][0] if records else last,
+        }
+        return table.append(new, meta) if append else table.replace(new, meta)
+
+    # -- price matrix ------------------------------------------------------
+
+    def price_matrix(
+        self,
+        assets: List[str],
+        grid: "np.ndarray",
+        start_time: int,
+        sync: bool,
+        build: Callable[[List[str], "np.ndarray", int, bool], "np.ndarray"],
+    ) -> "np.ndarray":
+        """
+        build(assets, grid, start_time, sync) (see backtest.price_matrix)
+        for the days not cached yet. Days closed more than a day ago are
+        settled (their candles are stored after a sync) and cached; more
+        recent ones are always built.
+        """
+        import numpy as np
+
+        pa = _pyarrow()
+        table = self.table("prices", "daily")
+        settled = grid < int(time.time() * 1000) - DAY_MS
+        manifest = table.manifest()
+        columns = set(manifest["assets"]) if manifest else set()
+        covered = manifest is not None and manifest["first_time"] <= grid[0] and set(assets) <= columns \
+            if len(grid) else True
+        needed = settled & (grid > manifest["last_time"]) if covered and manifest else settled
+
+        if needed.any():
+            with table.locked():
+                manifest = table.manifest()
+                columns = list(manifest["assets"]) if manifest else []
+                if manifest is None or manifest["first_time"] > grid[0] or not set(assets) <= set(columns):
+                    # new assets or earlier days: rebuild with every known asset
+                    columns = sorted(set(columns) | set(assets))
+                    first, last = int(grid[0]), int(grid[settled][-1])
+                    if manifest is not None:
+                        first, last = min(first, manifest["first_time"]), max(last, manifest["last_time"])
+                    rows = np.arange(first, last + 1, DAY_MS, dtype="int64")
+                    replace = True
+                else:
+                    # contiguous days, from the last cached one
+                    rows = np.arange(manifest["last_time"] + DAY_MS, int(grid[settled][-1]) + 1, DAY_MS, dtype="int64")
+                    replace = False
+                if len(rows):
+                    prices = build(columns, rows, start_time, sync)
+                    new = pa.table({"time": pa.array(rows, type=pa.int64()),
+                                    **{a: pa.array(prices[:, i], type=pa.float64()) for i, a in enumerate(columns)}})
+                    meta = {
+                        "assets": columns,
+                        "first_time": int(rows[0]) if replace else manifest["first_time"],
+                        "last_time": int(rows[-1]),
+                    }
+                    manifest = table.replace(new, meta) if replace else table.append(new, meta)
+
+        result = np.full((len(grid), len(assets)), np.nan)
+        if manifest is not None and len(grid):
+            cached = table.derived(
+                "matrix",
+                lambda t: (_numpy(t.column("time")), {a: _numpy(t.column(a)) for a in manifest["assets"]}),
+                manifest,
+            )
+            cached_times, cached_columns = cached
+            idx = np.searchsorted(cached_times, grid)
+            hit = (idx < len(cached_times)) & (cached_times[np.clip(idx, 0, len(cached_times) - 1)] == grid)
+            for i, asset in enumerate(assets):
+                if asset in cached_columns:
+                    result[hit, i] = cached_columns[asset][idx[hit]]
+        else:
+            hit = np.zeros(len(grid), dtype=bool)
+        if not hit.all():
+            result[~hit] = build(assets, grid[~hit], start_time, sync)
+        return result
+
+
+_store: Optional[AnalyticsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_analytics_store() -> Optional[AnalyticsStore]:
+    """
+    Process-wide analytics store, or None when disabled (ANALYTICS_CACHE)
+    or pyarrow is not installed.
+    """
+    global _store
+    if not ANALYTICS_CACHE or _pyarrow() is None:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = AnalyticsStore()
+        return _store
+
+
+def preload_analytics(logger=None) -> None:
+    """
+    Memory-map the cached tables in a background thread (worker startup).
+    Does nothing when the store is disabled or empty.
+    """
+    if not ANALYTICS_CACHE or not os.path.isdir(ANALYTICS_CACHE_DIR):
+        return
+
+    def run():
+        store = get_analytics_store()
+        if store is None:
+            return
+        try:
+            started = time.perf_counter()
+            mapped = store.preload()
+            if logger is not None and mapped:
+                logger.info("Mapped %d analytics tables in %.1f ms", mapped, (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            if logger is not None:
+                logger.warning("Could not map the analytics cache: %s", e)
+
+    threading.Thread(target=run, name="analytics-preload", daemon=True).start()
+
+
+__all__ = [
+    "ANALYTICS_CACHE",
+    "ANALYTICS_CACHE_DIR",
+    "ArrowTable",
+    "AnalyticsStore",
+    "get_analytics_store",
+    "preload_analytics",
+]
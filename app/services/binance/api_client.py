@@ -1,15 +1,17 @@
 # app/services/binance/api_client.py
 
-import time
-import requests
-from binance.client import Client as _RawBinanceClient
+import json
+import os
 from typing import Any, Dict, List, Optional
 
+from .rate_limit import get_rate_limiter
+
 
 class BinanceClient:
     """
     Low‐level wrapper for the Binance REST API.
     Uses the existing BinanceClient (signing, error‐handling) under the hood.
+    The underlying HTTP client is only built on the first call.
     """
 
     def __init__(
@@ -17,13 +19,35 @@ class BinanceClient:
         api_key: Optional[str] = None,
         api_secret: Optional[str] = None,
         timeout: int = 10,
+        rate_limiter=None,
     ):
         """
         :param api_key: Binance API key, or pulled from env in BinanceClient
         :param api_secret: Binance API secret, or pulled from env
         :param timeout: request timeout in seconds
+        :param rate_limiter: request weight budget (default: the process-wide one)
+        """
+        self.api_key = api_key or os.getenv("BINANCE_API_KEY")
+        self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._raw_client = None
+
+    @property
+    def _client(self):
+        """
+        Signing REST client, created lazily so that building a BinanceClient
+        (e.g. at service construction) costs nothing until a request is made.
         """
-        self._client = _RawBinanceClient(self.api_key, self.api_secret)
+        if self._raw_client is None:
+            from ..binance_client import BinanceClient as _RawBinanceClient
+            self._raw_client = _RawBinanceClient(
+                api_key=self.api_key,
+                api_secret=self.api_secret,
+                timeout=self.timeout,
+                rate_limiter=self.rate_limiter,
+            )
+        return self._raw_client
 
     def get_deposit_history(
         self,
@@ -73,12 +97,15 @@ class BinanceClient:
         start_time: Optional[int] = None,
         end_time: Optional[int] = None,
         limit: int = 1000,
+        from_id: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
-        Fetch trade history for a symbol.
+        Fetch trade history for a symbol, from trade id `from_id` if given.
         Docs: https://binance-docs.github.io/apidocs/spot/en/#account-trade-list-user_data
         """
         params: Dict[str, Any] = {"symbol": symbol, "limit": limit}
+        if from_id is not None:
+            params["fromId"] = from_id
         if start_time is not None:
             params["startTime"] = start_time
         if end_time is not None:
@@ -105,18 +132,56 @@ class BinanceClient:
         Fetch current price ticker for a single symbol.
         Docs: https://binance-docs.github.io/apidocs/spot/en/#symbol-price-ticker-market_data
         """
-        return self._client._signed_request(
+        return self._client._public_request(
             method="GET",
             path="/api/v3/ticker/price",
             params={"symbol": symbol},
         )
 
+    def get_symbol_prices(self, symbols: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch current price tickers for several symbols in one request
+        (all symbols when `symbols` is None).
+        Docs: https://binance-docs.github.io/apidocs/spot/en/#symbol-price-ticker-market_data
+        """
+        params: Dict[str, Any] = {}
+        if symbols:
+            params["symbols"] = json.dumps(sorted(symbols), separators=(",", ":"))
+        return self._client._public_request(
+            method="GET",
+            path="/api/v3/ticker/price",
+            params=params,
+        )
+
+    def get_klines(
+        self,
+        symbol: str,
+        interval: str = "1m",
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 500,
+    ) -> List[List[Any]]:
+        """
+        Fetch candlesticks for a symbol.
+        Docs: https://binance-docs.github.io/apidocs/spot/en/#kline-candlestick-data
+        """
+        params: Dict[str, Any] = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return self._client._public_request(
+            method="GET",
+            path="/api/v3/klines",
+            params=params,
+        )
+
     def get_exchange_info(self) -> Dict[str, Any]:
         """
         Fetch exchange trading rules and symbol information.
         Docs: https://binance-docs.github.io/apidocs/spot/en/#exchange-information
         """
-        return self._client._signed_request(
+        return self._client._public_request(
             method="GET",
             path="/api/v3/exchangeInfo",
             params={}
@@ -0,0 +1,371 @@
+# app/services/binance/async_client.py
+
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..binance_client import endpoint_breaker, signed_query
+from ..resilience import is_upstream_failure
+from .rate_limit import get_rate_limiter, request_weight
+
+BASE_URL = "https://api.binance.com"
+
+# Requests in flight at once per client; also the size of its keep-alive
+# connection pool
+ASYNC_MAX_CONCURRENCY = int(os.getenv("BINANCE_ASYNC_CONCURRENCY", 16))
+# Seconds an idle pooled connection is kept open
+ASYNC_KEEPALIVE = float(os.getenv("BINANCE_ASYNC_KEEPALIVE", 30))
+
+
+class AsyncBinanceClient:
+    """
+    asyncio Binance REST client with the same methods as
+    api_client.BinanceClient, as coroutines.
+
+    - One aiohttp session per client: HTTP/1.1 keep-alive connections are
+      pooled (at most max_concurrency), and reused across calls.
+    - Requests are signed like the sync client (binance_client.signed_query).
+    - Every request spends its weight from the process-wide budget shared
+      with the sync clients, waiting without blocking the event loop, and
+      at most max_concurrency requests are in flight.
+    - Each call accepts `timeout` (seconds, default: the client timeout);
+      cancelling the awaiting task aborts the request.
+    - Calls go through the same per-endpoint circuit breakers as the sync
+      client (binance_client.endpoint_breaker).
+
+    Requires aiohttp.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        timeout: float = 10,
+        rate_limiter=None,
+        max_concurrency: int = ASYNC_MAX_CONCURRENCY,
+    ):
+        """
+        :param api_key: Binance API key (default: BINANCE_API_KEY)
+        :param api_secret: Binance API secret (default: BINANCE_API_SECRET)
+        :param timeout: default per-call timeout in seconds
+        :param rate_limiter: request weight budget (default: the process-wide one)
+        :param max_concurrency: requests in flight at once
+        """
+        self.api_key = api_key or os.getenv("BINANCE_API_KEY")
+        self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.max_concurrency = max_concurrency
+        self._session = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_client(cls, client, **kwargs) -> "AsyncBinanceClient":
+        """
+        Async client with the credentials and budget of a sync BinanceClient.
+        """
+        return cls(
+            api_key=client.api_key,
+            api_secret=client.api_secret,
+            timeout=client.timeout,
+            rate_limiter=client.rate_limiter,
+            **kwargs,
+        )
+
+    async def _get_session(self):
+        # Created on first use, inside the event loop that will run the calls
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                keepalive_timeout=ASYNC_KEEPALIVE,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Close the pooled connections.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "AsyncBinanceClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _acquire(self, path: str, params: Optional[dict]) -> None:
+        """
+        Spend the request weight of `path`, sleeping (not blocking the loop)
+        until the shared budget allows it.
+        """
+        weight = request_weight(path, params)
+        while True:
+            wait = self.rate_limiter.try_acquire(weight)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict] = None,
+        signed: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        import aiohttp
+        from yarl import URL
+
+        session = await self._get_session()
+        kind = "signed" if signed else "public"
+        breaker = endpoint_breaker(path, (self.api_key or "") if signed else None)
+        async with self._semaphore:
+            # An open circuit fails fast, before spending any request weight
+            probe = breaker.before_call()
+            try:
+                await self._acquire(path, params)
+            except asyncio.CancelledError:
+                if probe:
+                    breaker.release_probe()
+                raise
+            headers = {}
+            if signed:
+                # Sign at send time: the timestamp must be fresh. The query is
+                # sent exactly as signed (encoded=True: no requoting).
+                url = URL(f"{BASE_URL}{path}?{signed_query(params, self.api_secret)}", encoded=True)
+                headers["X-MBX-APIKEY"] = self.api_key
+                query = None
+            else:
+                url, query = f"{BASE_URL}{path}", params
+            try:
+                async with session.request(
+                    method,
+                    url,
+                    params=query,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+                ) as response:
+                    used = response.headers.get("X-MBX-USED-WEIGHT-1M")
+                    if used is not None:
+                        self.rate_limiter.observe_used(int(used))
+                    response.raise_for_status()
+                    data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if is_upstream_failure(getattr(e, "status", None)):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise RuntimeError(f"Binance {kind} request error: {e!r}")
+            except asyncio.CancelledError:
+                # Cancelled by the caller (e.g. gather() after a sibling
+                # failed): no outcome, so no failure; only real timeouts
+                # (asyncio.TimeoutError above) count
+                if probe:
+                    breaker.release_probe()
+                raise
+            breaker.record_success()
+            return data
+
+    # ---- API methods (same signatures as api_client.BinanceClient) ----
+
+    async def get_deposit_history(
+        self,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 1000,
+        timeout: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {"limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return await self._request("GET", "/sapi/v1/capital/deposit/hisrec", params, signed=True, timeout=timeout)
+
+    async def get_withdraw_history(
+        self,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 1000,
+        timeout: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {"limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return await self._request("GET", "/sapi/v1/capital/withdraw/history", params, signed=True, timeout=timeout)
+
+    async def get_my_trades(
+        self,
+        symbol: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 1000,
+        timeout: Optional[float] = None,
+        from_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {"symbol": symbol, "limit": limit}
+        if from_id is not None:
+            params["fromId"] = from_id
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return await self._request("GET", "/api/v3/myTrades", params, signed=True, timeout=timeout)
+
+    async def get_account_info(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self._request("GET", "/api/v3/account", {}, signed=True, timeout=timeout)
+
+    async def get_symbol_price(self, symbol: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self._request("GET", "/api/v3/ticker/price", {"symbol": symbol}, timeout=timeout)
+
+    async def get_symbol_prices(
+        self, symbols: Optional[List[str]] = None, timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {}
+        if symbols:
+            params["symbols"] = json.dumps(sorted(symbols), separators=(",", ":"))
+        return await self._request("GET", "/api/v3/ticker/price", params, timeout=timeout)
+
+    async def get_klines(
+        self,
+        symbol: str,
+        interval: str = "1m",
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 500,
+        timeout: Optional[float] = None,
+    ) -> List[List[Any]]:
+        params: Dict[str, Any] = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+        return await self._request("GET", "/api/v3/klines", params, timeout=timeout)
+
+    async def get_exchange_info(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self._request("GET", "/api/v3/exchangeInfo", {}, timeout=timeout)
+
+
+# Event loop running the coroutines of every BlockingBinanceClient, in a
+# daemon thread, started on first use
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True, name="BinanceAsyncLoop").start()
+            _loop = loop
+        return _loop
+
+
+# A call for BlockingBinanceClient.gather(): (method name, kwargs)
+Call = Tuple[str, Dict[str, Any]]
+
+
+class BlockingBinanceClient:
+    """
+    Synchronous facade over AsyncBinanceClient, a drop-in replacement for
+    api_client.BinanceClient in the Flask services.
+
+    Calls run on a shared background event loop, so the connection pool
+    stays warm across calls. gather() runs many calls concurrently from one
+    thread (e.g. trade history of every symbol), instead of one blocked
+    thread per call.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, api_secret: Optional[str] = None, timeout: float = 10, **kwargs):
+        """
+        Same arguments as AsyncBinanceClient.
+        """
+        self._async = AsyncBinanceClient(api_key=api_key, api_secret=api_secret, timeout=timeout, **kwargs)
+
+    @property
+    def api_key(self):
+        return self._async.api_key
+
+    @property
+    def api_secret(self):
+        return self._async.api_secret
+
+    @property
+    def timeout(self):
+        return self._async.timeout
+
+    @property
+    def rate_limiter(self):
+        return self._async.rate_limiter
+
+    def _run(self, coro, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the background loop and wait for its result.
+        On timeout the coroutine is cancelled before the error is raised.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def gather(self, calls: Iterable[Call], timeout: Optional[float] = None) -> List[Any]:
+        """
+        Run calls concurrently, e.g. [("get_my_trades", {"symbol": "BTCUSDT"}), ...],
+        and return their results in order. The first error cancels the
+        others and is raised.
+
+        :param timeout: overall deadline in seconds (None: per-call timeouts only)
+        """
+        async def run_all():
+            tasks = [asyncio.ensure_future(getattr(self._async, name)(**kwargs)) for name, kwargs in calls]
+            try:
+                return await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+
+        return self._run(run_all(), timeout)
+
+    def close(self) -> None:
+        self._run(self._async.close())
+
+    def get_deposit_history(self, start_time=None, end_time=None, limit=1000, timeout=None):
+        return self._run(self._async.get_deposit_history(start_time, end_time, limit, timeout))
+
+    def get_withdraw_history(self, start_time=None, end_time=None, limit=1000, timeout=None):
+        return self._run(self._async.get_withdraw_history(start_time, end_time, limit, timeout))
+
+    def get_my_trades(self, symbol, start_time=None, end_time=None, limit=1000, timeout=None, from_id=None):
+        return self._run(self._async.get_my_trades(symbol, start_time, end_time, limit, timeout, from_id))
+
+    def get_account_info(self, timeout=None):
+        return self._run(self._async.get_account_info(timeout))
+
+    def get_symbol_price(self, symbol, timeout=None):
+        return self._run(self._async.get_symbol_price(symbol, timeout))
+
+    def get_symbol_prices(self, symbols=None, timeout=None):
+        return self._run(self._async.get_symbol_prices(symbols, timeout))
+
+    def get_klines(self, symbol, interval="1m", start_time=None, end_time=None, limit=500, timeout=None):
+        return self._run(self._async.get_klines(symbol, interval, start_time, end_time, limit, timeout))
+
+    def get_exchange_info(self, timeout=None):
+        return self._run(self._async.get_exchange_info(timeout))
+
+
+__all__ = ["AsyncBinanceClient", "BlockingBinanceClient"]
@@ -0,0 +1,335 @@
+# app/services/binance/attribution.py
+
+import os
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Hashable, List, NamedTuple, Optional
+
+from ..fx import get_rates_at
+from ..utils.utils import from_timestamps
+from .backtest import daily_grid, price_matrix
+from .charts import RANGES, ChartCache, select_range
+from .portfolio import BASE_ASSETS
+from .symbols import get_symbol_registry
+
+if TYPE_CHECKING:  # numpy / pandas are imported lazily, on first computation
+    import numpy as np
+    import pandas as pd
+
+# Days of returns in the rolling covariance / correlation window
+ATTRIBUTION_WINDOW = int(os.getenv("ATTRIBUTION_WINDOW", 30))
+# Entries (daily matrices and results) kept in memory
+ATTRIBUTION_CACHE_SIZE = int(os.getenv("ATTRIBUTION_CACHE_SIZE", 64))
+# Crypto markets trade every day: daily variances are annualized over 365 days
+PERIODS_PER_YEAR = 365
+
+
+class AttributionData(NamedTuple):
+    """
+    Daily balance and price matrices of a portfolio, on a grid of day
+    close times.
+    """
+    times: "np.ndarray"     # (T,) int64 close times, ms
+    assets: List[str]       # column labels
+    balances: "np.ndarray"  # (T, A) balances at each close
+    prices: "np.ndarray"    # (T, A) prices in the reporting currency, NaN when unknown
+
+
+_cache = ChartCache(ATTRIBUTION_CACHE_SIZE)
+
+
+def get_attribution_cache() -> ChartCache:
+    """
+    Process-wide cache of attribution matrices and results.
+    """
+    return _cache
+
+
+def load_attribution_data(
+    balance_frames: List["pd.DataFrame"], currency: str, sync: bool = True
+) -> AttributionData:
+    """
+    Daily matrices of the portfolio made of one or more balance frames
+    (see performance.build_balance_frame, e.g. one per account): balances
+    at each day close, summed across frames, and the daily closes of every
+    held asset in `currency` (missing candles downloaded first if sync).
+    Assets without any market (delisted coins, dust) get NaN prices, like
+    the value series values them at 0.
+    The grid ends at the latest stored daily close; prices are carried over
+    days without a candle.
+    """
+    import numpy as np
+
+    frames = [frame for frame in balance_frames if not frame.empty]
+    assets = sorted({asset for frame in frames for asset in frame.columns})
+    if not frames:
+        return AttributionData(np.empty(0, dtype="int64"), [], np.empty((0, 0)), np.empty((0, 0)))
+    first = min(int(frame.index[0]) for frame in frames)
+    grid = daily_grid(first)
+
+    balances = np.zeros((len(grid), len(assets)))
+    columns = {asset: i for i, asset in enumerate(assets)}
+    for frame in frames:
+        # last ledger state at or before each close
+        idx = np.searchsorted(frame.index.to_numpy(), grid, side="right") - 1
+        rows = np.where(idx[:, None] >= 0, frame.to_numpy()[np.clip(idx, 0, None)], 0.0)
+        balances[:, [columns[a] for a in frame.columns]] += rows
+
+    registry = get_symbol_registry()
+    priced = [i for i, asset in enumerate(assets)
+              if asset in BASE_ASSETS or registry.path_to_quote(asset) is not None]
+    prices = np.full((len(grid), len(assets)), np.nan)
+    prices[:, priced] = price_matrix([assets[i] for i in priced], grid, first, sync)
+    seen = np.isfinite(prices)
+    # end at the latest stored close (stablecoins are priced every day)
+    quoted = [i for i, asset in enumerate(assets) if asset not in BASE_ASSETS]
+    if quoted and seen[:, quoted].any():
+        end = int(np.flatnonzero(seen[:, quoted].any(axis=1))[-1]) + 1
+        grid, balances, prices, seen = grid[:end], balances[:end], prices[:end], seen[:end]
+    # forward-fill gaps, keep NaN before the first candle
+    idx = np.where(seen, np.arange(len(grid))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    prices = np.where(seen.cumsum(axis=0) > 0, np.take_along_axis(prices, idx, axis=0), np.nan)
+    prices = prices / get_rates_at(grid, currency)[:, None]
+    return AttributionData(grid, assets, balances, prices)
+
+
+def rolling_covariance(returns: "np.ndarray", window: int) -> "np.ndarray":
+    """
+    Covariance matrix of the `window` rows of returns ending at each row,
+    for every row at once (running sums of returns and of their outer
+    products). Rows before the first full window are NaN.
+
+    :param returns: (T, A) periodic returns
+    :return: (T, A, A) sample covariances
+    """
+    import numpy as np
+
+    n, _ = returns.shape
+    zero = np.zeros((1,) + returns.shape[1:])
+    sums = np.concatenate([zero, np.cumsum(returns, axis=0)])
+    products = np.einsum("ti,tj->tij", returns, returns)
+    squares = np.concatenate([zero[:, :, None] * zero[:, None, :], np.cumsum(products, axis=0)])
+    covariance = np.full((n,) + products.shape[1:], np.nan)
+    if window < 2 or n < window:
+        return covariance
+    s = sums[window:] - sums[:-window]
+    ss = squares[window:] - squares[:-window]
+    covariance[window - 1:] = (ss - s[:, :, None] * s[:, None, :] / window) / (window - 1)
+    return covariance
+
+
+def correlation(covariance: "np.ndarray") -> "np.ndarray":
+    """
+    Correlation matrix (or matrices, over the leading axes) of covariance
+    matrices; NaN for assets without variance (e.g. stablecoins).
+    """
+    import numpy as np
+
+    std = np.sqrt(np.diagonal(covariance, axis1=-2, axis2=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = covariance / (std[..., :, None] * std[..., None, :])
+    return np.where(std[..., :, None] * std[..., None, :] > 0, corr, np.nan)
+
+
+def risk_decomposition(weights: "np.ndarray", covariance: "np.ndarray") -> dict:
+    """
+    Volatility of a portfolio and its split across assets:
+    - marginal risk: d(volatility) / d(weight) = (cov @ w) / volatility
+    - component risk: weight * marginal risk, summing to the volatility
+    - risk share: component risk / volatility, summing to 1
+
+    :param weights: (A,) portfolio weights
+    :param covariance: (A, A) covariance of the asset returns
+    """
+    import numpy as np
+
+    covariance = np.nan_to_num(covariance)
+    exposure = covariance @ weights
+    volatility = float(np.sqrt(max(weights @ exposure, 0.0)))
+    if volatility == 0:
+        zeros = np.zeros(len(weights))
+        return {"volatility": 0.0, "marginal_risk": zeros, "component_risk": zeros, "risk_share": zeros}
+    marginal = exposure / volatility
+    component = weights * marginal
+    return {
+        "volatility": volatility,
+        "marginal_risk": marginal,
+        "component_risk": component,
+        "risk_share": component / volatility,
+    }
+
+
+def _linked_contributions(contributions: "np.ndarray", growth: "np.ndarray") -> "np.ndarray":
+    """
+    Per-asset contributions to the compounded return of a span: each day's
+    contribution weighted by the growth up to the previous day, so that
+    they add up exactly to the span's total return.
+    """
+    import numpy as np
+
+    previous = np.concatenate([[1.0], growth[:-1]]) if len(growth) else growth
+    return (contributions * previous[:, None]).sum(axis=0)
+
+
+def compute_attribution(data: AttributionData, begin: int, end: int, window: int = ATTRIBUTION_WINDOW) -> dict:
+    """
+    P&L attribution and risk of the portfolio over the grid days
+    [begin, end), in one pass over the (T, A) matrices.
+
+    - Contribution: each day, an asset contributes the P&L of its balance
+      held since the previous close (balance * price change) divided by the
+      previous portfolio value; deposits, withdrawals and trades change
+      balances, not P&L. Linked over the range, the contributions sum to
+      the time-weighted total return.
+    - Drawdown: the deepest peak-to-trough fall of the time-weighted
+      return, and each asset's contribution to it.
+    - Risk: covariance / correlation of the daily asset returns over the
+      last `window` days, annualized volatility of the end-of-range weights
+      split into marginal and component risk, and the rolling volatility
+      of the portfolio (weights of each day, window ending that day).
+    """
+    import numpy as np
+    import pandas as pd
+
+    times = data.times[begin:end]
+    balances = data.balances[begin:end]
+    prices = data.prices[begin:end]
+    # only the assets held and priced at some point of the range
+    held = np.flatnonzero((balances != 0).any(axis=0) & np.isfinite(prices).any(axis=0))
+    assets = [data.assets[i] for i in held]
+    balances, prices = balances[:, held], prices[:, held]
+
+    values = np.nan_to_num(balances * prices)
+    total = values.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        asset_returns = prices[1:] / prices[:-1] - 1.0
+        pnl = np.nan_to_num(balances[:-1] * (prices[1:] - prices[:-1]))
+        daily = np.where(total[:-1, None] > 0, pnl / total[:-1, None], 0.0)
+    asset_returns = np.nan_to_num(asset_returns, nan=0.0, posinf=0.0, neginf=0.0)
+    portfolio_returns = daily.sum(axis=1)
+    growth = np.cumprod(1.0 + portfolio_returns)
+
+    # deepest fall of the time-weighted return, and who caused it
+    drawdown = {"max_drawdown": 0.0, "peak": None, "trough": None, "contribution": np.zeros(len(assets))}
+    if len(growth):
+        index = np.concatenate([[1.0], growth])
+        depth = index / np.maximum.accumulate(index) - 1.0
+        trough = int(depth.argmin())
+        if depth[trough] < 0:
+            peak = int(index[:trough + 1].argmax())
+            span = slice(peak, trough)
+            # rebase the growth on the peak: contributions add up to the depth
+            drawdown = {
+                "max_drawdown": float(depth[trough]),
+                "peak": int(times[peak]),
+                "trough": int(times[trough]),
+                "contribution": _linked_contributions(daily[span], growth[span] / index[peak]),
+            }
+
+    window = max(2, min(window, len(asset_returns)))
+    rolling = rolling_covariance(asset_returns, window) * PERIODS_PER_YEAR
+    weights = np.where(total[:, None] > 0, values / np.where(total > 0, total, 1.0)[:, None], 0.0)
+    covariance = rolling[-1] if len(rolling) else np.full((len(assets), len(assets)), np.nan)
+    risk = risk_decomposition(weights[-1] if len(times) else np.zeros(len(assets)), covariance)
+    # portfolio volatility of each day's weights over the window ending that day
+    exposure = np.einsum("tij,tj->ti", np.nan_to_num(rolling), weights[1:])
+    volatility = np.sqrt(np.maximum(np.einsum("ti,ti->t", weights[1:], exposure), 0.0))
+    volatility[: window - 1] = np.nan
+
+    return {
+        "start": int(times[0]) if len(times) else None,
+        "end": int(times[-1]) if len(times) else None,
+        "days": len(times),
+        "window": window,
+        "assets": assets,
+        "weights": weights[-1] if len(times) else np.zeros(0),
+        "values": values[-1] if len(times) else np.zeros(0),
+        "total_return": float(growth[-1] - 1.0) if len(growth) else 0.0,
+        "pnl": pnl.sum(axis=0),
+        "contribution": _linked_contributions(daily, growth),
+        "drawdown": drawdown,
+        "covariance": covariance,
+        "correlation": correlation(covariance),
+        **risk,
+        "rolling_volatility": pd.Series(volatility, index=from_timestamps(times[1:])),
+    }
+
+
+def check_attribution_params(period: str, window: Optional[int]) -> int:
+    """
+    Validate the parameters of an attribution request; returns the window.
+
+    :raises ValueError: on an unknown range or a window below 2 days
+    """
+    if period not in RANGES:
+        raise ValueError(f"Unknown range: {period} (expected one of {', '.join(RANGES)})")
+    window = ATTRIBUTION_WINDOW if window is None else window
+    if window < 2:
+        raise ValueError("window must be at least 2 days")
+    return window
+
+
+def get_attribution(
+    load_balances: Callable[[], List["pd.DataFrame"]],
+    scope: Hashable,
+    currency: str,
+    version: str,
+    period: str = "all",
+    start: datetime = None,
+    end: datetime = None,
+    window: Optional[int] = None,
+) -> dict:
+    """
+    Attribution and risk of a portfolio over a range (see compute_attribution).
+
+    The daily matrices are cached per (scope, currency, data version) and
+    each result per (scope, currency, range, window, data version), like
+    the chart series: repeated requests are served from memory until the
+    next sync changes the data.
+
+    :param load_balances: builds the balance frames of the portfolio (see load_attribution_data)
+    :param scope: identifies whose data is analysed (e.g. an account id)
+    :param version: data version of the scope (see sync_utils.data_version)
+    :param period: one of charts.RANGES, ignored if start or end is given
+    :param window: days of the covariance window (default ATTRIBUTION_WINDOW)
+    :raises ValueError: on an unknown range or a window below 2 days
+    """
+    import numpy as np
+    import pandas as pd
+
+    window = check_attribution_params(period, window)
+    key = ("attribution", scope, currency, period, start, end, window, version)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    data_key = ("matrices", scope, currency, version)
+    data = _cache.get(data_key)
+    if data is None:
+        data = load_attribution_data(load_balances(), currency)
+        _cache.put(data_key, data)
+
+    positions = select_range(pd.Series(np.arange(len(data.times)), index=from_timestamps(data.times)), period, start, end)
+    begin, stop = (int(positions.iloc[0]), int(positions.iloc[-1]) + 1) if len(positions) else (0, 0)
+    result = {
+        "currency": currency,
+        "range": "custom" if start is not None or end is not None else period,
+        "version": version,
+        **compute_attribution(data, begin, stop, window),
+    }
+    _cache.put(key, result)
+    return result
+
+
+__all__ = [
+    "ATTRIBUTION_WINDOW",
+    "AttributionData",
+    "get_attribution_cache",
+    "load_attribution_data",
+    "rolling_covariance",
+    "correlation",
+    "risk_decomposition",
+    "compute_attribution",
+    "check_attribution_params",
+    "get_attribution",
+]
@@ -0,0 +1,420 @@
+# app/services/binance/backtest.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+from ..db import DEFAULT_ACCOUNT_ID, Deposit, SessionLocal
+from ..fx import get_rates_at, normalize_currency
+from ..price_history import INTERVAL_MS, load_klines, sync_klines
+from ..utils.utils import from_timestamps
+from .performance import summarize
+from .portfolio import BASE_ASSETS
+from .symbols import get_symbol_registry
+
+if TYPE_CHECKING:  # numpy / pandas are imported lazily, on first computation
+    import numpy as np
+
+# Rebalance schedules: numpy calendar unit whose change starts a new period
+# (None: never rebalance, deposits are still split at the target weights)
+REBALANCE_UNITS = {
+    "none": None,
+    "daily": "D",
+    "weekly": "W",
+    "monthly": "M",
+    "quarterly": "Q",
+    "yearly": "Y",
+}
+
+# Fee charged on the traded notional when none is given (Binance spot taker)
+BACKTEST_FEE_RATE = float(os.getenv("BACKTEST_FEE_RATE", 0.001))
+# Worker processes for parameter sweeps (0 or 1: in process)
+BACKTEST_PROCESSES = int(os.getenv("BACKTEST_PROCESSES", 0))
+
+DAY_MS = INTERVAL_MS["1d"]
+
+
+class BacktestData(NamedTuple):
+    """
+    Inputs of a simulation, on a daily grid of candle close times.
+    """
+    times: "np.ndarray"    # (T,) int64 close times, ms
+    assets: List[str]      # column labels of prices
+    prices: "np.ndarray"   # (T, A) USDT prices, forward-filled
+    flows: "np.ndarray"    # (T,) USDT value deposited on each day
+
+
+def _asset_prices(asset: str, grid: "np.ndarray", start_time: int, sync: bool) -> "np.ndarray":
+    """
+    Daily USDT close of an asset on the grid (NaN outside its candles),
+    through its cheapest market path like the live pricing.
+    """
+    import numpy as np
+
+    if asset in BASE_ASSETS:
+        return np.ones(len(grid))
+    legs = get_symbol_registry().path_to_quote(asset)
+    if legs is None:
+        raise ValueError(f"No market to price {asset} in USDT")
+    prices = np.ones(len(grid))
+    for symbol, inverted in legs:
+        if sync:
+            sync_klines(symbol, interval="1d", start_time=start_time)
+        klines = load_klines(symbol, interval="1d")
+        close_times = klines["close_time"].to_numpy()
+        closes = klines["close"].to_numpy()
+        # last close at or before each grid time, NaN outside the candles
+        idx = np.searchsorted(close_times, grid, side="right") - 1
+        inside = (idx >= 0) & (grid <= close_times[-1]) if len(closes) else np.zeros(len(grid), dtype=bool)
+        leg = np.where(inside, closes[np.clip(idx, 0, None)] if len(closes) else np.nan, np.nan)
+        prices *= 1.0 / leg if inverted else leg
+    return prices
+
+
+def daily_grid(start_time: int, end_time: Optional[int] = None) -> "np.ndarray":
+    """
+    Close times (ms, 23:59:59.999 UTC) of the days from start_time's day
+    to end_time (default now).
+    """
+    import numpy as np
+
+    last = end_time if end_time is not None else int(np.datetime64("now", "ms").astype("int64"))
+    start = start_time - start_time % DAY_MS + DAY_MS - 1
+    return np.arange(start, last + 1, DAY_MS, dtype="int64")
+
+
+def price_matrix(assets: List[str], grid: "np.ndarray", start_time: int, sync: bool = True) -> "np.ndarray":
+    """
+    (len(grid), len(assets)) daily USDT closes of `assets` on a grid of
+    close times (ms), NaN outside each asset's candles. Missing candles are
+    downloaded first (from start_time) if sync. Settled days are read from
+    the on-disk analytics cache when enabled (see analytics_store).
+    """
+    import numpy as np
+
+    from .analytics_store import get_analytics_store
+
+    if not assets:
+        return np.empty((len(grid), 0))
+    store = get_analytics_store()
+    if store is not None:
+        return store.price_matrix(assets, grid, start_time, sync, _build_price_matrix)
+    return _build_price_matrix(assets, grid, start_time, sync)
+
+
+def _build_price_matrix(assets: List[str], grid: "np.ndarray", start_time: int, sync: bool) -> "np.ndarray":
+    import numpy as np
+
+    return np.column_stack([_asset_prices(asset, grid, start_time, sync) for asset in assets]) \
+        if assets else np.empty((len(grid), 0))
+
+
+def load_backtest_data(
+    assets: List[str],
+    account_id: int = DEFAULT_ACCOUNT_ID,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    sync: bool = True,
+) -> BacktestData:
+    """
+    Daily price matrix of `assets` from the stored 1d klines (missing
+    candles downloaded first if sync) and the account's real deposits as
+    cash flows, valued in USDT at deposit time (Deposit.value_usdt).
+
+    The grid runs from the first deposit (or start_time) to the last daily
+    close, and starts no earlier than the first day every asset has a price:
+    deposits made before then are invested on that day.
+
+    :raises ValueError: if the account has no valued deposit, or an asset has no price history
+    """
+    import numpy as np
+
+    session = SessionLocal()
+    try:
+        query = session.query(Deposit.time, Deposit.value_usdt).filter(
+            Deposit.account_id == account_id, Deposit.value_usdt.isnot(None)
+        )
+        if end_time is not None:
+            query = query.filter(Deposit.time <= end_time)
+        deposits = np.array(query.order_by(Deposit.time).all(), dtype="float64").reshape(-1, 2)
+    finally:
+        session.close()
+    if not len(deposits):
+        raise ValueError("No valued deposit to simulate (run a sync first)")
+
+    first = int(deposits[0, 0]) if start_time is None else start_time
+    grid = daily_grid(first, end_time)
+    prices = price_matrix(assets, grid, first, sync)
+
+    # drop the days before every asset is priced, and after the last candle
+    priced = np.isfinite(prices)
+    if not priced.all(axis=1).any():
+        raise ValueError("No day on which every asset has a price")
+    begin = int(priced.all(axis=1).argmax())
+    end = int(np.flatnonzero(priced.any(axis=1))[-1]) + 1 if assets else len(grid)
+    grid, prices = grid[begin:end], prices[begin:end]
+    # forward-fill gaps (delisted days, missing candles)
+    for column in prices.T:
+        missing = ~np.isfinite(column)
+        if missing.any():
+            idx = np.where(missing, 0, np.arange(len(column)))
+            np.maximum.accumulate(idx, out=idx)
+            column[:] = column[idx]
+
+    # each deposit is available at the close of its day
+    days = np.clip(np.searchsorted(grid, deposits[:, 0], side="left"), 0, len(grid) - 1)
+    in_range = deposits[:, 0] <= grid[-1]
+    flows = np.bincount(days[in_range], weights=deposits[in_range, 1], minlength=len(grid))
+    return BacktestData(grid, list(assets), prices, flows)
+
+
+def rebalance_days(times: "np.ndarray", rebalance: str) -> "np.ndarray":
+    """
+    Boolean mask of the grid days starting a rebalance period (the first
+    day always does: it sets the initial allocation).
+
+    :raises ValueError: on an unknown schedule
+    """
+    import numpy as np
+
+    if rebalance not in REBALANCE_UNITS:
+        raise ValueError(f"Unknown rebalance frequency: {rebalance} (expected one of {', '.join(REBALANCE_UNITS)})")
+    unit = REBALANCE_UNITS[rebalance]
+    mask = np.zeros(len(times), dtype=bool)
+    if len(times):
+        mask[0] = True
+    if unit is None or len(times) < 2:
+        return mask
+    days = times.astype("datetime64[ms]").astype("datetime64[D]")
+    if unit == "W":
+        # weeks start on Monday (1970-01-01 was a Thursday)
+        periods = (days.astype("int64") + 3) // 7
+    elif unit == "Q":
+        periods = days.astype("datetime64[M]").astype("int64") // 3
+    else:
+        periods = days.astype(f"datetime64[{unit}]").astype("int64")
+    mask[1:] = periods[1:] != periods[:-1]
+    return mask
+
+
+def simulate(
+    prices: "np.ndarray",
+    flows: "np.ndarray",
+    weights: "np.ndarray",
+    rebalance: "np.ndarray",
+    fee_rates: "np.ndarray",
+    rates: Optional["np.ndarray"] = None,
+) -> tuple:
+    """
+    Value of K allocation variants over the grid, simulated together.
+
+    Holdings only change on event days (a deposit or a rebalance), so the
+    simulation steps from event to event, each step being a few (K, A)
+    array operations, and values between events are one matrix product
+    prices[segment] @ holdings.T. Between events every variant holds
+    constant quantities; the part of the weights below 1 is kept in USDT.
+
+    - On a rebalance day, the whole portfolio (deposit included) is
+      brought back to the target weights, paying fee_rate on the traded
+      notional.
+    - On other deposit days, the deposit is split at the target weights,
+      paying fee_rate on the amount bought.
+
+    :param prices: (T, A) USDT prices
+    :param flows: (T,) deposits in USDT
+    :param weights: (K, A) target weights, each row summing to at most 1
+    :param rebalance: (T,) bool, rebalance days
+    :param fee_rates: (K,) fee per unit of traded notional
+    :param rates: (T,) units of USDT per unit of the reporting currency, to
+        total fees and turnover at each event's rate (in USDT if None)
+    :return: (values (T, K) in USDT, fees paid (K,), turnover (K,))
+    """
+    import numpy as np
+
+    n_days = len(prices)
+    n_variants = len(weights)
+    cash_weights = 1.0 - weights.sum(axis=1)
+    holdings = np.zeros_like(weights, dtype="float64")
+    cash = np.zeros(n_variants)
+    fees = np.zeros(n_variants)
+    turnover = np.zeros(n_variants)
+    values = np.zeros((n_days, n_variants))
+
+    events = np.flatnonzero(rebalance | (flows != 0))
+    bounds = np.append(events, n_days)
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        price = prices[start]
+        deposit = flows[start]
+        if rebalance[start]:
+            current = holdings * price
+            total = current.sum(axis=1) + cash + deposit
+            traded = np.abs(weights * total[:, None] - current).sum(axis=1)
+            cost = traded * fee_rates
+            total -= cost
+            holdings = weights * total[:, None] / price
+            cash = cash_weights * total
+        else:
+            bought = weights.sum(axis=1) * deposit
+            traded = bought
+            cost = traded * fee_rates
+            holdings = holdings + weights * (deposit * (1.0 - fee_rates))[:, None] / price
+            cash = cash + deposit - bought
+        rate = 1.0 if rates is None else rates[start]
+        fees += cost / rate
+        turnover += traded / rate
+        values[start:stop] = prices[start:stop] @ holdings.T + cash
+    return values, fees, turnover
+
+
+def _variant_result(values, index, invested: float, fee, traded, keep_series: bool) -> dict:
+    """
+    Metrics of one simulated variant, as get_performance() reports them.
+    """
+    import pandas as pd
+
+    series = pd.Series(values, index=index)
+    metrics = summarize(series)
+    if not keep_series:
+        for key in ("value_timeseries", "returns", "cumulative"):
+            metrics.pop(key)
+    metrics.update({
+        "final_value": float(values[-1]) if len(values) else 0.0,
+        "invested": invested,
+        "fees": float(fee),
+        "turnover": float(traded),
+    })
+    return metrics
+
+
+def _run_group(data: BacktestData, rebalance: str, weights, fee_rates, rates, keep_series: bool) -> List[dict]:
+    """
+    Simulate variants sharing one rebalance schedule (a process pool task).
+    Values, fees and turnover are converted from USDT at each day's rate.
+    """
+    values, fees, turnover = simulate(
+        data.prices, data.flows, weights, rebalance_days(data.times, rebalance), fee_rates, rates
+    )
+    # the series start with the first deposit, like the real value series
+    first = int((data.flows != 0).argmax())
+    index = from_timestamps(data.times[first:])
+    values = values[first:] / rates[first:, None]
+    invested = float((data.flows[first:] / rates[first:]).sum())
+    return [
+        _variant_result(values[:, k], index, invested, fees[k], turnover[k], keep_series)
+        for k in range(len(weights))
+    ]
+
+
+def _weight_matrix(assets: List[str], variants: List[dict]) -> "np.ndarray":
+    import numpy as np
+
+    weights = np.array([[v["weights"].get(a, 0.0) for a in assets] for v in variants], dtype="float64")
+    if (weights < 0).any() or (weights.sum(axis=1) > 1.0 + 1e-9).any():
+        raise ValueError("Target weights must be non-negative and sum to at most 1")
+    return weights
+
+
+def run_backtests(
+    variants: List[dict],
+    account_id: int = DEFAULT_ACCOUNT_ID,
+    currency: Optional[str] = None,
+    processes: int = BACKTEST_PROCESSES,
+    keep_series: bool = False,
+    sync: bool = True,
+    data: Optional[BacktestData] = None,
+) -> List[dict]:
+    """
+    Backtest allocation variants against the account's real deposits.
+
+    Each variant is a dict with "weights" ({asset: weight}, the remainder
+    kept in USDT), "rebalance" (one of REBALANCE_UNITS, default "monthly")
+    and "fee_rate" (default BACKTEST_FEE_RATE). Prices and deposits are
+    loaded once; variants sharing a rebalance schedule are simulated
+    together, in chunks spread across `processes` worker processes.
+
+    Returns, per variant and in order, the metrics of get_performance()
+    in `currency` (max_drawdown, cagr, plus the series if keep_series)
+    and final_value, invested, fees, turnover.
+
+    :raises ValueError: on invalid weights or schedule, or without a
+        deposit in the simulated range
+    """
+    import numpy as np
+
+    currency = normalize_currency(currency)
+    variants = [{"rebalance": "monthly", "fee_rate": BACKTEST_FEE_RATE, **variant} for variant in variants]
+    for variant in variants:
+        if variant["rebalance"] not in REBALANCE_UNITS:
+            raise ValueError(f"Unknown rebalance frequency: {variant['rebalance']}")
+    assets = sorted({asset for v in variants for asset, w in v["weights"].items() if w})
+    if data is None:
+        data = load_backtest_data(assets, account_id, sync=sync)
+    assets = data.assets
+    if not (data.flows != 0).any():
+        raise ValueError("No deposit within the simulated range")
+    rates = get_rates_at(data.times, currency)
+
+    # Variants sharing a schedule are simulated together, in chunks of
+    # about len(variants) / processes so that every worker gets a share
+    by_schedule: Dict[str, List[int]] = {}
+    for i, variant in enumerate(variants):
+        by_schedule.setdefault(variant["rebalance"], []).append(i)
+    chunk = -(-len(variants) // processes) if processes and processes > 1 else len(variants)
+    groups = [
+        (rebalance, members[start:start + chunk])
+        for rebalance, members in by_schedule.items()
+        for start in range(0, len(members), chunk)
+    ]
+    tasks = [
+        (
+            data,
+            rebalance,
+            _weight_matrix(assets, [variants[i] for i in members]),
+            np.array([variants[i]["fee_rate"] for i in members], dtype="float64"),
+            rates,
+            keep_series,
+        )
+        for rebalance, members in groups
+    ]
+
+    if processes and processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(processes, len(tasks))) as pool:
+            outputs = list(pool.map(_run_group, *zip(*tasks)))
+    else:
+        outputs = [_run_group(*task) for task in tasks]
+
+    results: List[Optional[dict]] = [None] * len(variants)
+    for (_, members), output in zip(groups, outputs):
+        for i, result in zip(members, output):
+            results[i] = {**variants[i], **result}
+    return results
+
+
+def backtest(
+    weights: Dict[str, float],
+    rebalance: str = "monthly",
+    fee_rate: float = BACKTEST_FEE_RATE,
+    account_id: int = DEFAULT_ACCOUNT_ID,
+    currency: Optional[str] = None,
+) -> dict:
+    """
+    "What if I had held these target weights, rebalanced at this
+    frequency, with my real deposits": the same series and metrics as
+    get_performance(), plus final_value, invested, fees and turnover.
+    """
+    variant = {"weights": weights, "rebalance": rebalance, "fee_rate": fee_rate}
+    return run_backtests([variant], account_id, currency, processes=0, keep_series=True)[0]
+
+
+__all__ = [
+    "REBALANCE_UNITS",
+    "BACKTEST_FEE_RATE",
+    "BacktestData",
+    "daily_grid",
+    "price_matrix",
+    "load_backtest_data",
+    "rebalance_days",
+    "simulate",
+    "run_backtests",
+    "backtest",
+]
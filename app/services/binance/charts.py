@@ -0,0 +1,242 @@
+# app/services/binance/charts.py
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Hashable, Optional
+
+from ..utils.utils import to_timestamps
+from .performance import compute_cumulative_returns, compute_returns
+
+if TYPE_CHECKING:  # numpy / pandas are imported lazily, on first computation
+    import numpy as np
+    import pandas as pd
+
+# Points returned when a request does not ask for a number, and the most it may ask for
+CHART_DEFAULT_POINTS = int(os.getenv("CHART_DEFAULT_POINTS", 500))
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", 5000))
+# Entries (full series and downsampled results) kept in memory
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", 256))
+
+# Chart ranges, counted back from the last point of the series (None: everything)
+RANGES = {
+    "1d": timedelta(days=1),
+    "1w": timedelta(weeks=1),
+    "1m": timedelta(days=30),
+    "3m": timedelta(days=90),
+    "6m": timedelta(days=182),
+    "1y": timedelta(days=365),
+    "ytd": None,
+    "all": None,
+}
+SERIES = ("value", "cumulative", "returns")
+
+
+class ChartCache:
+    """
+    Thread-safe LRU mapping. Keys carry the data version, so entries are
+    never invalidated explicitly: stale ones are simply no longer asked for
+    and age out.
+    """
+
+    def __init__(self, maxsize: int = CHART_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = ChartCache()
+
+
+def get_chart_cache() -> ChartCache:
+    """
+    Process-wide cache of chart series.
+    """
+    return _cache
+
+
+def lttb(x: "np.ndarray", y: "np.ndarray", threshold: int) -> "np.ndarray":
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of `threshold`
+    points of (x, y) that preserve the visual shape of the line (peaks and
+    troughs are kept, unlike with plain decimation or averaging).
+
+    The first and last points are always kept; every other point is the
+    one of its bucket forming the largest triangle with the point kept in
+    the previous bucket and the average of the next bucket.
+
+    :return: sorted int indices into x / y (all of them if len(x) <= threshold)
+    """
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    x = x - x[0]
+    # non-finite points (sent as null) must not win every triangle
+    y = np.nan_to_num(np.asarray(y, dtype="float64"), nan=0.0, posinf=0.0, neginf=0.0)
+
+    # threshold - 2 buckets between the fixed first and last points:
+    # bucket i spans [edges[i], edges[i + 1])
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype("int64") + 1
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+
+    indices = np.empty(threshold, dtype="int64")
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # the point after the last bucket is the fixed last point
+        nx, ny = (avg_x[i + 1], avg_y[i + 1]) if i + 3 < threshold else (x[-1], y[-1])
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def select_range(
+    values: "pd.Series", period: str = "all", start: datetime = None, end: datetime = None
+) -> "pd.Series":
+    """
+    Slice of a datetime-indexed series: [start, end] if either is given,
+    otherwise the named range counted back from the series' last point.
+
+    :raises ValueError: on an unknown range name
+    """
+    if period not in RANGES:
+        raise ValueError(f"Unknown chart range: {period} (expected one of {', '.join(RANGES)})")
+    if start is not None or end is not None:
+        return values.loc[start:end]
+    if values.empty or period == "all":
+        return values
+    last = values.index[-1]
+    if period == "ytd":
+        return values.loc[datetime(last.year, 1, 1):]
+    return values.loc[last - RANGES[period]:]
+
+
+def to_columns(values: "pd.Series") -> dict:
+    """
+    Columnar form of a series: {"t": [epoch ms, ...], "v": [value, ...]},
+    non-finite values (e.g. returns from a zero value) as null.
+    """
+    import numpy as np
+
+    v = values.to_numpy(dtype="float64")
+    finite = np.isfinite(v)
+    return {
+        "t": to_timestamps(values.index).tolist(),
+        "v": v.tolist() if finite.all() else [x if ok else None for x, ok in zip(v.tolist(), finite)],
+    }
+
+
+def check_chart_params(series: str, period: str, points: Optional[int]) -> int:
+    """
+    Validate the parameters of a chart request; returns the number of points.
+
+    :raises ValueError: on an unknown series or range, or points out of [3, CHART_MAX_POINTS]
+    """
+    if series not in SERIES:
+        raise ValueError(f"Unknown chart series: {series} (expected one of {', '.join(SERIES)})")
+    if period not in RANGES:
+        raise ValueError(f"Unknown chart range: {period} (expected one of {', '.join(RANGES)})")
+    points = CHART_DEFAULT_POINTS if points is None else points
+    if not 3 <= points <= CHART_MAX_POINTS:
+        raise ValueError(f"points must be between 3 and {CHART_MAX_POINTS}")
+    return points
+
+
+def get_chart_series(
+    load_values: Callable[[], "pd.Series"],
+    scope: Hashable,
+    currency: str,
+    version: str,
+    series: str = "value",
+    period: str = "all",
+    points: Optional[int] = None,
+    start: datetime = None,
+    end: datetime = None,
+) -> dict:
+    """
+    Downsampled chart series, in compact columnar JSON form.
+
+    The full value series (load_values(), in `currency`) is cached per
+    (scope, currency, data version), and each downsampled result per
+    (scope, currency, series, range, points, data version): repeated chart
+    requests are served from memory until the next sync changes the data.
+
+    :param load_values: builds the full value series in `currency`
+    :param scope: identifies whose data is charted (e.g. an account id)
+    :param version: data version of the scope (see sync_utils.data_version)
+    :param series: "value", "cumulative" (returns since the range start) or "returns"
+    :param period: one of RANGES, ignored if start or end is given
+    :param points: maximum number of points returned (default CHART_DEFAULT_POINTS)
+    :raises ValueError: on an unknown series or range, or points out of [3, CHART_MAX_POINTS]
+    """
+    points = check_chart_params(series, period, points)
+    key = ("chart", scope, currency, series, period, start, end, points, version)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    values_key = ("values", scope, currency, version)
+    values = _cache.get(values_key)
+    if values is None:
+        values = load_values()
+        _cache.put(values_key, values)
+
+    selected = select_range(values, period, start, end)
+    if series != "value":
+        selected = compute_returns(selected)
+        if series == "cumulative":
+            selected = compute_cumulative_returns(selected)
+    kept = selected.iloc[lttb(to_timestamps(selected.index), selected.to_numpy(dtype="float64"), points)]
+
+    result = {
+        "series": series,
+        "currency": currency,
+        "range": "custom" if start is not None or end is not None else period,
+        "total": len(selected),
+        "points": len(kept),
+        "version": version,
+        **to_columns(kept),
+    }
+    _cache.put(key, result)
+    return result
+
+
+__all__ = [
+    "CHART_DEFAULT_POINTS",
+    "CHART_MAX_POINTS",
+    "RANGES",
+    "SERIES",
+    "ChartCache",
+    "get_chart_cache",
+    "lttb",
+    "select_range",
+    "to_columns",
+    "check_chart_params",
+    "get_chart_series",
+]
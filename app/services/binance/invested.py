@@ -0,0 +1,189 @@
+# app/services/binance/invested.py
+
+import threading
+from typing import Optional, Set, Tuple
+
+from sqlalchemy import func
+
+from ..amounts import get_asset_precisions, units_to_float
+from ..bulk import bulk_upsert
+from ..db import DEFAULT_ACCOUNT_ID, Deposit, InvestedCapital, SessionLocal, run_write
+from ..fx import DEFAULT_CURRENCY, QUOTE_CURRENCY, convert_frame, normalize_currency
+from ..pricing import get_asset_price_at
+from ..utils.utils import from_timestamp
+from .portfolio import BASE_ASSETS
+
+
+class InvestedCapitalService:
+    """
+    Invested capital of one account, maintained at ingest.
+
+    Each deposit is valued once, in USDT at its own time (Deposit.value_usdt).
+    The `invested_capital` table keeps one aggregate per
+    (currency, year, asset) in USDT and in the default reporting currency.
+    update() refreshes only the groups touched since the last call.
+    invested() then reads a handful of indexed rows, with no network call.
+    """
+
+    def __init__(self, account_id: int = DEFAULT_ACCOUNT_ID):
+        """
+        :param account_id: account whose deposits are aggregated
+        """
+        self.account_id = account_id
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _currencies() -> Tuple[str, ...]:
+        return tuple(dict.fromkeys((QUOTE_CURRENCY, DEFAULT_CURRENCY)))
+
+    def update(self) -> int:
+        """
+        Value the deposits not valued yet (new ones, and those whose price
+        was unavailable last time), then refresh their aggregates.
+        Returns the number of deposits valued.
+        """
+        with self._lock:
+            return self._update()
+
+    def _update(self) -> int:
+        # caller holds the lock
+        session = SessionLocal()
+        try:
+            pending = session.query(Deposit.txId, Deposit.asset, Deposit.time).filter(
+                Deposit.account_id == self.account_id, Deposit.value_usdt.is_(None)
+            ).all()
+        finally:
+            session.close()
+        if not pending:
+            return 0
+        decimals = get_asset_precisions().get_many({asset for _, asset, _ in pending})
+
+        # Price lookups happen here, outside of the write transaction
+        values = []
+        for tx_id, asset, ts in pending:
+            price = 1.0 if asset in BASE_ASSETS else get_asset_price_at(asset, ts)
+            values.append((tx_id, from_timestamp(ts).year, price))
+
+        def write(session):
+            for tx_id, year, price in values:
+                deposit = session.get(Deposit, tx_id)
+                deposit.year = year
+                if price is not None:
+                    # exact units, not the Float amount column
+                    deposit.value_usdt = units_to_float(deposit.amount_units, decimals[deposit.asset]) * price
+
+        run_write(write)
+        self._refresh({(year, asset) for (_, asset, _), (_, year, _) in zip(pending, values)})
+        return sum(1 for *_, price in values if price is not None)
+
+    def rebuild(self) -> None:
+        """
+        Recompute every aggregate of the account from the stored deposits,
+        under the lock throughout so a concurrent update() waits.
+        """
+        with self._lock:
+            run_write(lambda session: session.query(InvestedCapital).filter_by(
+                account_id=self.account_id).delete())
+            self._update()
+            session = SessionLocal()
+            try:
+                groups = session.query(Deposit.year, Deposit.asset).filter(
+                    Deposit.account_id == self.account_id, Deposit.year.isnot(None)
+                ).distinct().all()
+            finally:
+                session.close()
+            self._refresh(set(groups))
+
+    def _refresh(self, groups: Set[Tuple[int, str]]) -> None:
+        """
+        Recompute the aggregates of the given (year, asset) groups from the
+        deposits table. Re-aggregating a whole group keeps it exact when a
+        deposit is re-synced, unlike adding deltas. The aggregates are
+        computed first (FX conversion may fetch rates), then written in one
+        transaction.
+        """
+        import pandas as pd
+
+        rows = []
+        session = SessionLocal()
+        try:
+            for year, asset in groups:
+                deposits = session.query(Deposit.time, Deposit.amount_units, Deposit.value_usdt).filter(
+                    Deposit.account_id == self.account_id,
+                    Deposit.year == year,
+                    Deposit.asset == asset,
+                    Deposit.value_usdt.isnot(None),
+                ).all()
+                ledger = pd.DataFrame(deposits, columns=["time", "units", "value"])
+                for currency in self._currencies():
+                    rows.append({
+                        "account_id": self.account_id,
+                        "currency": currency,
+                        "year": year,
+                        "asset": asset,
+                        "amount_units": int(ledger["units"].fillna(0).sum()),
+                        "value": float(convert_frame(ledger, currency)["value"].sum()),
+                        "deposits": len(ledger),
+                    })
+        finally:
+            session.close()
+        run_write(lambda session: bulk_upsert(session, InvestedCapital, rows))
+
+    def invested(self, year: Optional[int] = None, currency: Optional[str] = None, session=None) -> float:
+        """
+        Invested capital, valued at deposit time in `currency`
+        (default reporting currency), for one year or all years.
+        Currencies other than USDT and the default one are converted
+        deposit by deposit from the stored USDT values (still no Binance
+        deposit history call).
+        """
+        currency = normalize_currency(currency)
+        own_session = session is None
+        if own_session:
+            session = SessionLocal()
+        try:
+            if currency in self._currencies():
+                query = session.query(func.sum(InvestedCapital.value)).filter(
+                    InvestedCapital.account_id == self.account_id,
+                    InvestedCapital.currency == currency,
+                )
+                if year is not None:
+                    query = query.filter(InvestedCapital.year == year)
+                return float(query.scalar() or 0.0)
+
+            import pandas as pd
+
+            query = session.query(Deposit.time, Deposit.value_usdt).filter(
+                Deposit.account_id == self.account_id, Deposit.value_usdt.isnot(None)
+            )
+            if year is not None:
+                query = query.filter(Deposit.year == year)
+            ledger = pd.DataFrame(query.all(), columns=["time", "value"])
+            return float(convert_frame(ledger, currency)["value"].sum())
+        finally:
+            if own_session:
+                session.close()
+
+    def by_asset(self, year: Optional[int] = None, currency: Optional[str] = None) -> dict:
+        """
+        {asset: invested capital} in `currency` (USDT or the default currency).
+
+        :raises ValueError: for any other currency (not aggregated)
+        """
+        currency = normalize_currency(currency)
+        if currency not in self._currencies():
+            raise ValueError(f"Invested capital per asset is not kept in {currency}")
+        session = SessionLocal()
+        try:
+            query = session.query(InvestedCapital.asset, func.sum(InvestedCapital.value)).filter(
+                InvestedCapital.account_id == self.account_id,
+                InvestedCapital.currency == currency,
+            )
+            if year is not None:
+                query = query.filter(InvestedCapital.year == year)
+            return {asset: float(value) for asset, value in query.group_by(InvestedCapital.asset)}
+        finally:
+            session.close()
+
+
+__all__ = ["InvestedCapitalService"]
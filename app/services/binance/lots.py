@@ -0,0 +1,325 @@
+# app/services/binance/lots.py
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, func, or_
+
+from ..amounts import DEFAULT_DECIMALS, get_asset_precisions, units_to_float
+from ..db import DEFAULT_ACCOUNT_ID, LotState, SessionLocal, SyncMeta, Trade, run_write
+from ..price_history import load_klines, sync_klines
+from .portfolio import BASE_ASSETS
+from .symbols import get_symbol_registry
+
+# Cost basis method: "fifo", "lifo" or "average" (weighted average cost)
+COST_BASIS_METHOD = os.getenv("COST_BASIS_METHOD", "fifo").lower()
+METHODS = ("fifo", "lifo", "average")
+
+logger = logging.getLogger(__name__)
+
+
+class LotBook:
+    """
+    Open lots per asset and cumulative realized P/L.
+
+    Each asset holds a deque of [qty_units, unit_cost] lots (unit cost in
+    USDT per whole asset, or in the currency trades were replayed in), oldest first: FIFO disposes from the left, LIFO
+    from the right. With the weighted average method the deque holds at
+    most one lot, re-averaged on every acquisition.
+    Quantities are exact integers in asset units (see amounts).
+    """
+
+    def __init__(self, method: str = COST_BASIS_METHOD, decimals: Optional[Dict[str, int]] = None):
+        """
+        :param method: "fifo", "lifo" or "average"
+        :param decimals: fixed-point scale per asset (DEFAULT_DECIMALS if missing)
+        :raises ValueError: on an unknown method
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown cost basis method: {method} (expected one of {', '.join(METHODS)})")
+        self.method = method
+        self.decimals = decimals if decimals is not None else {}
+        self.lots: Dict[str, deque] = {}
+        self.realized: Dict[str, float] = {}
+
+    def _amount(self, asset: str, units: int) -> float:
+        return units_to_float(units, self.decimals.get(asset, DEFAULT_DECIMALS))
+
+    def acquire(self, asset: str, qty_units: int, unit_cost: float) -> None:
+        """
+        Open a lot of qty_units bought at unit_cost.
+        """
+        if qty_units <= 0:
+            return
+        lots = self.lots.setdefault(asset, deque())
+        if self.method == "average" and lots:
+            held, cost = lots[0]
+            total = held + qty_units
+            lots[0] = [total, (held * cost + qty_units * unit_cost) / total]
+        else:
+            lots.append([qty_units, unit_cost])
+
+    def dispose(self, asset: str, qty_units: int, unit_price: float) -> float:
+        """
+        Close qty_units sold at unit_price against the open lots and return
+        the realized P/L. Quantities beyond the open lots (e.g. deposited
+        coins, whose cost is unknown) realize nothing.
+        """
+        lots = self.lots.setdefault(asset, deque())
+        realized_units = 0.0
+        while qty_units > 0 and lots:
+            lot = lots[-1] if self.method == "lifo" else lots[0]
+            taken = min(qty_units, lot[0])
+            realized_units += taken * (unit_price - lot[1])
+            lot[0] -= taken
+            qty_units -= taken
+            if lot[0] == 0:
+                if self.method == "lifo":
+                    lots.pop()
+                else:
+                    lots.popleft()
+        realized = self._amount(asset, realized_units)
+        self.realized[asset] = self.realized.get(asset, 0.0) + realized
+        return realized
+
+    def position(self, asset: str, price: Optional[float] = None) -> dict:
+        """
+        Quantity held in lots, average entry price, cost basis, realized P/L,
+        and unrealized P/L at `price` (None without a price).
+        """
+        lots = self.lots.get(asset, ())
+        qty_units = sum(q for q, _ in lots)
+        cost_basis = self._amount(asset, sum(q * c for q, c in lots))
+        quantity = self._amount(asset, qty_units)
+        return {
+            "lot_quantity": quantity,
+            "avg_entry_price": cost_basis / quantity if qty_units else None,
+            "cost_basis": cost_basis,
+            "realized_pnl": self.realized.get(asset, 0.0),
+            "unrealized_pnl": quantity * price - cost_basis if price is not None else None,
+        }
+
+    def assets(self) -> set:
+        return {a for a, lots in self.lots.items() if lots} | {a for a, r in self.realized.items() if r}
+
+
+def _quote_prices(trades: list, legs: Dict[str, tuple]) -> List[Optional[float]]:
+    """
+    USDT price of each trade's quote asset (1.0 for stablecoin quotes), as
+    of the last daily close at or before the trade, from the stored klines
+    of its price path. Missing candles are downloaded first, one paged
+    request per market; None where no candle covers the trade.
+    """
+    import numpy as np
+
+    registry = get_symbol_registry()
+    firsts: Dict[str, int] = {}
+    for t in trades:
+        quote = legs[t.symbol][1]
+        if quote not in BASE_ASSETS:
+            firsts[quote] = min(firsts.get(quote, t.time), t.time)
+    paths = {quote: registry.path_to_quote(quote) for quote in firsts}
+    closes = {}
+    for quote, path in paths.items():
+        for symbol, _ in path or []:
+            if symbol in closes:
+                continue
+            try:
+                sync_klines(symbol, interval="1d", start_time=firsts[quote])
+            except RuntimeError as e:
+                logger.warning("Could not download the %s candles, using the stored ones: %s", symbol, e)
+            klines = load_klines(symbol, interval="1d")
+            closes[symbol] = (klines["close_time"].to_numpy(), klines["close"].to_numpy())
+
+    def price_at(quote: str, ts: int) -> Optional[float]:
+        path = paths[quote]
+        if path is None:
+            return None
+        value = 1.0
+        for symbol, inverted in path:
+            close_times, close = closes[symbol]
+            i = int(np.searchsorted(close_times, ts, side="right")) - 1
+            if i < 0 or not close[i]:
+                return None
+            value = value / close[i] if inverted else value * close[i]
+        return float(value)
+
+    return [
+        1.0 if legs[t.symbol][1] in BASE_ASSETS else price_at(legs[t.symbol][1], t.time)
+        for t in trades
+    ]
+
+
+def replay(
+    book: LotBook,
+    trades: list,
+    rates: Optional[Sequence[float]] = None,
+    on_realized: Optional[Callable[[int, float], None]] = None,
+) -> set:
+    """
+    Replay trades (in time order) on the book; returns the assets whose
+    lots changed. A trade acquires one asset and disposes of the other:
+    both legs are booked, except stablecoin legs, which carry no P/L.
+
+    :param rates: USDT price of one unit of the book's currency at each
+        trade (see fx.get_rates_at); prices are in USDT if None
+    :param on_realized: called with (trade time, realized P/L) for every disposal
+    :raises ValueError: if no stored candle prices the quote asset of a trade
+        (run backfill-prices); nothing is booked then
+    """
+    registry = get_symbol_registry()
+    legs = {t.symbol: registry.split_symbol(t.symbol) for t in trades}
+    assets = book.assets() | {a for pair in legs.values() for a in pair}
+    book.decimals.update(get_asset_precisions().get_many(assets))
+    quote_prices = _quote_prices(trades, legs)
+    for t, quote_price in zip(trades, quote_prices):
+        if quote_price is None:
+            raise ValueError(f"No {legs[t.symbol][1]} price for trade {t.id} of {t.symbol} at {t.time}")
+    changed = set()
+    for i, t in enumerate(trades):
+        base, quote = legs[t.symbol]
+        rate = float(rates[i]) if rates is not None else 1.0
+        # Express the trade price in USDT for non-USDT quotes (e.g. ETHBTC),
+        # then in the book's currency at the trade's date
+        quote_price = quote_prices[i] / rate
+        price = t.price * quote_price
+        realized = []
+        if t.qty_units >= 0:
+            book.acquire(base, t.qty_units, price)
+            if quote not in BASE_ASSETS:
+                realized.append(book.dispose(quote, t.quote_qty_units, quote_price))
+        else:
+            realized.append(book.dispose(base, -t.qty_units, price))
+            if quote not in BASE_ASSETS:
+                book.acquire(quote, -t.quote_qty_units, quote_price)
+        if on_realized is not None:
+            for pl in realized:
+                on_realized(t.time, pl)
+        changed.update((base, quote))
+    return changed - BASE_ASSETS
+
+
+class LotService:
+    """
+    Cost basis lots of one account, kept up to date incrementally.
+
+    The book (open lots + realized P/L per asset) is persisted in the
+    `lot_states` table together with a watermark: the (time, id) of the
+    last trade applied and the number of trades up to it. update() only
+    replays trades past the watermark; if older trades showed up since
+    (late sync of another symbol), the book is rebuilt from scratch.
+    """
+
+    def __init__(self, account_id: int = DEFAULT_ACCOUNT_ID, method: str = COST_BASIS_METHOD):
+        """
+        :param account_id: account whose trades are tracked
+        :param method: "fifo", "lifo" or "average"
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown cost basis method: {method} (expected one of {', '.join(METHODS)})")
+        self.account_id = account_id
+        self.method = method
+        self._lock = threading.Lock()
+
+    def _meta_key(self, name: str) -> str:
+        return f"lots:{self.method}:{name}"
+
+    def _read_watermark(self, session) -> tuple:
+        values = dict(
+            session.query(SyncMeta.key, SyncMeta.value).filter(
+                SyncMeta.account_id == self.account_id,
+                SyncMeta.key.in_([self._meta_key(n) for n in ("time", "pk", "count")]),
+            ).all()
+        )
+        return tuple(values.get(self._meta_key(n), 0) for n in ("time", "pk", "count"))
+
+    def _load_book(self, session) -> LotBook:
+        book = LotBook(self.method)
+        states = session.query(LotState).filter_by(account_id=self.account_id, method=self.method)
+        for state in states:
+            book.lots[state.asset] = deque(json.loads(state.lots))
+            book.realized[state.asset] = state.realized
+        return book
+
+    def _trades_query(self, session):
+        return session.query(Trade).filter(Trade.account_id == self.account_id)
+
+    def _up_to(self, last_time: int, last_id: int):
+        return or_(Trade.time < last_time, and_(Trade.time == last_time, Trade.pk <= last_id))
+
+    def update(self) -> LotBook:
+        """
+        Apply the trades stored since the last update and persist the book.
+        Returns the up-to-date book.
+        """
+        with self._lock:
+            session = SessionLocal()
+            try:
+                watermark = self._read_watermark(session)
+                last_time, last_id, count = watermark
+                applied = self._trades_query(session).filter(self._up_to(last_time, last_id))
+                rebuild = applied.with_entities(func.count()).scalar() != count
+                if rebuild:
+                    # Trades older than the watermark were stored since: replay all
+                    book, count = LotBook(self.method), 0
+                    pending = self._trades_query(session)
+                else:
+                    book = self._load_book(session)
+                    pending = self._trades_query(session).filter(~self._up_to(last_time, last_id))
+                trades = pending.order_by(Trade.time, Trade.pk).all()
+            finally:
+                session.close()
+
+            changed = replay(book, trades)
+            if trades or rebuild:
+                if trades:
+                    last_time, last_id = trades[-1].time, trades[-1].pk
+                new_watermark = (last_time, last_id, count + len(trades))
+                run_write(lambda s: self._save(s, book, changed, rebuild, watermark, new_watermark))
+            return book
+
+    def _save(
+        self, session, book: LotBook, changed: set, rebuild: bool, watermark: tuple, new_watermark: tuple
+    ) -> None:
+        # Another process may have updated the book meanwhile: keep its result
+        if self._read_watermark(session) != watermark:
+            return
+        if rebuild:
+            session.query(LotState).filter_by(account_id=self.account_id, method=self.method).delete()
+            session.flush()
+        for asset in changed:
+            state = session.get(LotState, (self.account_id, self.method, asset))
+            if state is None:
+                state = LotState(account_id=self.account_id, method=self.method, asset=asset)
+                session.add(state)
+            state.lots = json.dumps(list(book.lots.get(asset, ())))
+            state.realized = book.realized.get(asset, 0.0)
+        for name, value in zip(("time", "pk", "count"), new_watermark):
+            key = self._meta_key(name)
+            meta = session.query(SyncMeta).filter_by(account_id=self.account_id, key=key).first()
+            if meta is None:
+                session.add(SyncMeta(account_id=self.account_id, key=key, value=value))
+            else:
+                meta.value = value
+
+    @staticmethod
+    def empty_position() -> dict:
+        """
+        Cost basis figures of an asset without lots.
+        """
+        return LotBook().position("")
+
+    def positions(self, prices: Dict[str, Optional[float]]) -> Dict[str, dict]:
+        """
+        Cost basis figures of every asset in the book (see LotBook.position),
+        unrealized P/L being valued at `prices` (USDT).
+        """
+        book = self.update()
+        return {asset: book.position(asset, prices.get(asset)) for asset in book.assets()}
+
+
+__all__ = ["COST_BASIS_METHOD", "METHODS", "LotBook", "LotService", "replay"]
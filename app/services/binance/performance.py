@@ -1,92 +1,208 @@
 # app/services/binance/performance.py
 
-import pandas as pd
+from typing import TYPE_CHECKING
+
+from sqlalchemy import case, func, select, union_all
 from sqlalchemy.orm import Session
 from datetime import datetime
-from ..db import Deposit, Withdrawal, Trade
-from ...utils.pricing import get_price_at
-from ...utils.utils import from_timestamp
+from ..amounts import DEFAULT_DECIMALS, units_to_float
+from ..db import Asset, Deposit, Withdrawal, Trade
+from ..fx import convert_series
+from ..pricing import get_asset_price_at
+from ..utils.utils import from_timestamps
+from .portfolio import BASE_ASSETS
+from .symbols import get_symbol_registry
+
+if TYPE_CHECKING:  # pandas is imported lazily, on first computation
+    import pandas as pd
+
+
+# Rows fetched per round trip when scanning the ledger. On PostgreSQL the
+# scan uses a server-side (named) cursor, so memory stays bounded.
+LEDGER_BATCH_SIZE = 5000
 
 
-def _load_transactions(db: Session):
+def _ledger(db: Session, account_id: int = None):
     """
-    Fetch all deposits, withdrawals and trades from the DB.
-    Returns a list of (timestamp_ms, asset, net_amount) tuples.
+    Signed asset movements of deposits, withdrawals and trades, as one
+    UNION ALL subquery with columns (time, asset, amount), amount being an
+    exact integer in units of the asset (see amounts)
+    (of one account if account_id is given, of all accounts otherwise).
     """
-    txs = []
+    def scoped(stmt, model):
+        if account_id is not None:
+            stmt = stmt.where(model.account_id == account_id)
+        return stmt
+
+    parts = [
+        # deposits add to balance
+        scoped(select(Deposit.time, Deposit.asset, Deposit.amount_units.label("amount")), Deposit),
+        # withdrawals subtract from balance
+        scoped(select(Withdrawal.time, Withdrawal.asset, (-Withdrawal.amount_units).label("amount")), Withdrawal),
+    ]
+
+    # trades: Trade.qty is positive for buy, negative for sell, and
+    # Trade.symbol is any spot pair like 'BTCUSDT' or 'ETHBTC'; the split
+    # into base / quote asset is inlined as CASE expressions
+    registry = get_symbol_registry()
+    symbols = [row[0] for row in db.execute(scoped(select(Trade.symbol).distinct(), Trade))]
+    if symbols:
+        legs = {symbol: registry.split_symbol(symbol) for symbol in symbols}
+        base = case({s: b for s, (b, _) in legs.items()}, value=Trade.symbol)
+        quote = case({s: q for s, (_, q) in legs.items()}, value=Trade.symbol)
+        # buying base spends quote, selling base adds quote
+        parts.append(scoped(select(Trade.time, base.label("asset"), Trade.qty_units.label("amount")), Trade))
+        parts.append(scoped(
+            select(Trade.time, quote.label("asset"), (-Trade.quote_qty_units).label("amount")), Trade))
+
+    return union_all(*parts).subquery("ledger")
 
-    # deposits add to balance
-    for d in db.query(Deposit).all():
-        txs.append((d.time, d.asset,  float(d.amount)))
 
-    # withdrawals subtract from balance
-    for w in db.query(Withdrawal).all():
-        txs.append((w.time, w.asset, -float(w.amount)))
+def _running_balances(db: Session, account_id: int = None, after: int = None):
+    """
+    Balance of each asset after every ledger timestamp, computed by the
+    database with a window function (running integer SUM per asset, hence
+    exact) and streamed back in time order.
+    Yields (timestamp_ms, asset, balance) tuples; every row sharing a
+    timestamp carries the balance after all movements at that timestamp.
+    Balances are converted from units to floats only here, for valuation.
+    With `after`, only the rows later than that timestamp are returned
+    (their balances still count every earlier movement).
+    """
+    ledger = _ledger(db, account_id)
+    decimals = dict(db.execute(select(Asset.asset, Asset.decimals)).all())
+    # Default RANGE frame: rows at the same time are peers, included together
+    balance = func.sum(ledger.c.amount).over(partition_by=ledger.c.asset, order_by=ledger.c.time)
+    balances = select(ledger.c.time, ledger.c.asset, balance.label("balance"))
+    if after is not None:
+        # filter outside of the window, so earlier rows are still summed
+        balances = balances.subquery("balances")
+        balances = select(balances).where(balances.c.time > after)
+    stmt = balances.order_by("time").execution_options(yield_per=LEDGER_BATCH_SIZE)
+    for row in db.execute(stmt):
+        yield int(row.time), row.asset, units_to_float(int(row.balance), decimals.get(row.asset, DEFAULT_DECIMALS))
 
-    # trades: assume Trade.qty is positive for buy, negative for sell
-    # and Trade.symbol is like 'BTCUSDT'
-    for t in db.query(Trade).all():
-        base = t.symbol.replace("USDT", "")
-        qty  = float(t.qty)
-        # buying base spends USDT, selling base adds USDT
-        txs.append((t.time, base,           qty))
-        txs.append((t.time, "USDT",       -qty * float(t.price)))
 
-    return txs
+def count_ledger_rows(db: Session, account_id: int = None, until: int = None) -> int:
+    """
+    Number of ledger movements (at or before `until` if given): unchanged
+    when a sync only adds later rows.
+    """
+    ledger = _ledger(db, account_id)
+    stmt = select(func.count()).select_from(ledger)
+    if until is not None:
+        stmt = stmt.where(ledger.c.time <= until)
+    return int(db.execute(stmt).scalar())
 
 
-def build_value_timeseries(db: Session) -> pd.Series:
+def balance_frame(rows) -> "pd.DataFrame":
     """
-    Reconstructs the portfolio's total USDT value at each transaction timestamp.
-    Returns a pandas Series indexed by datetime, with total_value in USDT.
+    DataFrame of running balances (time, asset, balance) rows: indexed by
+    time (ms), one float column per asset (a balance is carried until the
+    asset moves again, 0 before its first movement).
     """
-    txs = _load_transactions(db)
-    # sort by time
-    txs.sort(key=lambda x: x[0])
+    import pandas as pd
 
-    # track running balances per asset
-    balances = {}
-    records = []
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=["time", "asset", "balance"])
+    if frame.empty:
+        return pd.DataFrame(index=pd.Index([], dtype="int64", name="time"), dtype="float64")
+    # assets as plain strings (the Arrow cache stores them as categories)
+    frame = frame.astype({"asset": str})
+    # every row of a timestamp carries the same balance of its asset
+    frame = frame.pivot_table(index="time", columns="asset", values="balance", aggfunc="last")
+    frame.columns.name = None
+    return frame.ffill().fillna(0.0)
 
-    for ts, asset, amt in txs:
-        balances[asset] = balances.get(asset, 0.0) + amt
 
-        # compute total USDT-equivalent value after this tx
+def build_balance_frame(db: Session, account_id: int = None) -> "pd.DataFrame":
+    """
+    Balance of every asset after each ledger timestamp (see balance_frame),
+    from the on-disk analytics cache when enabled (see analytics_store).
+    """
+    from .analytics_store import get_analytics_store
+
+    store = get_analytics_store()
+    if store is not None:
+        return store.balance_frame(db, account_id)
+    return balance_frame(list(_running_balances(db, account_id)))
+
+
+def value_records(rows, balances: dict = None):
+    """
+    Total USDT value after each ledger timestamp of running balances rows
+    (time, asset, balance), starting from `balances` ({asset: balance}
+    before the first row, updated in place).
+    Yields (timestamp_ms, value) tuples.
+    """
+    balances = {} if balances is None else balances
+
+    def value_at(ts):
+        # compute total USDT-equivalent value after the txs at ts
         total = 0.0
         for a, bal in balances.items():
             if bal == 0:
                 continue
-            if a == "USDT" or a == "BUSD":
+            if a in BASE_ASSETS:
                 total += bal
             else:
-                price = get_price_at(f"{a}USDT", ts)
+                price = get_asset_price_at(a, ts)
                 total += bal * (price or 0.0)
-        dt = from_timestamp(ts)
-        records.append((dt, total))
+        return total
 
-    # collapse to one value per timestamp (in case of multiple txs at same ts)
-    df = pd.DataFrame(records, columns=["datetime", "value"])
-    df = df.groupby("datetime")["value"].last()
+    current = None
+    for ts, asset, balance in rows:
+        if current is not None and ts != current:
+            yield current, value_at(current)
+        current = ts
+        balances[asset] = balance
+    if current is not None:
+        yield current, value_at(current)
+
+
+def value_series(times, values) -> "pd.Series":
+    """
+    Value series indexed by (local) datetime from timestamps (ms) and values.
+    """
+    import pandas as pd
+
+    ts = pd.Series(values, index=from_timestamps(times).rename("datetime"), dtype="float64", name="value")
+    # collapse to one value per datetime (in case of equal datetimes)
+    ts = ts.groupby(level=0).last()
     # ensure a monotonic time index
-    df = df.sort_index()
-    return df
+    return ts.sort_index()
+
 
+def build_value_timeseries(db: Session, account_id: int = None) -> "pd.Series":
+    """
+    Reconstructs the portfolio's total USDT value at each transaction timestamp.
+    Returns a pandas Series indexed by datetime, with total_value in USDT.
+    Served from the on-disk analytics cache when enabled, where only the
+    timestamps added since the last sync are valued (see analytics_store).
+    """
+    from .analytics_store import get_analytics_store
 
-def compute_returns(ts: pd.Series) -> pd.Series:
+    store = get_analytics_store()
+    if store is not None:
+        return store.value_timeseries(db, account_id)
+    records = list(value_records(_running_balances(db, account_id)))
+    return value_series([t for t, _ in records], [v for _, v in records])
+
+
+def compute_returns(ts: "pd.Series") -> "pd.Series":
     """
     Simple periodic returns: r_t = (V_t / V_{t-1}) - 1
     """
     return ts.pct_change().fillna(0.0)
 
 
-def compute_cumulative_returns(returns: pd.Series) -> pd.Series:
+def compute_cumulative_returns(returns: "pd.Series") -> "pd.Series":
     """
     Cumulative returns series: (1 + r_1) * (1 + r_2) * … - 1
     """
     return (1 + returns).cumprod() - 1
 
 
-def compute_max_drawdown(cum_rets: pd.Series) -> float:
+def compute_max_drawdown(cum_rets: "pd.Series") -> float:
     """
     Maximum drawdown: max peak-to-trough percentage drop.
     """
@@ -95,7 +211,7 @@ def compute_max_drawdown(cum_rets: pd.Series) -> float:
     return float(drawdowns.min())
 
 
-def compute_cagr(ts: pd.Series) -> float:
+def compute_cagr(ts: "pd.Series") -> float:
     """
     Compound Annual Growth Rate.
     CAGR = (V_end / V_start)^(1/years) - 1
@@ -110,19 +226,128 @@ def compute_cagr(ts: pd.Series) -> float:
     return float((end / start) ** (1.0 / years) - 1.0)
 
 
-def get_performance(db: Session) -> dict:
+def merge_value_timeseries(series: list) -> "pd.Series":
     """
-    High-level summary of key performance metrics.
-    Returns a dict with series and scalars.
+    Sum several value series (e.g. one per account) into one: each series
+    keeps its last value until its next point (forward fill).
+    """
+    import pandas as pd
+
+    series = [ts for ts in series if not ts.empty]
+    if not series:
+        return pd.Series(dtype="float64")
+    frame = pd.concat(series, axis=1).sort_index().ffill().fillna(0.0)
+    return frame.sum(axis=1)
+
+
+def summarize(ts: "pd.Series") -> dict:
+    """
+    Metrics of a value series, as returned by get_performance().
     """
-    ts       = build_value_timeseries(db)
     rets     = compute_returns(ts)
     cum_rets = compute_cumulative_returns(rets)
 
     return {
-        "value_timeseries":   ts,             # pd.Series[datetime -> USDT value]
+        "value_timeseries":   ts,             # pd.Series[datetime -> value in currency]
         "returns":            rets,           # pd.Series of simple returns
         "cumulative":         cum_rets,       # pd.Series of cum. returns
         "max_drawdown":       compute_max_drawdown(cum_rets),
         "cagr":               compute_cagr(ts),
     }
+
+
+def get_performance(db: Session, currency: str = None, account_id: int = None) -> dict:
+    """
+    High-level summary of key performance metrics.
+    Returns a dict with series and scalars, valued in `currency`
+    (default reporting currency).
+    """
+    ts = convert_series(build_value_timeseries(db, account_id), currency)
+    return summarize(ts)
+
+
+class PerformanceService:
+    """
+    Performance metrics computed from the transactions stored in the DB.
+    """
+
+    def __init__(self, db: Session, account_id: int = None):
+        """
+        :param db: SQLAlchemy session
+        :param account_id: restrict to one account (all accounts if None)
+        """
+        self.db = db
+        self.account_id = account_id
+
+    def compute_metrics(
+        self,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        currency: str = None,
+    ) -> dict:
+        """
+        Same as get_performance(), with the series restricted to [start_date, end_date].
+        """
+        perf = get_performance(self.db, currency, self.account_id)
+        if start_date is None and end_date is None:
+            return perf
+        return summarize(perf["value_timeseries"].loc[start_date:end_date])
+
+    def chart_series(
+        self,
+        series: str = "value",
+        period: str = "all",
+        points: int = None,
+        currency: str = None,
+        start_date: datetime = None,
+        end_date: datetime = None,
+    ) -> dict:
+        """
+        Downsampled value / return series for charts, cached until the
+        stored data changes (see charts.get_chart_series).
+        """
+        from ..fx import normalize_currency
+        from ..sync_utils import data_version
+        from .charts import get_chart_series
+
+        currency = normalize_currency(currency)
+        return get_chart_series(
+            lambda: convert_series(build_value_timeseries(self.db, self.account_id), currency),
+            scope=("account", self.account_id),
+            currency=currency,
+            version=data_version(self.account_id, self.db),
+            series=series,
+            period=period,
+            points=points,
+            start=start_date,
+            end=end_date,
+        )
+
+    def attribution(
+        self,
+        period: str = "all",
+        currency: str = None,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        window: int = None,
+    ) -> dict:
+        """
+        Per-asset contribution to return and drawdown, correlation and
+        risk decomposition over a range, cached until the stored data
+        changes (see attribution.get_attribution).
+        """
+        from ..fx import normalize_currency
+        from ..sync_utils import data_version
+        from .attribution import get_attribution
+
+        currency = normalize_currency(currency)
+        return get_attribution(
+            lambda: [build_balance_frame(self.db, self.account_id)],
+            scope=("account", self.account_id),
+            currency=currency,
+            version=data_version(self.account_id, self.db),
+            period=period,
+            start=start_date,
+            end=end_date,
+            window=window,
+        )
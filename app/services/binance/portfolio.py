@@ -3,10 +3,15 @@
 from typing import List, Optional, Dict
 from datetime import datetime
 
-from ..pricing import get_price_at, get_current_price
-from ..utils    import from_timestamp
+from ..amounts import get_asset_precisions, to_units, units_to_float
+from ..fx import convert_frame, convert_value
+from ..pricing import get_asset_price_at, get_asset_prices
+from ..utils.utils import from_timestamp
+from .snapshot import AccountSnapshotProvider
 
-BASE_ASSETS = {"USDT", "BUSD", "USDC", "EUR", "USD"}
+# Assets valued 1:1 in USDT. EUR is not one of them: it is priced through
+# EURUSDT like any other asset, and reports can be converted to EUR via fx.
+BASE_ASSETS = {"USDT", "BUSD", "USDC", "USD"}
 
 
 class PortfolioCalculator:
@@ -14,64 +19,91 @@ class PortfolioCalculator:
     Compute invested capital, current value and P/L for a Binance account.
     """
 
-    def __init__(self, client, quote_asset: str = "USDT"):
+    def __init__(self, client, quote_asset: str = "USDT", invested=None, snapshots=None):
         """
         :param client: an instance of BinanceClient
         :param quote_asset: the asset in which P/L is expressed (e.g. "USDT")
+        :param invested: optional InvestedCapitalService holding the
+            invested capital aggregates maintained at sync
+        :param snapshots: optional AccountSnapshotProvider shared with the
+            other services (a private one is used otherwise)
         """
         self.client = client
         self.quote_asset = quote_asset
+        self.invested = invested
+        self.snapshots = snapshots or AccountSnapshotProvider(client)
 
     def fetch_deposits(self, since_ts: Optional[int] = None) -> List[Dict]:
         """
         Returns list of deposit dicts from Binance (each with keys 'asset','amount','time','txId',…).
         If since_ts is provided, only returns deposits with time >= since_ts.
         """
-        return self.client.get_deposit_history(startTime=since_ts) or []
+        return self.client.get_deposit_history(start_time=since_ts) or []
 
     def fetch_balances(self) -> List[Dict]:
         """
         Returns account balances: each dict has 'asset', 'free', 'locked'.
         """
-        acct = self.client.get_account()
-        return acct.get("balances", [])
+        return self.snapshots.get().balances
 
     def calculate_invested(
         self,
-        deposits: List[Dict],
-        year: Optional[int] = None
+        deposits: Optional[List[Dict]] = None,
+        year: Optional[int] = None,
+        currency: Optional[str] = None,
     ) -> float:
         """
         Sum of all deposits, converted to quote_asset.
         If year is provided, only includes deposits whose timestamp falls in that year.
+        If currency is provided, each deposit is converted at the FX rate of its date.
+
+        Without `deposits`, the stored aggregates of the InvestedCapitalService
+        are read (no network call); otherwise the given deposit dicts are valued.
         """
-        total = 0.0
-        for dep in deposits:
-            ts = int(dep.get("time", 0))
-            dep_dt = from_timestamp(ts)
-            if year is not None and dep_dt.year != year:
+        if deposits is None:
+            if self.invested is None:
+                raise ValueError("No deposits given and no invested capital aggregates available")
+            return self.invested.invested(year=year, currency=currency)
+
+        import pandas as pd
+
+        deposits = [
+            dep for dep in deposits
+            if year is None or from_timestamp(int(dep.get("time", 0))).year == year
+        ]
+        decimals = get_asset_precisions().get_many({dep.get("asset") for dep in deposits})
+        ledger = pd.DataFrame(
+            {
+                "time": [int(dep.get("time", 0)) for dep in deposits],
+                "asset": [dep.get("asset") for dep in deposits],
+                # exact fixed-point amounts from the API decimal strings
+                "units": [to_units(dep.get("amount", "0"), decimals[dep.get("asset")]) for dep in deposits],
+            }
+        ).astype({"time": "int64", "units": "int64"})
+
+        prices = []
+        for ts, asset in zip(ledger["time"], ledger["asset"]):
+            if asset in BASE_ASSETS:
+                prices.append(1.0)
                 continue
+            # direct market (e.g. "ETHUSDT") or cross rate (X->BTC->USDT)
+            price = get_asset_price_at(asset, int(ts))
+            if price is None:
+                raise ValueError(f"Price for {asset} at {ts} not found")
+            prices.append(price)
 
-            asset = dep.get("asset")
-            amt   = float(dep.get("amount", 0))
+        scale = ledger["asset"].map(decimals).astype("int64")
+        ledger["value"] = units_to_float(ledger["units"], scale) * pd.Series(prices, index=ledger.index, dtype="float64")
 
-            if asset in BASE_ASSETS:
-                total += amt
-            else:
-                # e.g. "ETHUSDT"
-                sym = f"{asset}{self.quote_asset}"
-                price = get_price_at(sym, ts)
-                if price is None:
-                    raise ValueError(f"Price for {sym} at {ts} not found")
-                total += amt * price
+        # Convert the whole deposit ledger to the reporting currency at once
+        return float(convert_frame(ledger[["time", "value"]], currency)["value"].sum())
 
-        return total
-
-    def calculate_current_value(self, balances: List[Dict]) -> float:
+    def calculate_current_value(self, balances: List[Dict], currency: Optional[str] = None) -> float:
         """
-        Sum of (free + locked) for each asset, converted to quote_asset.
+        Sum of (free + locked) for each asset, converted to quote_asset,
+        then to the reporting currency at the live rate if one is given.
         """
-        total = 0.0
+        amounts = {}
         for bal in balances:
             asset = bal.get("asset")
             free  = float(bal.get("free",  0))
@@ -80,31 +112,39 @@ class PortfolioCalculator:
 
             if amt == 0:
                 continue
+            amounts[asset] = amounts.get(asset, 0.0) + amt
 
+        # One batched ticker request for every non-base asset; assets with
+        # no market path to the quote asset cannot be valued and are skipped
+        prices = get_asset_prices(a for a in amounts if a not in BASE_ASSETS)
+
+        total = 0.0
+        for asset, amt in amounts.items():
             if asset in BASE_ASSETS:
                 total += amt
-            else:
-                sym = f"{asset}{self.quote_asset}"
-                price = get_current_price(sym)
-                total += amt * price
+            elif prices.get(asset) is not None:
+                total += amt * prices[asset]
 
-        return total
+        return convert_value(total, currency)
 
     def get_overview(
         self,
         since_ts: Optional[int] = None,
-        year: Optional[int] = None
+        year: Optional[int] = None,
+        currency: Optional[str] = None,
     ) -> Dict[str, float]:
         """
         Fetch deposits (since since_ts), balances, then compute:
         - invested: sum of deposits (filtered by year if given)
         - current_value: live portfolio value
         - profit_loss: current_value - invested
+        All amounts are expressed in `currency` (default reporting currency).
         """
-        deps     = self.fetch_deposits(since_ts)
+        # Stored aggregates when available, Binance deposit history otherwise
+        deps     = self.fetch_deposits(since_ts) if self.invested is None or since_ts else None
         bals     = self.fetch_balances()
-        invested = self.calculate_invested(deps, year)
-        current  = self.calculate_current_value(bals)
+        invested = self.calculate_invested(deps, year, currency)
+        current  = self.calculate_current_value(bals, currency)
         pl       = current - invested
 
         return {
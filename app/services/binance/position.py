@@ -1,7 +1,8 @@
 # app/services/binance/position.py
 
 from .api_client import BinanceClient
-from app.utils.pricing import get_current_price
+from ..pricing import get_asset_prices
+from .snapshot import AccountSnapshotProvider
 
 
 class PositionService:
@@ -9,19 +10,34 @@ class PositionService:
     Manage and compute spot positions from a Binance account.
     """
 
-    def __init__(self, client: BinanceClient):
+    def __init__(self, client: BinanceClient, lots=None, snapshots=None):
         """
         :param client: an instance of your low-level BinanceClient
+        :param lots: optional LotService adding cost basis figures to positions
+        :param snapshots: optional AccountSnapshotProvider shared with the
+            other services (a private one is used otherwise)
         """
         self.client = client
+        self.lots = lots
+        self.snapshots = snapshots or AccountSnapshotProvider(client)
 
     def get_balances(self) -> list[dict]:
         """
-        Fetch raw balances from Binance account endpoint.
+        Raw balances from the Binance account endpoint.
         Returns the 'balances' list from /api/v3/account.
         """
-        account_info = self.client.get_account()
-        return account_info.get("balances", [])
+        return self.snapshots.get().balances
+
+    def _position(self, asset: str, total_qty: float, price, cost_basis: dict) -> dict:
+        position = {
+            "asset": asset,
+            "quantity": total_qty,
+            "price": price,
+            "value": total_qty * price if price is not None else None,
+        }
+        if self.lots is not None:
+            position.update(cost_basis.get(asset) or self.lots.empty_position())
+        return position
 
     def get_open_positions(self) -> list[dict]:
         """
@@ -33,40 +49,35 @@ class PositionService:
           - quantity: free + locked
           - price: price in USDT (None if unavailable)
           - value: quantity * price (None if price is None)
+        and, when a LotService is set (see binance.lots):
+          - avg_entry_price, cost_basis: of the open lots, in USDT
+          - realized_pnl, unrealized_pnl: in USDT (unrealized None without price)
+          - lot_quantity: quantity covered by lots (deposited coins have none)
         """
-        positions = []
-        for bal in self.get_balances():
-            asset = bal["asset"]
-            qty_free = float(bal.get("free", 0))
-            qty_locked = float(bal.get("locked", 0))
-            total_qty = qty_free + qty_locked
-            if total_qty <= 0:
-                continue
+        quantities = self.snapshots.get().quantities()
 
-            # Attempt to fetch price vs USDT
-            symbol = f"{asset}USDT"
-            try:
-                price = get_current_price(symbol)
-            except Exception:
-                price = None
+        # Prices vs USDT in one batched request, through a cross rate when
+        # there is no direct USDT market (None if no market path exists)
+        prices = get_asset_prices(quantities)
 
-            positions.append({
-                "asset": asset,
-                "quantity": total_qty,
-                "price": price,
-                "value": total_qty * price if price is not None else None,
-            })
+        cost_basis = self.lots.positions(prices) if self.lots is not None else {}
 
-        return positions
+        return [
+            self._position(asset, total_qty, prices.get(asset), cost_basis)
+            for asset, total_qty in quantities.items()
+        ]
 
     def get_position(self, asset: str) -> dict | None:
         """
         Get a single position by asset symbol, or None if not held.
+        Only this asset is looked up and priced.
         """
-        for pos in self.get_open_positions():
-            if pos["asset"] == asset:
-                return pos
-        return None
+        total_qty = self.snapshots.get().quantity(asset)
+        if total_qty <= 0:
+            return None
+        price = get_asset_prices([asset]).get(asset)
+        cost_basis = self.lots.positions({asset: price}) if self.lots is not None else {}
+        return self._position(asset, total_qty, price, cost_basis)
 
     def total_portfolio_value(self) -> float:
         """
@@ -0,0 +1,123 @@
+# app/services/binance/rate_limit.py
+
+import os
+import threading
+import time
+from typing import Optional
+
+# Binance allows 6000 request weight per minute per IP; keep a safety margin.
+# All accounts synced from this host share the same IP, hence one budget.
+REQUEST_WEIGHT_PER_MINUTE = int(os.getenv("BINANCE_WEIGHT_PER_MINUTE", 4800))
+
+# Request weight of the endpoints we call (default 1)
+# Docs: https://binance-docs.github.io/apidocs/spot/en/#limits
+ENDPOINT_WEIGHTS = {
+    "/api/v3/account": 20,
+    "/api/v3/myTrades": 20,
+    "/api/v3/exchangeInfo": 20,
+    "/api/v3/klines": 2,
+    "/api/v3/ticker/price": 2,
+    "/sapi/v1/capital/deposit/hisrec": 1,
+    "/sapi/v1/capital/withdraw/history": 1,
+}
+
+
+def request_weight(path: str, params: Optional[dict] = None) -> int:
+    """
+    Weight charged by Binance for a request to `path`.
+    """
+    if path == "/api/v3/ticker/price" and not (params or {}).get("symbol"):
+        # Several symbols (or all of them) in one request
+        return 4
+    return ENDPOINT_WEIGHTS.get(path, 1)
+
+
+class WeightBudget:
+    """
+    Token bucket over Binance request weight, shared by every client and
+    thread of the process. acquire() blocks until enough weight is
+    available; the bucket refills continuously at capacity per period.
+    """
+
+    def __init__(self, capacity: int = REQUEST_WEIGHT_PER_MINUTE, period: float = 60.0):
+        """
+        :param capacity: weight allowed per period
+        :param period: refill period in seconds
+        """
+        self.capacity = capacity
+        self.period = period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated) * self.capacity / self.period,
+        )
+        self._updated = now
+
+    def acquire(self, weight: int = 1) -> None:
+        """
+        Block until `weight` can be spent, then spend it.
+        """
+        weight = min(weight, self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                missing = weight - self._tokens
+                self._cond.wait(missing * self.period / self.capacity)
+
+    def try_acquire(self, weight: int = 1) -> float:
+        """
+        Spend `weight` if available now and return 0, otherwise return the
+        seconds to wait before retrying (for callers that must not block,
+        e.g. asyncio tasks).
+        """
+        weight = min(weight, self.capacity)
+        with self._cond:
+            self._refill()
+            if self._tokens >= weight:
+                self._tokens -= weight
+                return 0.0
+            return (weight - self._tokens) * self.period / self.capacity
+
+    def observe_used(self, used: int) -> None:
+        """
+        Align the budget with the weight Binance reports as already used in
+        the current minute (X-MBX-USED-WEIGHT-1M), e.g. by other processes.
+        """
+        with self._cond:
+            self._refill()
+            self._tokens = min(self._tokens, max(self.capacity - used, 0))
+
+
+# Shared budget, created on first use
+_budget: Optional[WeightBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_rate_limiter() -> WeightBudget:
+    """
+    Return the process-wide request weight budget.
+    """
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = WeightBudget()
+        return _budget
+
+
+def share_budget(processes: int) -> WeightBudget:
+    """
+    Limit this process to its share of the per-IP budget, when `processes`
+    worker processes call Binance at the same time (offline jobs).
+    """
+    global _budget
+    with _budget_lock:
+        _budget = WeightBudget(max(REQUEST_WEIGHT_PER_MINUTE // max(processes, 1), 1))
+        return _budget
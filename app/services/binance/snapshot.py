@@ -0,0 +1,189 @@
+# app/services/binance/snapshot.py
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from ..resilience import get_refresher, note_stale
+
+# Seconds an account snapshot may be reused across requests (0: only within
+# one request scope, see snapshot_scope)
+ACCOUNT_SNAPSHOT_TTL = float(os.getenv("ACCOUNT_SNAPSHOT_TTL", 0))
+# When the account endpoint fails, the last good snapshot is served (flagged
+# stale) if younger than this many seconds
+ACCOUNT_STALE_SECONDS = float(os.getenv("ACCOUNT_STALE_SECONDS", 900))
+
+# Snapshots fetched in the current scope: {id(provider): AccountSnapshot}.
+# None outside of a scope.
+_scope: contextvars.ContextVar = contextvars.ContextVar("account_snapshot_scope", default=None)
+
+
+class AccountSnapshot:
+    """
+    One /api/v3/account response, indexed by asset.
+    """
+
+    def __init__(self, account_info: dict, fetched_at: Optional[float] = None):
+        """
+        :param account_info: response of get_account_info()
+        :param fetched_at: time.time() of the fetch (now if None)
+        """
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.balances: List[dict] = account_info.get("balances", [])
+        self._by_asset: Dict[str, dict] = {b["asset"]: b for b in self.balances}
+        self._quantities: Dict[str, float] = {}
+        for b in self.balances:
+            qty = float(b.get("free", 0)) + float(b.get("locked", 0))
+            if qty > 0:
+                self._quantities[b["asset"]] = qty
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def balance(self, asset: str) -> Optional[dict]:
+        """
+        Raw balance dict ('asset', 'free', 'locked') of an asset, or None.
+        """
+        return self._by_asset.get(asset)
+
+    def quantity(self, asset: str) -> float:
+        """
+        free + locked quantity of an asset (0.0 if not held).
+        """
+        return self._quantities.get(asset, 0.0)
+
+    def quantities(self) -> Dict[str, float]:
+        """
+        {asset: free + locked} for every asset with a positive balance.
+        """
+        return dict(self._quantities)
+
+
+class AccountSnapshotProvider:
+    """
+    Hands out the account snapshot of one client: fetched once per
+    snapshot_scope() (e.g. one HTTP request, whatever the number of
+    services reading balances in it), and reused across scopes while
+    younger than `ttl` seconds.
+
+    If the fetch fails (Binance down, circuit open), the last good snapshot
+    younger than ACCOUNT_STALE_SECONDS is served instead, flagged stale
+    (resilience.note_stale), and one background refresh is started; until
+    it completes, requests get the stale snapshot without waiting.
+    """
+
+    def __init__(self, client, ttl: float = ACCOUNT_SNAPSHOT_TTL):
+        """
+        :param client: an instance of BinanceClient
+        :param ttl: cross-scope reuse period in seconds (0 to disable)
+        """
+        self.client = client
+        self.ttl = ttl
+        self._last: Optional[AccountSnapshot] = None
+        # Last successful fetch, kept through invalidate() as a fallback
+        self._last_good: Optional[AccountSnapshot] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> AccountSnapshot:
+        """
+        Snapshot of the current scope, the last one if younger than ttl,
+        or a fresh one.
+        """
+        scope = _scope.get()
+        if scope is not None and id(self) in scope:
+            return scope[id(self)]
+        # One fetch at a time: concurrent readers of the same scope (e.g.
+        # parallel account workers) wait for it rather than refetching
+        with self._lock:
+            if scope is not None and id(self) in scope:
+                return scope[id(self)]
+            snapshot = self._last
+            if snapshot is None or snapshot.age >= self.ttl:
+                snapshot = self._fetch()
+            if scope is not None:
+                scope[id(self)] = snapshot
+            return snapshot
+
+    def _fetch(self) -> AccountSnapshot:
+        # Called with self._lock held
+        fallback = self._last_good
+        if fallback is not None and fallback.age >= ACCOUNT_STALE_SECONDS:
+            fallback = None
+        refresh_key = ("account", id(self))
+        if fallback is not None and get_refresher().running(refresh_key):
+            note_stale(fallback.fetched_at)
+            return fallback
+        try:
+            snapshot = AccountSnapshot(self.client.get_account_info())
+        except RuntimeError:
+            if fallback is None:
+                raise
+            note_stale(fallback.fetched_at)
+            get_refresher().submit([refresh_key], lambda _: self._refresh())
+            return fallback
+        self._last = self._last_good = snapshot
+        return snapshot
+
+    def _refresh(self) -> None:
+        # Background refresh: the network call happens outside of the lock
+        snapshot = AccountSnapshot(self.client.get_account_info())
+        with self._lock:
+            self._last = self._last_good = snapshot
+
+    def invalidate(self) -> None:
+        """
+        Drop the cached snapshot (e.g. after a sync changed balances).
+        """
+        with self._lock:
+            self._last = None
+        scope = _scope.get()
+        if scope is not None:
+            scope.pop(id(self), None)
+
+
+@contextmanager
+def snapshot_scope():
+    """
+    Within the block, every AccountSnapshotProvider fetches its account at
+    most once. Nested scopes share the outer one. Threads started inside
+    must run in a copy of the context (contextvars.copy_context()) to share it.
+    """
+    if _scope.get() is not None:
+        yield
+        return
+    token = _scope.set({})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def open_scope() -> contextvars.Token:
+    """
+    Start a scope without a with-block (Flask before_request); pass the
+    returned token to close_scope().
+    """
+    return _scope.set({})
+
+
+def close_scope(token: contextvars.Token) -> None:
+    try:
+        _scope.reset(token)
+    except ValueError:
+        # Closed from another context (e.g. after a streamed response)
+        _scope.set(None)
+
+
+__all__ = [
+    "ACCOUNT_SNAPSHOT_TTL",
+    "ACCOUNT_STALE_SECONDS",
+    "AccountSnapshot",
+    "AccountSnapshotProvider",
+    "snapshot_scope",
+    "open_scope",
+    "close_scope",
+]
@@ -0,0 +1,229 @@
+# app/services/binance/symbols.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Cache location and refresh period for the exchangeInfo snapshot
+CACHE_DIR = os.getenv("CACHE_DIR", "./.cache")
+EXCHANGE_INFO_TTL = int(os.getenv("EXCHANGE_INFO_TTL", 24 * 3600))
+
+# Intermediate quotes to prefer when several paths have the same length,
+# most liquid first (X->BTC->USDT is preferred over X->TRY->USDT)
+HUB_ASSETS = ("USDT", "BTC", "ETH", "BNB", "FDUSD", "USDC", "BUSD")
+
+# A price leg: (symbol, inverted). The asset price in the next asset is
+# price(symbol), or 1 / price(symbol) when inverted.
+Leg = Tuple[str, bool]
+
+
+class SymbolRegistry:
+    """
+    Registry of Binance spot symbols built from /api/v3/exchangeInfo.
+
+    Holds the graph of tradable quote pairs and, for every asset, the
+    precomputed cheapest path (fewest legs, liquid hubs first) to the
+    quote asset. The exchangeInfo snapshot is cached on disk and only
+    refetched once it is older than `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        cache_path: Optional[str] = None,
+        ttl: int = EXCHANGE_INFO_TTL,
+        quote_asset: str = "USDT",
+    ):
+        """
+        :param client: an instance of BinanceClient (built lazily if None)
+        :param cache_path: JSON file used to persist the exchangeInfo snapshot
+        :param ttl: snapshot refresh period in seconds
+        :param quote_asset: asset every path resolves to
+        """
+        self._client = client
+        self.cache_path = cache_path or os.path.join(CACHE_DIR, "exchange_info.json")
+        self.ttl = ttl
+        self.quote_asset = quote_asset
+        self._lock = threading.Lock()
+        self._fetched_at = 0.0
+        # symbol -> (base, quote)
+        self.symbols: Dict[str, Tuple[str, str]] = {}
+        # asset -> {neighbor asset -> leg pricing asset in neighbor}
+        self.graph: Dict[str, Dict[str, Leg]] = {}
+        # asset -> legs to quote_asset
+        self.paths: Dict[str, List[Leg]] = {}
+        # asset -> number of decimals of its amounts (baseAssetPrecision /
+        # quoteAssetPrecision, the largest over the asset's symbols)
+        self.precision: Dict[str, int] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from .api_client import BinanceClient
+            self._client = BinanceClient()
+        return self._client
+
+    # ---- loading -----------------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        """
+        Load the snapshot on first use and refresh it once the TTL expired.
+        """
+        if self.symbols and time.time() - self._fetched_at < self.ttl:
+            return
+        with self._lock:
+            if self.symbols and time.time() - self._fetched_at < self.ttl:
+                return
+            self.load()
+
+    def load(self, force: bool = False) -> None:
+        """
+        Populate the registry from the disk cache, or from Binance when the
+        cache is missing, stale or `force` is set.
+        """
+        cached = None if force else self._read_cache()
+        if cached is not None:
+            fetched_at, symbols, precision = cached
+        else:
+            try:
+                fetched_at = time.time()
+                symbols, precision = self._fetch_symbols()
+                self._write_cache(fetched_at, symbols, precision)
+            except RuntimeError:
+                # Binance unreachable: a stale snapshot beats no registry at all
+                cached = self._read_cache(max_age=float("inf"))
+                if cached is None:
+                    raise
+                fetched_at, symbols, precision = cached
+        self._build(symbols)
+        self.precision = precision
+        self._fetched_at = fetched_at
+
+    def _fetch_symbols(self) -> Tuple[Dict[str, Tuple[str, str]], Dict[str, int]]:
+        """
+        Fetch exchangeInfo and keep the symbols currently open for trading.
+        Returns ({symbol: (base, quote)}, {asset: precision}).
+        """
+        info = self.client.get_exchange_info()
+        symbols, precision = {}, {}
+        for s in info.get("symbols", []):
+            for asset, key in ((s["baseAsset"], "baseAssetPrecision"), (s["quoteAsset"], "quoteAssetPrecision")):
+                if key in s:
+                    precision[asset] = max(precision.get(asset, 0), int(s[key]))
+            if s.get("status") == "TRADING":
+                symbols[s["symbol"]] = (s["baseAsset"], s["quoteAsset"])
+        return symbols, precision
+
+    def _read_cache(
+        self, max_age: Optional[float] = None
+    ) -> Optional[Tuple[float, Dict[str, Tuple[str, str]], Dict[str, int]]]:
+        """
+        Read the disk snapshot, or None if missing or older than max_age (default: ttl).
+        """
+        max_age = self.ttl if max_age is None else max_age
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        fetched_at = float(data.get("fetched_at", 0))
+        if time.time() - fetched_at >= max_age:
+            return None
+        symbols = {sym: tuple(pair) for sym, pair in data["symbols"].items()}
+        return fetched_at, symbols, data.get("precision", {})
+
+    def _write_cache(
+        self, fetched_at: float, symbols: Dict[str, Tuple[str, str]], precision: Dict[str, int]
+    ) -> None:
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"fetched_at": fetched_at, "symbols": symbols, "precision": precision}, fh)
+        # Atomic replace so concurrent workers never read a partial file
+        os.replace(tmp_path, self.cache_path)
+
+    def _build(self, symbols: Dict[str, Tuple[str, str]]) -> None:
+        """
+        Build the pair graph and precompute every asset's path to quote_asset.
+        """
+        graph: Dict[str, Dict[str, Leg]] = {}
+        for symbol, (base, quote) in symbols.items():
+            graph.setdefault(base, {})[quote] = (symbol, False)
+            graph.setdefault(quote, {})[base] = (symbol, True)
+
+        def hub_rank(asset: str) -> int:
+            return HUB_ASSETS.index(asset) if asset in HUB_ASSETS else len(HUB_ASSETS)
+
+        # BFS outward from the quote asset: the first time an asset is reached
+        # is through the fewest legs, and visiting hubs first breaks ties
+        # in favour of the most liquid intermediates.
+        paths: Dict[str, List[Leg]] = {self.quote_asset: []}
+        queue = deque([self.quote_asset])
+        while queue:
+            parent = queue.popleft()
+            for asset in sorted(graph.get(parent, {}), key=lambda a: (hub_rank(a), a)):
+                if asset in paths:
+                    continue
+                paths[asset] = [graph[asset][parent]] + paths[parent]
+                queue.append(asset)
+
+        self.symbols, self.graph, self.paths = symbols, graph, paths
+
+    # ---- queries -----------------------------------------------------
+
+    def split_symbol(self, symbol: str) -> Tuple[str, str]:
+        """
+        Return (base, quote) for a symbol, e.g. 'ETHBTC' -> ('ETH', 'BTC').
+        Unknown (e.g. delisted) symbols fall back to stripping a known hub suffix.
+        """
+        self._ensure_loaded()
+        pair = self.symbols.get(symbol)
+        if pair is not None:
+            return pair
+        for quote in HUB_ASSETS:
+            if symbol.endswith(quote) and len(symbol) > len(quote):
+                return symbol[: -len(quote)], quote
+        raise ValueError(f"Unknown symbol {symbol}")
+
+    def path_to_quote(self, asset: str) -> Optional[List[Leg]]:
+        """
+        Legs converting `asset` into the quote asset, [] for the quote asset
+        itself, or None when no market connects them.
+        """
+        self._ensure_loaded()
+        return self.paths.get(asset)
+
+    def pairs_between(self, assets: Iterable[str]) -> List[str]:
+        """
+        Return every listed symbol whose base and quote are both in `assets`.
+        """
+        self._ensure_loaded()
+        wanted = set(assets)
+        return sorted(
+            symbol for symbol, (base, quote) in self.symbols.items()
+            if base in wanted and quote in wanted
+        )
+
+    def asset_precision(self, asset: str) -> Optional[int]:
+        """
+        Number of decimals Binance uses for amounts of `asset`, or None if unknown.
+        """
+        self._ensure_loaded()
+        return self.precision.get(asset)
+
+
+# Shared registry instance, created on first use
+_registry: Optional[SymbolRegistry] = None
+
+
+def get_symbol_registry() -> SymbolRegistry:
+    """
+    Return the process-wide SymbolRegistry.
+    """
+    global _registry
+    if _registry is None:
+        _registry = SymbolRegistry()
+    return _registry
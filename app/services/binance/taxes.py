@@ -1,5 +1,10 @@
 from datetime import datetime
 
+from ..db import Trade
+from ..fx import get_rates_at
+from ..utils.utils import from_timestamp
+from .lots import COST_BASIS_METHOD, LotBook, replay
+
 # French crypto tax calculator module
 # PFU (Prélèvement Forfaitaire Unique) = 12.8% income tax + 17.2% social contributions = 30% flat rate
 
@@ -7,6 +12,9 @@ INCOME_TAX_RATE = 0.128
 SOCIAL_CONTRIBUTIONS_RATE = 0.172
 PFU_RATE = INCOME_TAX_RATE + SOCIAL_CONTRIBUTIONS_RATE
 
+# French tax amounts are declared in euros
+TAX_CURRENCY = "EUR"
+
 
 def calculate_net_gain(realized_gains: float, realized_losses: float) -> float:
     """
@@ -46,6 +54,76 @@ def calculate_yearly_tax(realized_gains: float, realized_losses: float, year: in
     return tax
 
 
+def build_report(year: int, currency: str, gains: float, losses: float) -> dict:
+    """
+    Tax report dict from realized gains and losses (both positive floats).
+    """
+    net = calculate_net_gain(gains, losses)
+    return {
+        "year": year,
+        "currency": currency,
+        "realized_gains": gains,
+        "realized_losses": losses,
+        "net_gain": net,
+        "tax_due": calculate_tax(net),
+    }
+
+
+class TaxService:
+    """
+    Build yearly tax reports from the trades stored in the DB.
+    Realized gains come from the cost basis lots (see lots), with the
+    account's cost basis method.
+    """
+
+    def __init__(self, db, account_id: int = None, method: str = COST_BASIS_METHOD):
+        """
+        :param db: SQLAlchemy session
+        :param account_id: restrict to one account (all accounts if None)
+        :param method: cost basis method, "fifo", "lifo" or "average"
+        """
+        self.db = db
+        self.account_id = account_id
+        self.method = method
+
+    def realized_gains_losses(self, year: int = None, currency: str = TAX_CURRENCY) -> tuple:
+        """
+        Replay stored trades on a lot book kept in `currency` and sum the
+        realized profits and losses of its disposals. Amounts are converted
+        trade by trade: the acquisition cost at each buy's date, the
+        proceeds at the disposal date.
+
+        :param year: Only count disposals that happened in this year (all years if None)
+        :param currency: Currency of the result
+        :return: (realized_gains, realized_losses), both positive floats
+        """
+        query = self.db.query(Trade)
+        if self.account_id is not None:
+            query = query.filter(Trade.account_id == self.account_id)
+        trades = query.order_by(Trade.time, Trade.pk).all()
+        gains = losses = 0.0
+
+        def book(time: int, pl: float) -> None:
+            nonlocal gains, losses
+            if year is not None and from_timestamp(time).year != year:
+                return
+            if pl > 0:
+                gains += pl
+            else:
+                losses -= pl
+
+        # USDT price of one unit of currency at each trade, in one as-of join
+        replay(LotBook(self.method), trades, get_rates_at([t.time for t in trades], currency), book)
+        return gains, losses
+
+    def generate_report(self, year: int, currency: str = TAX_CURRENCY) -> dict:
+        """
+        Tax report for the given fiscal year under PFU rules.
+        """
+        gains, losses = self.realized_gains_losses(year, currency)
+        return build_report(year, currency, gains, losses)
+
+
 # Example usage:
 # gains_2024 = 10000.0
 # losses_2024 = 2000.0
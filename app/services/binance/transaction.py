@@ -1,82 +1,179 @@
-from services.db import Deposit, Withdrawal, SessionLocal
+from decimal import Decimal
+
+from ..amounts import get_asset_precisions, to_units
+from ..bulk import bulk_upsert
+from ..db import DEFAULT_ACCOUNT_ID, Deposit, Withdrawal, Trade, SessionLocal, run_write
+from ..utils.utils import from_timestamp
+from .symbols import get_symbol_registry
 from sqlalchemy.exc import SQLAlchemyError
 
 
-def sync_deposits(deposits: list, session=None) -> None:
+def sync_deposits(deposits: list, session=None, account_id: int = DEFAULT_ACCOUNT_ID, commit: bool = True) -> None:
     """
     Upsert deposit records into the database.
 
     :param deposits: List of deposit dicts from Binance API.
     :param session: Optional SQLAlchemy session. If not provided, a new session is created and closed internally.
+    :param account_id: Account the records belong to.
+    :param commit: Commit (default) or only flush, leaving the transaction to the caller.
     """
     own_session = False
     if session is None:
         session = SessionLocal()
         own_session = True
     try:
-        for dep in deposits:
-            tx_id = dep.get("txId")
-            if not tx_id:
-                continue
-            # Check for existing record
-            record = session.query(Deposit).filter_by(txId=tx_id).first()
-            data = {
-                "txId": tx_id,
+        deposits = [dep for dep in deposits if dep.get("txId")]
+        decimals = get_asset_precisions().get_many({dep.get("asset") for dep in deposits}, session)
+        rows = [
+            {
+                "txId": dep["txId"],
+                "account_id": account_id,
                 "asset": dep.get("asset"),
                 "amount": float(dep.get("amount", 0)),
+                "amount_units": to_units(dep.get("amount", "0"), decimals[dep.get("asset")]),
                 "time": int(dep.get("time", 0)),
+                "year": from_timestamp(int(dep.get("time", 0))).year,
             }
-            if record:
-                # Update existing
-                for key, value in data.items():
-                    setattr(record, key, value)
-            else:
-                # Insert new
-                session.add(Deposit(**data))
-        session.commit()
-    except SQLAlchemyError as e:
-        session.rollback()
+            for dep in deposits
+        ]
+        # Existing records (same txId) are updated in place; their value_usdt
+        # is kept (new ones are valued by binance.invested)
+        bulk_upsert(session, Deposit, rows)
+        if commit:
+            session.commit()
+        else:
+            session.flush()
+    except SQLAlchemyError:
+        if commit:
+            session.rollback()
         raise
     finally:
         if own_session:
             session.close()
 
 
-def sync_withdrawals(withdrawals: list, session=None) -> None:
+def sync_withdrawals(withdrawals: list, session=None, account_id: int = DEFAULT_ACCOUNT_ID, commit: bool = True) -> None:
     """
     Upsert withdrawal records into the database.
 
     :param withdrawals: List of withdrawal dicts from Binance API.
     :param session: Optional SQLAlchemy session. If not provided, a new session is created and closed internally.
+    :param account_id: Account the records belong to.
+    :param commit: Commit (default) or only flush, leaving the transaction to the caller.
     """
     own_session = False
     if session is None:
         session = SessionLocal()
         own_session = True
     try:
-        for wd in withdrawals:
-            tx_id = wd.get("txId")
-            if not tx_id:
-                continue
-            record = session.query(Withdrawal).filter_by(txId=tx_id).first()
-            data = {
-                "txId": tx_id,
+        withdrawals = [wd for wd in withdrawals if wd.get("txId")]
+        decimals = get_asset_precisions().get_many({wd.get("asset") for wd in withdrawals}, session)
+        rows = [
+            {
+                "txId": wd["txId"],
+                "account_id": account_id,
                 "asset": wd.get("asset"),
                 "amount": float(wd.get("amount", 0)),
+                "amount_units": to_units(wd.get("amount", "0"), decimals[wd.get("asset")]),
                 "time": int(wd.get("applyTime", wd.get("time", 0))),
             }
-            if record:
-                for key, value in data.items():
-                    setattr(record, key, value)
-            else:
-                session.add(Withdrawal(**data))
-        session.commit()
+            for wd in withdrawals
+        ]
+        bulk_upsert(session, Withdrawal, rows)
+        if commit:
+            session.commit()
+        else:
+            session.flush()
     except SQLAlchemyError:
-        session.rollback()
+        if commit:
+            session.rollback()
         raise
     finally:
         if own_session:
             session.close()
 
 
-__all__ = ["sync_deposits", "sync_withdrawals"]
+def sync_trades(trades: list, session=None, account_id: int = DEFAULT_ACCOUNT_ID, commit: bool = True) -> None:
+    """
+    Upsert trade records into the database.
+    Sells are stored with a negative qty, buys with a positive qty.
+
+    :param trades: List of trade dicts from Binance API (myTrades).
+    :param session: Optional SQLAlchemy session. If not provided, a new session is created and closed internally.
+    :param account_id: Account the records belong to.
+    :param commit: Commit (default) or only flush, leaving the transaction to the caller.
+    """
+    own_session = False
+    if session is None:
+        session = SessionLocal()
+        own_session = True
+    try:
+        trades = [tr for tr in trades if tr.get("id") is not None]
+        registry = get_symbol_registry()
+        legs = {tr.get("symbol"): registry.split_symbol(tr.get("symbol")) for tr in trades}
+        decimals = get_asset_precisions().get_many({a for pair in legs.values() for a in pair}, session)
+        rows = []
+        for tr in trades:
+            base, quote = legs[tr.get("symbol")]
+            sign = 1 if tr.get("isBuyer", True) else -1
+            qty = tr.get("qty", "0")
+            # quoteQty is the exact quote amount of the fill; qty * price otherwise
+            quote_qty = tr.get("quoteQty") or Decimal(str(qty)) * Decimal(str(tr.get("price", "0")))
+            rows.append({
+                "id": int(tr["id"]),
+                "account_id": account_id,
+                "orderId": int(tr.get("orderId", 0)),
+                "symbol": tr.get("symbol"),
+                "price": float(tr.get("price", 0)),
+                "qty": sign * float(qty),
+                "qty_units": sign * to_units(qty, decimals[base]),
+                "quote_qty_units": sign * to_units(quote_qty, decimals[quote]),
+                "time": int(tr.get("time", 0)),
+            })
+        bulk_upsert(session, Trade, rows)
+        if commit:
+            session.commit()
+        else:
+            session.flush()
+    except SQLAlchemyError:
+        if commit:
+            session.rollback()
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+
+class TransactionService:
+    """
+    Persist Binance deposits, withdrawals and trades into the local DB.
+    """
+
+    def __init__(self, db, client, account_id: int = DEFAULT_ACCOUNT_ID):
+        """
+        :param db: SQLAlchemy session
+        :param client: an instance of BinanceClient
+        :param account_id: Account the records belong to
+        """
+        self.db = db
+        self.client = client
+        self.account_id = account_id
+
+    # Writes go through db.run_write: on SQLite they are serialized and
+    # group-committed by the single writer thread instead of competing
+    # for the database lock (e.g. when several accounts sync in parallel).
+
+    def upsert_deposits(self, deposits: list) -> None:
+        run_write(lambda session: sync_deposits(
+            deposits or [], session=session, account_id=self.account_id, commit=False))
+
+    def upsert_withdrawals(self, withdrawals: list) -> None:
+        run_write(lambda session: sync_withdrawals(
+            withdrawals or [], session=session, account_id=self.account_id, commit=False))
+
+    def upsert_trades(self, trades: list) -> None:
+        run_write(lambda session: sync_trades(
+            trades or [], session=session, account_id=self.account_id, commit=False))
+
+
+__all__ = ["sync_deposits", "sync_withdrawals", "sync_trades", "TransactionService"]
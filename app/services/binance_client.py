@@ -6,6 +6,38 @@ from urllib.parse import urlencode
 import requests
 
 
+def signed_query(params: dict, api_secret: str) -> str:
+    """
+    Query string of a signed request: `params` plus the current timestamp,
+    followed by their HMAC-SHA256 signature. Shared by the sync and async clients.
+    """
+    params = dict(params or {})
+    # Add timestamp
+    params['timestamp'] = int(time.time() * 1000)
+    # Create query string
+    query_string = urlencode(params)
+    # Signature
+    signature = hmac.new(
+        api_secret.encode('utf-8'),
+        query_string.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+    return f"{query_string}&signature={signature}"
+
+
+def endpoint_breaker(path: str, api_key: str = None):
+    """
+    Circuit breaker of an endpoint: one per path for public endpoints, one
+    per (path, API key) for signed ones (api_key given), so a revoked key
+    does not cut off the other accounts. Shared by the sync and async clients.
+    """
+    from .resilience import get_breaker
+    if api_key is None:
+        return get_breaker(path)
+    key_id = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:8]
+    return get_breaker(f"{path} [{key_id}]")
+
+
 class BinanceClient:
     """
     Low-level Binance REST client for signed and unsigned requests.
@@ -16,26 +48,65 @@ class BinanceClient:
 
     BASE_URL = "https://api.binance.com"
 
-    def __init__(self, api_key: str = None, api_secret: str = None, timeout: int = 10):
+    def __init__(self, api_key: str = None, api_secret: str = None, timeout: int = 10, rate_limiter=None):
         """
         Initialize the client with API key/secret and request timeout.
         Keys default to environment variables BINANCE_API_KEY and BINANCE_API_SECRET.
+        If a rate_limiter (WeightBudget) is given, every request first spends
+        its weight from it, so clients sharing a limiter share one budget.
         """
         self.api_key = api_key or os.getenv("BINANCE_API_KEY")
         self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
         self.timeout = timeout
+        self.rate_limiter = rate_limiter
 
-    def _public_request(self, method: str, path: str, params: dict = None) -> dict:
+    def _acquire(self, path: str, params: dict = None) -> None:
         """
-        Send a public (unsigned) request.
+        Wait for the request weight of `path` in the shared budget, if any.
         """
-        url = f"{self.BASE_URL}{path}"
+        if self.rate_limiter is not None:
+            from .binance.rate_limit import request_weight
+            self.rate_limiter.acquire(request_weight(path, params))
+
+    def _observe(self, response) -> None:
+        """
+        Feed the weight Binance reports as used back into the budget.
+        """
+        used = response.headers.get("X-MBX-USED-WEIGHT-1M")
+        if self.rate_limiter is not None and used is not None:
+            self.rate_limiter.observe_used(int(used))
+
+    def _send(self, breaker, method: str, url: str, kind: str, **kwargs):
+        """
+        Send a request admitted by breaker.before_call(), record its outcome
+        in the breaker and return the parsed JSON.
+        """
+        from .resilience import is_upstream_failure
         try:
-            response = requests.request(method, url, params=params, timeout=self.timeout)
+            response = requests.request(method, url, timeout=self.timeout, **kwargs)
+            self._observe(response)
             response.raise_for_status()
-            return response.json()
+            data = response.json()
         except requests.RequestException as e:
-            raise RuntimeError(f"Binance public request error: {e}")
+            status = e.response.status_code if e.response is not None else None
+            if is_upstream_failure(status):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise RuntimeError(f"Binance {kind} request error: {e}")
+        breaker.record_success()
+        return data
+
+    def _public_request(self, method: str, path: str, params: dict = None) -> dict:
+        """
+        Send a public (unsigned) request.
+        """
+        url = f"{self.BASE_URL}{path}"
+        breaker = endpoint_breaker(path)
+        # An open circuit fails fast, before spending any request weight
+        breaker.before_call()
+        self._acquire(path, params)
+        return self._send(breaker, method, url, "public", params=params)
 
     def _signed_request(self, method: str, path: str, params: dict = None) -> dict:
         """
@@ -46,29 +117,15 @@ class BinanceClient:
         :param params: Query parameters.
         :return: Parsed JSON response.
         """
-        if params is None:
-            params = {}
-        # Add timestamp
-        params['timestamp'] = int(time.time() * 1000)
-        # Create query string
-        query_string = urlencode(params)
-        # Signature
-        signature = hmac.new(
-            self.api_secret.encode('utf-8'),
-            query_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        breaker = endpoint_breaker(path, self.api_key or "")
+        breaker.before_call()
+        self._acquire(path, params)
         # Final URL
-        url = f"{self.BASE_URL}{path}?{query_string}&signature={signature}"
+        url = f"{self.BASE_URL}{path}?{signed_query(params, self.api_secret)}"
         headers = {
             'X-MBX-APIKEY': self.api_key
         }
-        try:
-            response = requests.request(method, url, headers=headers, timeout=self.timeout)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            raise RuntimeError(f"Binance signed request error: {e}")
+        return self._send(breaker, method, url, "signed", headers=headers)
 
     def get_server_time(self) -> dict:
         """
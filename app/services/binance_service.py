@@ -1,11 +1,30 @@
-from .db import SessionLocal
-from .sync_utils import get_last_sync, set_last_sync
+import logging
+import os
+
+from .amounts import format_amount, get_asset_precisions
+from .db import DEFAULT_ACCOUNT_ID, SessionLocal
+from .fx import normalize_currency
+from .sync_utils import get_last_sync, get_sync_marks, set_last_sync, set_sync_marks
 from .binance.api_client import BinanceClient
-from .binance.portfolio import PortfolioCalculator
-from .binance.transaction import TransactionService
-from .binance.position import PositionService
-from .binance.performance import PerformanceService
-from .binance.taxes import TaxService
+from .binance.symbols import get_symbol_registry
+
+# Use the asyncio client (through its blocking facade) for REST calls:
+# per-symbol fetches then run concurrently on pooled connections.
+# Requires aiohttp.
+BINANCE_ASYNC_CLIENT = os.getenv("BINANCE_ASYNC_CLIENT", "").lower() in ("1", "true", "yes")
+
+# Trades fetched per myTrades request (Binance maximum)
+TRADES_PAGE_SIZE = 1000
+# Sync marker key prefix of the per-symbol trade watermarks
+TRADE_MARK_PREFIX = "trades:"
+
+# Position fields: asset quantities and amounts in the reporting currency
+# are returned as decimal strings, prices as floats
+QUANTITY_FIELDS = ("quantity", "lot_quantity")
+PRICE_FIELDS = ("price", "avg_entry_price")
+VALUE_FIELDS = ("value", "cost_basis", "realized_pnl", "unrealized_pnl")
+
+logger = logging.getLogger(__name__)
 
 
 class BinanceService:
@@ -15,19 +34,77 @@ class BinanceService:
     - Portfolio summary (balances, P/L)
     - Performance metrics
     - Tax reporting
+
+    Sub-services are created on first access, so building a BinanceService
+    does not open a DB session or import pandas until they are needed.
     """
 
-    def __init__(self, api_key=None, api_secret=None, db_url=None):
-        # Initialize Binance REST client
-        self.client = BinanceClient(api_key=api_key, api_secret=api_secret)
-        # Prepare database session
-        self.db = SessionLocal()
-        # Initialize sub-services
-        self.transactions = TransactionService(self.db, self.client)
-        self.positions = PositionService(self.db, self.client)
-        self.portfolio = PortfolioCalculator(self.db)
-        self.performance = PerformanceService(self.db)
-        self.taxes = TaxService(self.db)
+    def __init__(self, api_key=None, api_secret=None, db_url=None, account_id: int = DEFAULT_ACCOUNT_ID):
+        # Initialize Binance REST client (no network until the first call)
+        if BINANCE_ASYNC_CLIENT:
+            from .binance.async_client import BlockingBinanceClient
+            self.client = BlockingBinanceClient(api_key=api_key, api_secret=api_secret)
+        else:
+            self.client = BinanceClient(api_key=api_key, api_secret=api_secret)
+        # Account whose rows this service reads and writes
+        self.account_id = account_id
+        self._db = None
+        self._services = {}
+
+    @property
+    def db(self):
+        """Database session, opened on first use."""
+        if self._db is None:
+            self._db = SessionLocal()
+        return self._db
+
+    def _service(self, name: str, factory):
+        """Return the cached sub-service `name`, building it with `factory` once."""
+        if name not in self._services:
+            self._services[name] = factory()
+        return self._services[name]
+
+    @property
+    def transactions(self):
+        from .binance.transaction import TransactionService
+        return self._service("transactions", lambda: TransactionService(self.db, self.client, self.account_id))
+
+    @property
+    def positions(self):
+        from .binance.position import PositionService
+        return self._service("positions", lambda: PositionService(self.client, lots=self.lots, snapshots=self.snapshots))
+
+    @property
+    def lots(self):
+        from .binance.lots import LotService
+        return self._service("lots", lambda: LotService(self.account_id))
+
+    @property
+    def portfolio(self):
+        from .binance.portfolio import PortfolioCalculator
+        return self._service("portfolio", lambda: PortfolioCalculator(
+            self.client, invested=self.invested, snapshots=self.snapshots))
+
+    @property
+    def snapshots(self):
+        """Account snapshots shared by the position and portfolio services."""
+        from .binance.snapshot import AccountSnapshotProvider
+        return self._service("snapshots", lambda: AccountSnapshotProvider(self.client))
+
+    @property
+    def invested(self):
+        from .binance.invested import InvestedCapitalService
+        return self._service("invested", lambda: InvestedCapitalService(self.account_id))
+
+    @property
+    def performance(self):
+        from .binance.performance import PerformanceService
+        return self._service("performance", lambda: PerformanceService(self.db, self.account_id))
+
+    @property
+    def taxes(self):
+        from .binance.taxes import TaxService
+        return self._service("taxes", lambda: TaxService(self.db, self.account_id))
 
     def sync(self):  # pragma: no cover
         """
@@ -36,35 +113,158 @@ class BinanceService:
         - Withdrawals
         - Trades
 
-        Uses the last sync timestamp to fetch only new records.
+        Uses the last sync timestamp (transfers) and one trade id watermark
+        per symbol (trades) to fetch only new records.
         """
-        # Retrieve last sync timestamp
-        last_ts = get_last_sync()
+        # Retrieve last sync timestamp (deposits and withdrawals)
+        last_ts = get_last_sync(account_id=self.account_id)
 
         # Fetch deltas from Binance
-        deposits = self.client.get_deposit_history(startTime=last_ts)
-        withdrawals = self.client.get_withdraw_history(startTime=last_ts)
-        trades = self.client.get_my_trades(startTime=last_ts)
-
-        # Upsert into database
+        deposits = self.client.get_deposit_history(start_time=last_ts)
+        withdrawals = self.client.get_withdraw_history(start_time=last_ts)
+        # Upsert the transfers first: their assets widen the traded symbols
         self.transactions.upsert_deposits(deposits)
         self.transactions.upsert_withdrawals(withdrawals)
+        trades, trade_marks = self._fetch_trades(self._trade_symbols())
         self.transactions.upsert_trades(trades)
 
-        # Optionally upsert open positions
-        self.positions.upsert_current_positions()
-
         # Compute new max timestamp for next sync
         all_times = [last_ts]
         all_times += [d.get('time', 0) for d in deposits or []]
         all_times += [w.get('time', 0) for w in withdrawals or []]
-        all_times += [t.get('time', 0) for t in trades or []]
         max_ts = max(all_times)
 
         # Update sync marker
-        set_last_sync(max_ts)
+        set_last_sync(max_ts, account_id=self.account_id)
+        set_sync_marks(TRADE_MARK_PREFIX, trade_marks, account_id=self.account_id)
+        self.snapshots.invalidate()
+
+        # Value the new deposits into the invested capital aggregates and
+        # apply the new trades to the cost basis lots
+        self.invested.update()
+        try:
+            self.lots.update()
+        except ValueError as e:
+            # Left at the previous watermark: retried on the next update
+            logger.warning("Cost basis lots of account %s not updated: %s", self.account_id, e)
+        self.refresh_analytics()
+
+    def refresh_analytics(self) -> None:
+        """
+        Append what the last sync added to the on-disk analytics cache (new
+        ledger rows, then the value of each new timestamp), if enabled. A
+        failure is only logged: the cache catches up on the next read.
+        """
+        from .binance.analytics_store import get_analytics_store
+
+        store = get_analytics_store()
+        if store is None:
+            return
+        try:
+            store.value_timeseries(self.db, self.account_id)
+        except Exception as e:
+            logger.warning("Could not update the analytics cache of account %s: %s", self.account_id, e)
+
+    def _trade_symbols(self) -> list:
+        """
+        Symbols whose trade history is synced: every listed pair between two
+        assets the account ever touched (held now, deposited, withdrawn, or
+        on either side of a stored trade), so trades of assets sold out
+        since the last sync and cross pairs like ETHBTC are not missed.
+        """
+        assets = set(self._held_quantities()) | self._ledger_assets()
+        return get_symbol_registry().pairs_between(assets)
+
+    def _ledger_assets(self) -> set:
+        """
+        Every asset appearing in the stored deposits, withdrawals and trades
+        of the account.
+        """
+        from .db import Deposit, Trade, Withdrawal
+
+        registry = get_symbol_registry()
+        assets = set()
+        for model in (Deposit, Withdrawal):
+            rows = self.db.query(model.asset).filter(model.account_id == self.account_id).distinct()
+            assets.update(asset for (asset,) in rows)
+        rows = self.db.query(Trade.symbol).filter(Trade.account_id == self.account_id).distinct()
+        for (symbol,) in rows:
+            try:
+                assets.update(registry.split_symbol(symbol))
+            except ValueError:
+                logger.warning("Skipping trades of unknown symbol %s", symbol)
+        return assets
 
-    def get_portfolio_data(self, year: int = None) -> dict:
+    def _fetch_trades(self, symbols: list) -> tuple:
+        """
+        Fetch the trades of each symbol made after its own watermark (the
+        id of its last synced trade), paging by trade id, concurrently when
+        the client supports it (async client). A symbol never synced before
+        is fetched from its first trade.
+
+        :return: (trades, {symbol: id of its last fetched trade})
+        """
+        marks = get_sync_marks(TRADE_MARK_PREFIX, account_id=self.account_id)
+        pending = {symbol: marks[symbol] + 1 if symbol in marks else 0 for symbol in symbols}
+        trades, new_marks = [], {}
+        while pending:
+            calls = list(pending.items())
+            if hasattr(self.client, "gather"):
+                pages = self.client.gather([
+                    ("get_my_trades", {"symbol": symbol, "from_id": from_id, "limit": TRADES_PAGE_SIZE})
+                    for symbol, from_id in calls
+                ])
+            else:
+                pages = [
+                    self.client.get_my_trades(symbol, from_id=from_id, limit=TRADES_PAGE_SIZE)
+                    for symbol, from_id in calls
+                ]
+            pending = {}
+            for (symbol, _), page in zip(calls, pages):
+                if not page:
+                    continue
+                trades.extend(page)
+                new_marks[symbol] = max(int(t["id"]) for t in page)
+                if len(page) >= TRADES_PAGE_SIZE:
+                    pending[symbol] = new_marks[symbol] + 1
+        return trades, new_marks
+
+    def _held_quantities(self) -> dict:
+        """
+        {asset: free + locked} for every asset with a positive balance.
+        """
+        return self.snapshots.get().quantities()
+
+    def start_price_stream(self, kind: str = None):
+        """
+        Start the background price feed for every market needed to value the
+        held assets (all legs of their price paths, plus the reporting
+        currency's FX pair), so valuations read prices from memory.
+
+        :param kind: "binance" or "local" (default: PRICE_STREAM env var)
+        """
+        from .fx import DEFAULT_CURRENCY
+        from .price_feed import PRICE_STREAM, start_price_feed
+
+        registry = get_symbol_registry()
+        assets = set(self._held_quantities())
+        assets.add(DEFAULT_CURRENCY)
+        symbols = {
+            symbol
+            for asset in assets
+            for symbol, _ in (registry.path_to_quote(asset) or [])
+        }
+        return start_price_feed(symbols, kind=kind if kind is not None else PRICE_STREAM)
+
+    def live_portfolio(self):
+        """
+        Portfolio value kept up to date from price ticks, shared by all
+        stream subscribers (see /api/portfolio/stream).
+        """
+        from .live_portfolio import LivePortfolio
+        return self._service("live_portfolio", lambda: LivePortfolio(self._held_quantities))
+
+    def get_portfolio_data(self, year: int = None, currency: str = None) -> dict:
         """
         Returns current portfolio summary:
         - Balances per asset
@@ -73,30 +273,115 @@ class BinanceService:
         - Unrealized P/L
 
         :param year: filter deposits/trades by year for invested capital
+        :param currency: reporting currency (default REPORTING_CURRENCY)
         """
-        balances = self.portfolio.compute_balances()
-        invested = self.portfolio.calculate_invested(year=year)
-        current_value = self.portfolio.calculate_current_value()
+        currency = normalize_currency(currency)
+        balances = self.portfolio.fetch_balances()
+        # Aggregates maintained at sync: no deposit history or price fetch
+        invested = self.portfolio.calculate_invested(year=year, currency=currency)
+        current_value = self.portfolio.calculate_current_value(balances, currency=currency)
         pl = current_value - invested
 
+        decimals = get_asset_precisions().get_many({bal["asset"] for bal in balances})
         return {
-            "balances": balances,
+            "currency": currency,
+            "balances": [
+                {
+                    "asset": bal["asset"],
+                    "free": format_amount(bal.get("free", "0"), decimals[bal["asset"]]),
+                    "locked": format_amount(bal.get("locked", "0"), decimals[bal["asset"]]),
+                }
+                for bal in balances
+            ],
             "invested": invested,
             "current_value": current_value,
             "profit_loss": pl,
         }
 
-    def get_performance_data(self, start_date=None, end_date=None) -> dict:
+    def get_positions(self, currency: str = None) -> list:
+        """
+        Open positions with quantity, price and value, plus their cost
+        basis: average entry price, realized and unrealized P/L.
+        Quantities and amounts are decimal strings, prices floats.
+
+        :param currency: currency of prices and amounts (default
+            REPORTING_CURRENCY), converted from USDT at the current rate
+        """
+        from .fx import convert_value
+
+        currency = normalize_currency(currency)
+        # Value of one USDT in `currency`
+        factor = convert_value(1.0, currency)
+        positions = self.positions.get_open_positions()
+        decimals = get_asset_precisions().get_many({p["asset"] for p in positions} | {currency})
+        for position in positions:
+            for key in QUANTITY_FIELDS:
+                if key in position:
+                    position[key] = format_amount(position[key], decimals[position["asset"]])
+            for key in PRICE_FIELDS:
+                if position.get(key) is not None:
+                    position[key] = position[key] * factor
+            for key in VALUE_FIELDS:
+                if position.get(key) is not None:
+                    position[key] = format_amount(position[key] * factor, decimals[currency])
+        return positions
+
+    def get_performance_data(self, start_date=None, end_date=None, currency: str = None) -> dict:
         """
         Compute performance metrics over a time range:
         - Returns series (daily, weekly, monthly)
         - Max drawdown, CAGR, sharpe ratio, etc.
+        Values are expressed in `currency` (default REPORTING_CURRENCY).
+        """
+        return self.performance.compute_metrics(
+            start_date=start_date, end_date=end_date, currency=normalize_currency(currency)
+        )
+
+    def get_chart_series(
+        self, series: str = "value", period: str = "all", points: int = None,
+        currency: str = None, start_date=None, end_date=None,
+    ) -> dict:
+        """
+        Chart-ready series (value, cumulative or periodic returns) over a
+        range, downsampled to at most `points` points, in columnar form.
+        """
+        return self.performance.chart_series(
+            series=series, period=period, points=points, currency=currency,
+            start_date=start_date, end_date=end_date,
+        )
+
+    def get_attribution(
+        self, period: str = "all", currency: str = None, start_date=None, end_date=None, window: int = None,
+    ) -> dict:
+        """
+        Which holdings drove returns and drawdowns over a range, and how
+        concentrated the risk is: per-asset P&L and contribution, rolling
+        covariance / correlation, marginal and component risk.
+        """
+        return self.performance.attribution(
+            period=period, currency=currency, start_date=start_date, end_date=end_date, window=window,
+        )
+
+    def get_backtest(
+        self, weights: dict, rebalance: str = "monthly", fee_rate: float = None, currency: str = None,
+    ) -> dict:
+        """
+        Simulate holding target `weights` ({asset: weight}, the rest in USDT)
+        with this account's real deposits, rebalanced at the given frequency:
+        the metrics of get_performance_data() plus final value, invested
+        capital, fees and turnover.
         """
-        return self.performance.compute_metrics(start_date=start_date, end_date=end_date)
+        from .binance.backtest import BACKTEST_FEE_RATE, backtest
+        return backtest(
+            weights, rebalance=rebalance, fee_rate=BACKTEST_FEE_RATE if fee_rate is None else fee_rate,
+            account_id=self.account_id, currency=normalize_currency(currency),
+        )
 
-    def get_tax_report(self, year: int) -> dict:
+    def get_tax_report(self, year: int, currency: str = None) -> dict:
         """
         Generates a tax report for the given fiscal year.
         Includes realized gains/losses and taxable amount per French regulations.
+        Amounts are in EUR unless another `currency` is requested.
         """
-        return self.taxes.generate_report(year)
\ No newline at end of file
+        from .binance.taxes import TAX_CURRENCY
+        return self.taxes.generate_report(year, normalize_currency(currency or TAX_CURRENCY))
\ No newline at end of file
@@ -0,0 +1,119 @@
+# app/services/bulk.py
+
+import csv
+import io
+from typing import List
+
+from sqlalchemy import Table
+
+# Rows sent per executemany on dialects without a COPY path
+UPSERT_CHUNK_SIZE = 1000
+
+
+def bulk_upsert(session, model, rows: List[dict]) -> int:
+    """
+    Insert `rows` into the table of `model`, updating the rows whose key
+    (model.UPSERT_KEYS if declared, the primary key otherwise) already exists, in a single round of set-based statements instead of
+    one lookup + INSERT/UPDATE per row:
+    - PostgreSQL: COPY into a temporary table, then one INSERT ... SELECT
+      ... ON CONFLICT DO UPDATE into the target table
+    - SQLite: batched INSERT ... ON CONFLICT DO UPDATE
+    - other databases: session.merge() per row
+
+    Runs in the session's current transaction; committing is left to the caller.
+
+    :param session: SQLAlchemy session
+    :param model: mapped class (Deposit, Trade, Kline, ...)
+    :param rows: dicts with the same keys: the upsert key and the columns
+        to write. Other columns keep their value on existing rows (their
+        default on new rows). Of several rows with the same key, the last
+        one wins.
+    :return: number of rows sent
+    """
+    if not rows:
+        return 0
+    table = model.__table__
+    keys = list(getattr(model, "UPSERT_KEYS", None) or (c.name for c in table.primary_key.columns))
+    # ON CONFLICT cannot update the same row twice in one statement: keep
+    # the last row of each key (in first-seen key order)
+    rows = list({tuple(row[name] for name in keys): row for row in rows}.values())
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        _copy_upsert(session, table, keys, rows)
+    elif dialect == "sqlite":
+        _sqlite_upsert(session, table, keys, rows)
+    else:
+        for row in rows:
+            _merge(session, model, keys, row)
+    return len(rows)
+
+
+def _merge(session, model, keys: List[str], row: dict) -> None:
+    # session.merge() matches on the primary key only
+    existing = session.query(model).filter_by(**{name: row[name] for name in keys}).one_or_none()
+    if existing is None:
+        session.add(model(**row))
+    else:
+        for name, value in row.items():
+            setattr(existing, name, value)
+
+
+def _sqlite_upsert(session, table: Table, keys: List[str], rows: List[dict]) -> None:
+    from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(table)
+    updates = {name: stmt.excluded[name] for name in rows[0] if name not in keys}
+    if updates:
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=updates)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        session.execute(stmt, rows[start:start + UPSERT_CHUNK_SIZE])
+
+
+def _copy_upsert(session, table: Table, keys: List[str], rows: List[dict]) -> None:
+    """
+    COPY `rows` into a temporary copy of `table`, then merge it into `table`.
+    Works with psycopg 3 (Cursor.copy) and psycopg2 (copy_expert).
+    """
+    columns = list(rows[0])
+    staging = f"_staging_{table.name}"
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    key_list = ", ".join(f'"{name}"' for name in keys)
+    updates = ", ".join(f'"{name}" = EXCLUDED."{name}"' for name in columns if name not in keys)
+    on_conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+
+    # Same connection (hence transaction) as the session
+    conn = session.connection()
+    # only the columns sent: a surrogate key left out stays NULL-free
+    conn.exec_driver_sql(
+        f'CREATE TEMP TABLE IF NOT EXISTS "{staging}" ON COMMIT DROP '
+        f'AS SELECT {column_list} FROM "{table.name}" WITH NO DATA'
+    )
+    conn.exec_driver_sql(f'TRUNCATE "{staging}"')
+
+    values = [[row[name] for name in columns] for row in rows]
+    copy_sql = f'COPY "{staging}" ({column_list}) FROM STDIN'
+    cursor = conn.connection.cursor()
+    try:
+        if hasattr(cursor, "copy"):  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                for value in values:
+                    copy.write_row(value)
+        else:  # psycopg2
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(values)
+            buffer.seek(0)
+            cursor.copy_expert(f"{copy_sql} WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+    # rows are unique per key (see bulk_upsert)
+    conn.exec_driver_sql(
+        f'INSERT INTO "{table.name}" ({column_list}) '
+        f'SELECT {column_list} FROM "{staging}" '
+        f'ON CONFLICT ({key_list}) {on_conflict}'
+    )
+
+
+__all__ = ["bulk_upsert"]
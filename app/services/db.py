@@ -1,11 +1,23 @@
+import logging
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
 from sqlalchemy import (
     create_engine,
+    event,
+    inspect,
+    text,
     Column,
     Integer,
     String,
     BigInteger,
     Float,
+    Index,
+    Text,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -13,12 +25,88 @@ from sqlalchemy.orm import sessionmaker
 # Retrieve database URL from environment or default to SQLite file
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./portfolio.db")
 
+logger = logging.getLogger(__name__)
+
+# SQLite storage profile (ignored for other databases)
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Negative values are in KiB: -65536 = 64 MiB of page cache per connection
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -65536))
+# Seconds between background WAL checkpoints / ANALYZE runs of the writer
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", 300))
+SQLITE_ANALYZE_INTERVAL = float(os.getenv("SQLITE_ANALYZE_INTERVAL", 3600))
+
+# Connection pool of server databases (PostgreSQL); ignored for SQLite.
+# Size it for the web threads plus SYNC_WORKERS concurrent account syncs.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Recycle connections before a server / proxy idle timeout closes them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    """
+    Per-connection SQLite settings:
+    - WAL journal: readers no longer block on (or block) the writer
+    - synchronous=NORMAL: fsync at checkpoints only, safe in WAL mode
+    - mmap + larger page cache + in-memory temp tables for faster reads
+    - busy timeout: wait for the write lock instead of failing at once
+    """
+    # Let SQLAlchemy emit BEGIN itself (see _begin_sqlite_transaction):
+    # pysqlite's implicit transactions break SAVEPOINT handling
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _begin_sqlite_transaction(conn) -> None:
+    conn.exec_driver_sql("BEGIN")
+
+
+def create_db_engine(url: str, tuned: bool = SQLITE_TUNED):
+    """
+    Create the SQLAlchemy engine for `url`:
+    - SQLite file: tuned profile (see _apply_sqlite_pragmas) when `tuned` is set
+    - server databases (e.g. postgresql+psycopg://...): sized connection pool,
+      with a liveness check (pre-ping) before a pooled connection is reused
+    """
+    is_sqlite = url.startswith("sqlite")
+    options = {}
+    connect_args = {}
+    if is_sqlite and tuned:
+        # Connections are handed between the web threads and the writer thread
+        connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    elif not is_sqlite:
+        options = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+    new_engine = create_engine(
+        url,
+        echo=False,
+        future=True,
+        connect_args=connect_args,
+        **options,
+    )
+    if is_sqlite and tuned:
+        event.listen(new_engine, "connect", _apply_sqlite_pragmas)
+        event.listen(new_engine, "begin", _begin_sqlite_transaction)
+    return new_engine
+
+
 # Create engine and session factory
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    future=True,
-)
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
@@ -29,14 +117,46 @@ SessionLocal = sessionmaker(
 # Base declarative class
 Base = declarative_base()
 
+# Account owning the rows created before multi-account support
+DEFAULT_ACCOUNT_ID = 1
+
+
+class Account(Base):
+    """
+    A Binance account (main, sub-account or family account) whose data is synced.
+    Credentials are not stored here, see services.accounts.AccountRegistry.
+    """
+    __tablename__ = "accounts"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+
+class Asset(Base):
+    """
+    Fixed-point scale of an asset: its amounts are stored as integers of
+    10**-decimals units (e.g. satoshis for BTC with 8 decimals). Set once,
+    from exchangeInfo, when the asset is first stored, and never changed
+    afterwards so that stored integers keep their meaning.
+    """
+    __tablename__ = "assets"
+
+    asset = Column(String, primary_key=True)
+    decimals = Column(Integer, nullable=False)
+
+
 class SyncMeta(Base):
     """
-    Stores metadata about last synchronization timestamps per source.
+    Stores metadata about last synchronization timestamps per source and account.
     """
     __tablename__ = "sync_meta"
+    __table_args__ = (
+        Index("ix_sync_meta_account_key", "account_id", "key", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    key = Column(String, unique=True, index=True, nullable=False)
+    account_id = Column(Integer, default=DEFAULT_ACCOUNT_ID, nullable=False)
+    key = Column(String, nullable=False)
     value = Column(BigInteger, default=0, nullable=False)
 
 class Deposit(Base):
@@ -44,40 +164,379 @@ class Deposit(Base):
     Represents a Binance deposit transaction.
     """
     __tablename__ = "deposits"
+    __table_args__ = (
+        Index("ix_deposits_account_time", "account_id", "time"),
+        Index("ix_deposits_account_year_asset", "account_id", "year", "asset"),
+    )
 
     txId = Column(String, primary_key=True, index=True)
+    account_id = Column(Integer, default=DEFAULT_ACCOUNT_ID, nullable=False)
     asset = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
+    # Exact amount in units of the asset (see Asset), used for all sums
+    amount_units = Column(BigInteger)
     time = Column(BigInteger, nullable=False)
+    # Calendar year of `time` (local time) and USDT value at that time,
+    # set at ingest for the invested capital aggregates (value_usdt is NULL
+    # until a price is found, see binance.invested)
+    year = Column(Integer)
+    value_usdt = Column(Float)
 
 class Withdrawal(Base):
     """
     Represents a Binance withdrawal transaction.
     """
     __tablename__ = "withdrawals"
+    __table_args__ = (
+        Index("ix_withdrawals_account_time", "account_id", "time"),
+    )
 
     txId = Column(String, primary_key=True, index=True)
+    account_id = Column(Integer, default=DEFAULT_ACCOUNT_ID, nullable=False)
     asset = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
+    amount_units = Column(BigInteger)
     time = Column(BigInteger, nullable=False)
 
 class Trade(Base):
     """
     Represents a Binance trade (order fill).
+    Binance trade ids are only unique per symbol, hence the surrogate key
+    and the unique (account_id, symbol, id) index that upserts match on.
     """
     __tablename__ = "trades"
+    __table_args__ = (
+        Index("ix_trades_account_symbol_time", "account_id", "symbol", "time"),
+        Index("ix_trades_account_symbol_id", "account_id", "symbol", "id", unique=True),
+    )
+
+    # Columns matched by upserts (the natural key)
+    UPSERT_KEYS = ("account_id", "symbol", "id")
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    pk = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(BigInteger, nullable=False)  # Binance trade id
+    account_id = Column(Integer, default=DEFAULT_ACCOUNT_ID, nullable=False)
     orderId = Column(Integer, index=True, nullable=False)
     symbol = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     qty = Column(Float, nullable=False)
+    # Exact signed quantities in asset units (see Asset): qty_units of the
+    # base asset and quote_qty_units (qty * price) of the quote asset, both
+    # positive for a buy and negative for a sell
+    qty_units = Column(BigInteger)
+    quote_qty_units = Column(BigInteger)
     time = Column(BigInteger, nullable=False)
 
 
+class Kline(Base):
+    """
+    Locally stored candlestick close prices (historical price cache).
+    """
+    __tablename__ = "klines"
+
+    symbol = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)
+    open_time = Column(BigInteger, primary_key=True)
+    close = Column(Float, nullable=False)
+
+
+class InvestedCapital(Base):
+    """
+    Invested capital aggregate: deposits of one asset, account and
+    calendar year, valued at deposit time in `currency`. Maintained at
+    ingest (see binance.invested), so reading invested capital is an
+    indexed lookup.
+    """
+    __tablename__ = "invested_capital"
+
+    account_id = Column(Integer, primary_key=True)
+    currency = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    asset = Column(String, primary_key=True)
+    amount_units = Column(BigInteger, nullable=False, default=0)
+    value = Column(Float, nullable=False, default=0.0)
+    deposits = Column(Integer, nullable=False, default=0)
+
+
+class LotState(Base):
+    """
+    Open cost-basis lots and cumulative realized P/L of one asset, for one
+    account and cost method, as left by the last trade applied
+    (see binance.lots). Lots are a JSON list of [qty_units, unit_cost in
+    USDT], oldest first.
+    """
+    __tablename__ = "lot_states"
+
+    account_id = Column(Integer, primary_key=True)
+    method = Column(String, primary_key=True)
+    asset = Column(String, primary_key=True)
+    lots = Column(Text, nullable=False, default="[]")
+    realized = Column(Float, nullable=False, default=0.0)
+
+
+def _add_missing_columns() -> list:
+    """
+    Add columns declared on the models but missing from existing tables.
+    Returns the list of "table.column" names that were added.
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'
+                # SQLite refuses NOT NULL columns without a default on ALTER
+                default = column.default.arg if column.default is not None else None
+                if default is not None and not callable(default):
+                    ddl += f" DEFAULT {default!r}"
+                conn.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _drop_stale_indexes() -> list:
+    """
+    Drop SQLAlchemy-named (ix_*) indexes of model tables that the models no
+    longer declare (e.g. the old unique index on sync_meta.key, now unique
+    per account).
+    Returns the names of the dropped indexes.
+    """
+    inspector = inspect(engine)
+    dropped = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            declared = {index.name for index in table.indexes}
+            for index in inspector.get_indexes(table.name):
+                name = index["name"] or ""
+                if name.startswith("ix_") and name not in declared:
+                    conn.execute(text(f'DROP INDEX "{name}"'))
+                    dropped.append(name)
+    return dropped
+
+
+def _rekey_trades() -> bool:
+    """
+    Rebuild a trades table created when the Binance trade id was the
+    primary key (no "pk" column): rows are copied into the new layout.
+    Returns True if the table was rebuilt.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("trades"):
+        return False
+    existing = [c["name"] for c in inspector.get_columns("trades")]
+    if "pk" in existing:
+        return False
+    table = Base.metadata.tables["trades"]
+    columns = ", ".join(f'"{name}"' for name in existing if name in table.columns)
+    with engine.begin() as conn:
+        # index names are global (SQLite, PostgreSQL): free them for the new table
+        for index in inspector.get_indexes("trades"):
+            name = index["name"]
+            if name:
+                conn.execute(text(f'DROP INDEX "{name}"'))
+        primary_key = inspector.get_pk_constraint("trades").get("name")
+        if engine.dialect.name == "postgresql" and primary_key:
+            conn.execute(text(f'ALTER TABLE trades DROP CONSTRAINT "{primary_key}"'))
+        conn.execute(text("ALTER TABLE trades RENAME TO trades_old"))
+        table.create(bind=conn)
+        conn.execute(text(
+            f"INSERT INTO trades ({columns}) SELECT {columns} FROM trades_old ORDER BY time, id"
+        ))
+        conn.execute(text("DROP TABLE trades_old"))
+    return True
+
+
+def migrate() -> list:
+    """
+    Bring the database schema up to date with the models:
+    create missing tables, then add missing columns and indexes.
+
+    This is a deployment step (``flask init-db``), not something to run
+    on every application boot.
+    """
+    rekeyed = _rekey_trades()
+    Base.metadata.create_all(bind=engine)
+    added = _add_missing_columns()
+    if rekeyed:
+        added.append("trades.pk")
+    _drop_stale_indexes()
+    # create_all skips indexes of tables that already existed
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    # Rows stored before fixed-point amounts: derive units from the floats
+    from .amounts import backfill_units
+    backfill_units()
+    return added
+
+
 def init_db():
     """
     Initialize database by creating all tables.
-    Call this once at application startup.
+    Kept for backwards compatibility, see migrate().
     """
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    migrate()
+
+
+class WriteQueue:
+    """
+    Single writer thread for the database.
+
+    Concurrent syncs submit their write jobs here instead of each opening
+    a write transaction: SQLite allows one writer at a time, so funnelling
+    writes through one thread removes lock contention and busy retries.
+    Pending jobs are group-committed (one commit, hence one WAL sync, per
+    batch), each inside its own savepoint so a failing job only rolls back
+    its own changes. When idle, the writer runs periodic WAL checkpoints
+    and ANALYZE.
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        max_batch: int = 64,
+        checkpoint_interval: float = SQLITE_CHECKPOINT_INTERVAL,
+        analyze_interval: float = SQLITE_ANALYZE_INTERVAL,
+    ):
+        """
+        :param session_factory: sessionmaker bound to the database (default: SessionLocal)
+        :param max_batch: maximum number of jobs group-committed together
+        :param checkpoint_interval: seconds between two WAL checkpoints
+        :param analyze_interval: seconds between two ANALYZE runs
+        """
+        self.session_factory = session_factory or SessionLocal
+        self.max_batch = max_batch
+        self.checkpoint_interval = checkpoint_interval
+        self.analyze_interval = analyze_interval
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_checkpoint = self._last_analyze = time.monotonic()
+
+    def submit(self, job: Callable) -> Future:
+        """
+        Queue `job(session)` for the writer thread; the future resolves to
+        its return value once the batch containing it is committed.
+        """
+        future: Future = Future()
+        self._jobs.put((job, future))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="WriteQueue")
+                self._thread.start()
+        return future
+
+    def run(self, job: Callable):
+        """
+        Submit `job(session)` and wait for its result (re-raising its error).
+        """
+        return self.submit(job).result()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = [self._jobs.get(timeout=min(self.checkpoint_interval, 60))]
+            except queue.Empty:
+                self._maintenance()
+                continue
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit_batch(batch)
+            self._maintenance()
+
+    def _commit_batch(self, batch) -> None:
+        session = self.session_factory()
+        results = []
+        try:
+            for job, future in batch:
+                try:
+                    with session.begin_nested():
+                        results.append((future, job(session), None))
+                except Exception as e:
+                    results.append((future, None, e))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            results = [(future, None, e) for _, future in batch]
+        finally:
+            session.close()
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _maintenance(self) -> None:
+        """
+        Periodic housekeeping, run between batches by the writer itself.
+        """
+        now = time.monotonic()
+        checkpoint = now - self._last_checkpoint >= self.checkpoint_interval
+        analyze = now - self._last_analyze >= self.analyze_interval
+        if not (checkpoint or analyze):
+            return
+        # Raw connection: pragmas must run outside of a transaction
+        raw = self.session_factory.kw["bind"].raw_connection()
+        try:
+            cursor = raw.cursor()
+            if checkpoint:
+                # PASSIVE never blocks readers; keeps the WAL file small
+                cursor.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                self._last_checkpoint = now
+            if analyze:
+                cursor.execute("ANALYZE")
+                self._last_analyze = now
+            cursor.close()
+        except Exception:
+            logger.exception("SQLite maintenance failed")
+        finally:
+            raw.close()
+
+
+# Shared writer, created on first use
+_write_queue: Optional[WriteQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    """
+    Return the process-wide WriteQueue (one writer thread, even when the
+    first writes come from concurrent syncs).
+    """
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue()
+        return _write_queue
+
+
+def run_write(job: Callable):
+    """
+    Run `job(session)` in a write transaction and return its result.
+    On tuned SQLite the job goes through the single WriteQueue; on other
+    databases it runs inline in its own session and is committed.
+    """
+    if engine.dialect.name == "sqlite" and SQLITE_TUNED:
+        return get_write_queue().run(job)
+
+    session = SessionLocal()
+    try:
+        result = job(session)
+        session.commit()
+        return result
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
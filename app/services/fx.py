@@ -0,0 +1,150 @@
+# app/services/fx.py
+
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple
+
+from .binance.symbols import get_symbol_registry
+from .pricing import get_asset_price
+from .price_history import load_klines, sync_klines
+from .utils.utils import to_timestamps
+
+if TYPE_CHECKING:  # numpy / pandas are imported lazily, on first computation
+    import numpy as np
+    import pandas as pd
+
+# Currency used for reporting when a request does not ask for another one
+DEFAULT_CURRENCY = os.getenv("REPORTING_CURRENCY", "USDT").upper()
+
+# Valuation currency of the pricing layer: no conversion needed
+QUOTE_CURRENCY = "USDT"
+
+# First day of the FX history (ms), Binance EURUSDT starts in 2020
+FX_HISTORY_START = int(os.getenv("FX_HISTORY_START", 1577836800000))
+
+# How long an in-memory FX series is reused before checking for new candles
+FX_REFRESH_SECONDS = int(os.getenv("FX_REFRESH_SECONDS", 3600))
+
+_rates_lock = threading.Lock()
+# currency -> (loaded_at, DataFrame[time, rate])
+_rates: Dict[str, Tuple[float, "pd.DataFrame"]] = {}
+
+
+def normalize_currency(currency: Optional[str]) -> str:
+    """
+    Validate a reporting currency code, defaulting to DEFAULT_CURRENCY.
+    A currency is supported if it trades directly against USDT (e.g. EURUSDT).
+
+    :raises ValueError: if the currency has no direct USDT market
+    """
+    currency = (currency or DEFAULT_CURRENCY).upper()
+    if currency == QUOTE_CURRENCY:
+        return currency
+    legs = get_symbol_registry().path_to_quote(currency)
+    if legs is None or len(legs) != 1:
+        raise ValueError(f"Unsupported reporting currency: {currency}")
+    return currency
+
+
+def get_rate_table(currency: str) -> "pd.DataFrame":
+    """
+    Historical USDT price of one unit of `currency`, from daily klines
+    stored locally (EURUSDT for EUR). Missing candles are downloaded first.
+
+    :return: DataFrame with int64 'time' (candle close, ms) and float 'rate', sorted by time
+    """
+    import pandas as pd
+
+    cached = _rates.get(currency)
+    if cached is not None and time.time() - cached[0] < FX_REFRESH_SECONDS:
+        return cached[1]
+
+    with _rates_lock:
+        cached = _rates.get(currency)
+        if cached is not None and time.time() - cached[0] < FX_REFRESH_SECONDS:
+            return cached[1]
+
+        (symbol, inverted), = get_symbol_registry().path_to_quote(currency)
+        sync_klines(symbol, interval="1d", start_time=FX_HISTORY_START)
+        klines = load_klines(symbol, interval="1d")
+        rates = 1.0 / klines["close"] if inverted else klines["close"]
+        table = pd.DataFrame({"time": klines["close_time"], "rate": rates})
+        _rates[currency] = (time.time(), table)
+        return table
+
+
+def _rates_at(times, currency: str) -> "pd.Series":
+    """
+    USDT price of `currency` as of each timestamp (ms), as one as-of join:
+    each time gets the last daily close at or before it, and times before
+    the first candle get the earliest known rate.
+    """
+    import pandas as pd
+
+    table = get_rate_table(currency)
+    left = pd.DataFrame({"time": pd.Series(times, dtype="int64")})
+    left["pos"] = range(len(left))
+    # merge_asof needs sorted keys: sort, join, then restore the input order
+    joined = pd.merge_asof(left.sort_values("time", kind="stable"), table, on="time")
+    # rows are time-sorted here, so bfill gives pre-history rows the first rate
+    joined["rate"] = joined["rate"].bfill()
+    return joined.sort_values("pos")["rate"].reset_index(drop=True)
+
+
+def get_rates_at(times, currency: Optional[str] = None) -> "np.ndarray":
+    """
+    USDT price of one unit of `currency` as of each timestamp (ms), as a
+    float array (ones for USDT). Dividing USDT values by it converts them.
+    """
+    import numpy as np
+
+    currency = normalize_currency(currency)
+    if currency == QUOTE_CURRENCY or len(times) == 0:
+        return np.ones(len(times))
+    return _rates_at(times, currency).to_numpy(dtype="float64")
+
+
+def convert_series(series: "pd.Series", currency: Optional[str] = None) -> "pd.Series":
+    """
+    Convert a USDT-valued series indexed by (local) datetime to `currency`.
+    """
+    currency = normalize_currency(currency)
+    if currency == QUOTE_CURRENCY or series.empty:
+        return series
+    rates = _rates_at(to_timestamps(series.index), currency)
+    return series / rates.values
+
+
+def convert_frame(
+    df: "pd.DataFrame",
+    currency: Optional[str] = None,
+    time_col: str = "time",
+    columns: Iterable[str] = ("value",),
+) -> "pd.DataFrame":
+    """
+    Convert USDT-valued columns of a ledger DataFrame to `currency`, using
+    the rate as of each row's `time_col` (ms timestamp).
+    Returns a new DataFrame; the input is left untouched.
+    """
+    currency = normalize_currency(currency)
+    if currency == QUOTE_CURRENCY or df.empty:
+        return df
+    rates = _rates_at(df[time_col].to_numpy(), currency).values
+    out = df.copy()
+    for col in columns:
+        out[col] = out[col] / rates
+    return out
+
+
+def convert_value(value: float, currency: Optional[str] = None) -> float:
+    """
+    Convert a current USDT amount to `currency` at the live rate.
+    """
+    currency = normalize_currency(currency)
+    if currency == QUOTE_CURRENCY:
+        return value
+    rate = get_asset_price(currency)
+    if not rate:
+        raise ValueError(f"No current rate for {currency}")
+    return value / rate
@@ -0,0 +1,381 @@
+# app/services/jobs.py
+
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from .binance.symbols import CACHE_DIR
+
+try:  # advisory lock, so overlapping cron runs of a job exit instead of racing
+    import fcntl
+except ImportError:  # Windows: no overlap protection
+    fcntl = None
+
+# Worker processes of offline jobs (flask sync, backfill-prices, ...)
+JOB_PROCESSES = int(os.getenv("JOB_PROCESSES", os.cpu_count() or 1))
+# Progress of each job, to resume an interrupted or partly failed run
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", os.path.join(CACHE_DIR, "jobs"))
+
+# Exit codes, for cron / systemd timers
+EXIT_OK = 0
+EXIT_FAILED = 1          # some tasks failed (a rerun resumes them)
+EXIT_TEMPFAIL = 75       # EX_TEMPFAIL: Binance unavailable or the job is already running
+EXIT_INTERRUPTED = 130   # stopped by SIGINT / SIGTERM (a rerun resumes)
+
+
+class JobState:
+    """
+    Progress of a job, saved after every task in JOB_STATE_DIR/<name>.json:
+    the results of the tasks done and the errors of the failed ones.
+
+    A run resumes the previous one (skipping the tasks it completed) if
+    that one did not finish cleanly and had the same parameters; otherwise
+    it starts over.
+    """
+
+    def __init__(self, name: str, params: dict, directory: str = JOB_STATE_DIR):
+        self.path = os.path.join(directory, f"{name}.json")
+        self.params = params
+        self.done: Dict[str, object] = {}
+        self.failed: Dict[str, str] = {}
+        self.resumed = False
+
+    def load(self, restart: bool = False) -> "JobState":
+        """
+        Pick up the tasks done by the previous run, unless `restart`.
+        """
+        if restart:
+            return self
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if not saved.get("finished") and saved.get("params") == self.params:
+            self.done = saved.get("done", {})
+            self.resumed = bool(self.done)
+        return self
+
+    def save(self, finished: bool = False) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "params": self.params,
+                "done": self.done,
+                "failed": self.failed,
+                "finished": finished,
+                "updated": int(time.time() * 1000),
+            }, f, default=str)
+        os.replace(tmp, self.path)
+
+
+class _RunLock:
+    """
+    Non-blocking exclusive lock of a job name, held for the whole run.
+    """
+
+    def __init__(self, name: str, directory: str = JOB_STATE_DIR):
+        self.path = os.path.join(directory, f"{name}.lock")
+        self._file = None
+
+    def acquire(self) -> bool:
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def _init_worker(processes: int) -> None:
+    """
+    Worker process setup: the per-IP request weight budget is split
+    between the workers, since each process has its own limiter.
+    """
+    from .binance import rate_limit
+
+    rate_limit.share_budget(processes)
+
+
+def _interrupt(signum, frame):
+    # SIGTERM (cron timeout, systemd stop) ends the run like Ctrl-C
+    raise KeyboardInterrupt
+
+
+def _count(result) -> int:
+    # tasks return a number of items (rows, candles), or anything else
+    return result if isinstance(result, int) and not isinstance(result, bool) else 1
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds // 60 % 60:02d}m" if seconds >= 3600 else f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def run_job(
+    name: str,
+    tasks: List[str],
+    fn: Callable,
+    args: tuple = (),
+    params: Optional[dict] = None,
+    processes: int = JOB_PROCESSES,
+    restart: bool = False,
+    unit: str = "items",
+    echo: Callable[[str], None] = print,
+    results: Optional[dict] = None,
+    resumable: bool = True,
+) -> int:
+    """
+    Run fn(task, *args) for every task, across `processes` worker processes
+    (in this process if 1), printing progress and throughput as tasks
+    complete. fn must be a module-level function (it is pickled); it
+    returns a number of `unit` processed, or a JSON-serializable result.
+
+    Progress is saved after every task (see JobState), so an interrupted or
+    partly failed run is resumed by the next one with the same params.
+    Jobs that must run every task each time (e.g. sync, itself incremental)
+    pass resumable=False. Results of all completed tasks, resumed ones
+    included, are put in `results` ({task: result}) when given.
+
+    :return: exit code: EXIT_OK, EXIT_FAILED, EXIT_TEMPFAIL or EXIT_INTERRUPTED
+    """
+    lock = _RunLock(name)
+    if not lock.acquire():
+        echo(f"{name}: another run is in progress")
+        return EXIT_TEMPFAIL
+    # signal handlers can only be installed from the main thread
+    handle = threading.current_thread() is threading.main_thread()
+    previous = signal.signal(signal.SIGTERM, _interrupt) if handle else None
+    try:
+        return _run(name, tasks, fn, args, params, processes, restart or not resumable, unit, echo, results)
+    finally:
+        if handle:
+            signal.signal(signal.SIGTERM, previous)
+        lock.release()
+
+
+def _run(name, tasks, fn, args, params, processes, restart, unit, echo, results) -> int:
+    from .resilience import CircuitOpenError
+
+    state = JobState(name, {"tasks": sorted(tasks), **(params or {})}).load(restart)
+    pending = [task for task in tasks if task not in state.done]
+    total = len(tasks)
+    if state.resumed:
+        echo(f"{name}: resuming, {total - len(pending)}/{total} tasks already done")
+
+    processes = max(1, min(processes, len(pending)))
+    started = time.monotonic()
+    items = 0
+    errors: Dict[str, BaseException] = {}
+
+    def report(task: str, result=None, error: BaseException = None, elapsed: float = 0.0) -> None:
+        nonlocal items
+        if error is None:
+            state.done[task] = result
+            state.failed.pop(task, None)
+            items += _count(result)
+        else:
+            errors[task] = error
+            state.failed[task] = str(error)
+        state.save()
+        completed = len(state.done) + len(errors)
+        spent = time.monotonic() - started
+        completed_here = completed - (total - len(pending))
+        rate = items / spent if spent > 0 else 0.0
+        eta = spent / completed_here * (total - completed) if completed_here else 0.0
+        status = f"failed: {error}" if error is not None else f"{_count(result):,} {unit}"
+        echo(
+            f"[{completed:>{len(str(total))}}/{total}] {task}: {status} ({elapsed:.1f}s)"
+            f" | {rate:,.1f} {unit}/s, eta {_duration(eta)}"
+        )
+
+    try:
+        if processes == 1:
+            for task in pending:
+                task_started = time.monotonic()
+                try:
+                    result = fn(task, *args)
+                except Exception as e:
+                    report(task, error=e, elapsed=time.monotonic() - task_started)
+                else:
+                    report(task, result, elapsed=time.monotonic() - task_started)
+        else:
+            # spawn: workers do not inherit threads (write queue, refreshers) or DB connections
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(processes,),
+            ) as pool:
+                futures = {pool.submit(fn, task, *args): (task, time.monotonic()) for task in pending}
+                try:
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            task, task_started = futures.pop(future)
+                            error = future.exception()
+                            report(
+                                task,
+                                None if error is not None else future.result(),
+                                error,
+                                time.monotonic() - task_started,
+                            )
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+    except KeyboardInterrupt:
+        state.save()
+        echo(f"{name}: interrupted after {len(state.done)}/{total} tasks, rerun to resume")
+        return EXIT_INTERRUPTED
+
+    state.save(finished=not errors)
+    if results is not None:
+        results.update(state.done)
+    spent = time.monotonic() - started
+    echo(
+        f"{name}: {len(state.done)}/{total} done, {len(errors)} failed in {_duration(spent)}"
+        f" ({items:,} {unit}, {items / spent if spent > 0 else 0.0:,.1f} {unit}/s)"
+    )
+    if not errors:
+        return EXIT_OK
+    if all(isinstance(e, CircuitOpenError) for e in errors.values()):
+        return EXIT_TEMPFAIL
+    return EXIT_FAILED
+
+
+# -- tasks (module-level, so worker processes can unpickle them) ------------
+
+def _row_count(account_id: int) -> int:
+    from sqlalchemy import func
+
+    from .db import Deposit, SessionLocal, Trade, Withdrawal
+
+    session = SessionLocal()
+    try:
+        return sum(
+            session.query(func.count()).select_from(model).filter(model.account_id == account_id).scalar()
+            for model in (Deposit, Withdrawal, Trade)
+        )
+    finally:
+        session.close()
+
+
+def sync_account(name: str) -> int:
+    """
+    Incremental sync of one account; returns the number of rows added.
+    """
+    from .multi_account_service import MultiAccountService
+
+    service = MultiAccountService().service(name)
+    before = _row_count(service.account_id)
+    service.sync()
+    return _row_count(service.account_id) - before
+
+
+def backfill_symbol(symbol: str, interval: str, starts: Dict[str, int]) -> int:
+    """
+    Download the missing candles of one market, from starts[symbol] (ms)
+    if none is stored yet; returns the number stored.
+    """
+    from .price_history import sync_klines
+
+    return sync_klines(symbol, interval=interval, start_time=starts[symbol])
+
+
+def backfill_symbols(since: Optional[int] = None) -> Dict[str, int]:
+    """
+    Markets whose daily candles value the portfolio: every leg pricing an
+    asset of the ledger in USDT, and the pair of each reporting currency.
+    Returns {symbol: start time (ms)}, from `since` or the first movement
+    of the asset.
+    """
+    from sqlalchemy import func, select
+
+    from .binance.performance import _ledger
+    from .binance.portfolio import BASE_ASSETS
+    from .binance.symbols import get_symbol_registry
+    from .binance.taxes import TAX_CURRENCY
+    from .db import SessionLocal
+    from .fx import DEFAULT_CURRENCY, FX_HISTORY_START
+
+    session = SessionLocal()
+    try:
+        ledger = _ledger(session)
+        firsts = dict(session.execute(
+            select(ledger.c.asset, func.min(ledger.c.time)).group_by(ledger.c.asset)
+        ).all())
+    finally:
+        session.close()
+
+    registry = get_symbol_registry()
+    symbols: Dict[str, int] = {}
+
+    def add(asset: str, start: int) -> None:
+        for symbol, _ in registry.path_to_quote(asset) or []:
+            symbols[symbol] = min(symbols.get(symbol, start), start)
+
+    for asset, first in firsts.items():
+        if asset not in BASE_ASSETS:
+            add(asset, int(first) if since is None else since)
+    for currency in (DEFAULT_CURRENCY, TAX_CURRENCY):
+        add(currency, FX_HISTORY_START if since is None else since)
+    return symbols
+
+
+def recompute_account(name: str, full: bool = False) -> int:
+    """
+    Bring the derived state of one account up to date: lot book (cost
+    basis), invested capital aggregates (rebuilt from scratch if full) and
+    the on-disk analytics cache. Returns the number of ledger timestamps.
+    """
+    from .accounts import get_account_registry
+    from .binance.analytics_store import get_analytics_store
+    from .binance.invested import InvestedCapitalService
+    from .binance.lots import LotService
+    from .db import SessionLocal
+
+    account = get_account_registry().get(name)
+    LotService(account.id).update()
+    invested = InvestedCapitalService(account.id)
+    if full:
+        invested.rebuild()
+    else:
+        invested.update()
+    store = get_analytics_store()
+    if store is None:
+        return 0
+    session = SessionLocal()
+    try:
+        return len(store.value_timeseries(session, account.id))
+    finally:
+        session.close()
+
+
+def tax_report(year: str, account: Optional[str] = None, currency: Optional[str] = None) -> dict:
+    """
+    Tax report of one fiscal year, of one account or netted over all of them.
+    """
+    from .multi_account_service import MultiAccountService
+
+    service = MultiAccountService()
+    if account:
+        return service.service(account).get_tax_report(int(year), currency)
+    return service.get_tax_report(int(year), currency)
@@ -0,0 +1,265 @@
+# app/services/live_portfolio.py
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .binance.symbols import get_symbol_registry
+from .price_feed import PriceTable, get_price_feed, get_price_table
+from .pricing import _get_client
+
+# Minimum delay between two pushes to subscribers (seconds): ticks arriving
+# in between are coalesced into a single update
+STREAM_THROTTLE = 1.0
+
+# How often quantities are refreshed from a new account snapshot (seconds)
+SNAPSHOT_REFRESH = 300.0
+
+# Without a running price feed, prices are polled over REST this often (seconds)
+REST_POLL_INTERVAL = 10.0
+
+
+class Subscription:
+    """
+    One stream consumer. Holds at most one pending message: a new update
+    arriving before the previous one was consumed is merged into it, so a
+    slow client costs a bounded amount of memory however fast prices move.
+    """
+
+    def __init__(self, currency: str):
+        self.currency = currency
+        self._pending: Optional[dict] = None
+        self._cond = threading.Condition()
+
+    def push(self, message: dict) -> None:
+        with self._cond:
+            if self._pending is None:
+                self._pending = message
+            else:
+                # Latest totals win, per-asset changes accumulate (one entry per asset)
+                assets = {**self._pending["assets"], **message["assets"]}
+                self._pending = {**message, "assets": assets}
+            self._cond.notify()
+
+    def pop(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Wait for the next message, or return None after `timeout` seconds.
+        """
+        with self._cond:
+            if self._pending is None:
+                self._cond.wait(timeout)
+            message, self._pending = self._pending, None
+            return message
+
+
+class LivePortfolio:
+    """
+    Portfolio value kept up to date from price ticks.
+
+    Quantities come from the last account snapshot. Each tick only
+    re-values the assets priced through the symbol that moved (one asset
+    for a direct USDT market) and adjusts the total by the difference,
+    instead of re-valuing the whole portfolio. A publisher thread pushes
+    the coalesced changes to subscribers at most every `throttle` seconds.
+    """
+
+    def __init__(
+        self,
+        fetch_quantities: Callable[[], Dict[str, float]],
+        table: Optional[PriceTable] = None,
+        throttle: float = STREAM_THROTTLE,
+        snapshot_refresh: float = SNAPSHOT_REFRESH,
+    ):
+        """
+        :param fetch_quantities: returns {asset: quantity} from a fresh account snapshot
+        :param table: price table to listen to (default: the shared one)
+        :param throttle: minimum seconds between two pushes
+        :param snapshot_refresh: seconds between two account snapshots
+        """
+        self.fetch_quantities = fetch_quantities
+        self.table = table or get_price_table()
+        self.throttle = throttle
+        self.snapshot_refresh = snapshot_refresh
+
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._wakeup = threading.Event()
+        self._running = False
+
+        self.quantities: Dict[str, float] = {}
+        self.paths: Dict[str, list] = {}
+        # symbol -> assets whose price path goes through it
+        self.dependents: Dict[str, List[str]] = {}
+        self.leg_prices: Dict[str, float] = {}
+        self.values: Dict[str, float] = {}
+        self.total = 0.0
+        self._changed: set = set()
+        self._dirty = False
+        self._snapshot_at = 0.0
+
+    # ---- state -------------------------------------------------------
+
+    def _watch(self, assets) -> None:
+        """
+        Register the price paths of `assets` and seed their leg prices.
+        """
+        registry = get_symbol_registry()
+        for asset in assets:
+            if asset in self.paths:
+                continue
+            legs = registry.path_to_quote(asset)
+            if legs is None:
+                continue
+            self.paths[asset] = legs
+            for symbol, _ in legs:
+                self.dependents.setdefault(symbol, []).append(asset)
+        # Seed unknown legs from the price table, then one REST request
+        missing = {s for s in self.dependents if s not in self.leg_prices}
+        self.leg_prices.update(self.table.get_many(missing))
+        missing -= self.leg_prices.keys()
+        if missing:
+            tickers = _get_client().get_symbol_prices(sorted(missing))
+            self.leg_prices.update({t["symbol"]: float(t["price"]) for t in tickers})
+
+    def _asset_price(self, asset: str) -> Optional[float]:
+        price = 1.0
+        for symbol, inverted in self.paths.get(asset, ()):
+            leg = self.leg_prices.get(symbol)
+            if not leg:
+                return None
+            price = price / leg if inverted else price * leg
+        return price if asset in self.paths else None
+
+    def refresh_snapshot(self) -> None:
+        """
+        Reload quantities from a fresh account snapshot and re-value everything.
+        """
+        quantities = self.fetch_quantities()
+        with self._lock:
+            self.quantities = quantities
+            self._watch(quantities)
+            self.values = {}
+            for asset, qty in quantities.items():
+                price = self._asset_price(asset)
+                if price is not None:
+                    self.values[asset] = qty * price
+            self.total = sum(self.values.values())
+            self._changed = set(self.values)
+            self._dirty = True
+            self._snapshot_at = time.time()
+        self._wakeup.set()
+
+    def on_tick(self, symbol: str, price: float) -> None:
+        """
+        PriceTable listener: apply the value change of the assets priced
+        through `symbol`, leaving every other asset untouched.
+        """
+        assets = self.dependents.get(symbol)
+        if not assets:
+            return
+        with self._lock:
+            self.leg_prices[symbol] = price
+            for asset in assets:
+                qty = self.quantities.get(asset)
+                new_price = self._asset_price(asset)
+                if qty is None or new_price is None:
+                    continue
+                new_value = qty * new_price
+                self.total += new_value - self.values.get(asset, 0.0)
+                self.values[asset] = new_value
+                self._changed.add(asset)
+            # Also set for FX legs only used to convert to a reporting currency
+            self._dirty = True
+        self._wakeup.set()
+
+    # ---- subscribers -------------------------------------------------
+
+    def subscribe(self, currency: str = "USDT") -> Subscription:
+        """
+        Register a consumer. The first one takes an account snapshot and
+        starts the publisher; every new consumer first receives the full state.
+        """
+        sub = Subscription(currency)
+        with self._lock:
+            if currency != "USDT":
+                self._watch([currency])
+            self._subscribers.append(sub)
+            start, self._running = not self._running, True
+        if start:
+            try:
+                self.refresh_snapshot()
+            except Exception:
+                # Not started: let the next subscriber retry
+                with self._lock:
+                    self._subscribers.remove(sub)
+                    self._running = False
+                raise
+            self.table.add_listener(self.on_tick)
+            threading.Thread(target=self._publish_loop, daemon=True, name="LivePortfolio").start()
+        with self._lock:
+            sub.push(self._message(set(self.values), currency))
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+        self._wakeup.set()
+
+    def _message(self, assets, currency: str) -> dict:
+        """
+        Payload for one currency; caller holds the lock.
+        """
+        rate = 1.0 if currency == "USDT" else self._asset_price(currency)
+        rate = rate or float("nan")
+        return {
+            "time": int(time.time() * 1000),
+            "currency": currency,
+            "value": self.total / rate,
+            "assets": {a: self.values[a] / rate for a in assets if a in self.values},
+        }
+
+    def _poll_rest(self) -> None:
+        """
+        Without a live feed, refresh the watched legs from one REST request.
+        """
+        tickers = _get_client().get_symbol_prices(sorted(self.dependents))
+        for t in tickers:
+            self.on_tick(t["symbol"], float(t["price"]))
+
+    def _publish_loop(self) -> None:
+        last_poll = 0.0
+        while True:
+            self._wakeup.wait(self.throttle)
+            self._wakeup.clear()
+            with self._lock:
+                if not self._subscribers:
+                    self.table.remove_listener(self.on_tick)
+                    self._running = False
+                    return
+
+            now = time.time()
+            try:
+                if now - self._snapshot_at > self.snapshot_refresh:
+                    self.refresh_snapshot()
+                if get_price_feed() is None and now - last_poll > REST_POLL_INTERVAL:
+                    last_poll = now
+                    self._poll_rest()
+            except RuntimeError:
+                # Upstream hiccup: keep streaming the last known values
+                pass
+
+            with self._lock:
+                changed, self._changed = self._changed, set()
+                dirty, self._dirty = self._dirty, False
+                subscribers = list(self._subscribers)
+                messages = {}
+                if changed or dirty:
+                    for sub in subscribers:
+                        if sub.currency not in messages:
+                            messages[sub.currency] = self._message(changed, sub.currency)
+            for sub in subscribers:
+                if sub.currency in messages:
+                    sub.push(messages[sub.currency])
+            # Throttle: never push more than once per interval
+            time.sleep(self.throttle)
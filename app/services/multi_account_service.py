@@ -0,0 +1,214 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from .accounts import AccountRegistry, get_account_registry
+from .amounts import format_units, get_asset_precisions, to_units
+from .binance_service import BinanceService
+from .fx import normalize_currency
+
+# Accounts processed concurrently. Requests of all accounts still share the
+# process-wide request weight budget (binance.rate_limit).
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", 8))
+
+
+class MultiAccountService:
+    """
+    Run BinanceService operations over every registered account in parallel
+    and merge the per-account results:
+    - Sync of all accounts under one shared rate-limit budget
+    - Aggregated portfolio summary, performance metrics and tax report
+    """
+
+    def __init__(self, registry: Optional[AccountRegistry] = None, max_workers: int = SYNC_WORKERS):
+        self.registry = registry or get_account_registry()
+        self.max_workers = max_workers
+        self._services: Dict[str, BinanceService] = {}
+        self._lock = threading.Lock()
+
+    def service(self, name: str = None) -> BinanceService:
+        """
+        BinanceService of one account (the first configured one if name is None).
+
+        :raises ValueError: if no account has this name
+        """
+        account = self.registry.get(name) if name else self.registry.all()[0]
+        with self._lock:
+            if account.name not in self._services:
+                self._services[account.name] = BinanceService(
+                    api_key=account.api_key,
+                    api_secret=account.api_secret,
+                    account_id=account.id,
+                )
+            return self._services[account.name]
+
+    def _map(self, fn: Callable[[BinanceService], object]) -> Dict[str, object]:
+        """
+        Apply fn to every account's service concurrently.
+        Returns {account name: result}; raises once all are done if any failed.
+        """
+        names = [account.name for account in self.registry.all()]
+        services = [self.service(name) for name in names]
+        workers = max(1, min(self.max_workers, len(services)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Workers run in a copy of the caller's context, so they share its
+            # request-scoped account snapshots (binance.snapshot)
+            futures = [pool.submit(contextvars.copy_context().run, fn, service) for service in services]
+
+        results, errors = {}, {}
+        for name, future in zip(names, futures):
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+        if errors:
+            from .resilience import CircuitOpenError
+
+            details = "; ".join(f"{name}: {e}" for name, e in errors.items())
+            # Binance unavailable for every failed account: keep it a fail-fast error
+            error = CircuitOpenError if all(isinstance(e, CircuitOpenError) for e in errors.values()) else RuntimeError
+            raise error(f"Failed for {len(errors)} account(s): {details}")
+        return results
+
+    def sync(self) -> None:
+        """
+        Incremental sync of every account in parallel.
+        """
+        self._map(lambda service: service.sync())
+
+    def get_portfolio_data(self, year: int = None, currency: str = None) -> dict:
+        """
+        Portfolio summary of all accounts: balances summed per asset,
+        invested / current value / P/L summed, plus the per-account details.
+        """
+        currency = normalize_currency(currency)
+        per_account = self._map(lambda service: service.get_portfolio_data(year=year, currency=currency))
+
+        # Balances are summed exactly in integer units, returned as decimal strings
+        assets = {bal["asset"] for data in per_account.values() for bal in data["balances"]}
+        decimals = get_asset_precisions().get_many(assets)
+        units = {}
+        for data in per_account.values():
+            for bal in data["balances"]:
+                free, locked = units.get(bal["asset"], (0, 0))
+                scale = decimals[bal["asset"]]
+                units[bal["asset"]] = (
+                    free + to_units(bal.get("free", "0"), scale),
+                    locked + to_units(bal.get("locked", "0"), scale),
+                )
+        balances = [
+            {
+                "asset": asset,
+                "free": format_units(free, decimals[asset]),
+                "locked": format_units(locked, decimals[asset]),
+            }
+            for asset, (free, locked) in units.items()
+        ]
+
+        return {
+            "currency": currency,
+            "balances": balances,
+            "invested": sum(d["invested"] for d in per_account.values()),
+            "current_value": sum(d["current_value"] for d in per_account.values()),
+            "profit_loss": sum(d["profit_loss"] for d in per_account.values()),
+            "accounts": per_account,
+        }
+
+    def get_performance_data(self, start_date=None, end_date=None, currency: str = None) -> dict:
+        """
+        Performance metrics of the combined portfolio: the value series of
+        each account is rebuilt concurrently, then summed before computing
+        the metrics (returns of a sum are not the sum of returns).
+        """
+        from .binance.performance import summarize
+
+        ts = self._value_timeseries(normalize_currency(currency))
+        if start_date is not None or end_date is not None:
+            ts = ts.loc[start_date:end_date]
+        return summarize(ts)
+
+    def _value_timeseries(self, currency: str):
+        """
+        Value series of the combined portfolio in `currency`: the series of
+        each account is rebuilt concurrently, then summed.
+        """
+        from .binance.performance import build_value_timeseries, merge_value_timeseries
+        from .fx import convert_series
+
+        per_account = self._map(lambda service: build_value_timeseries(service.db, service.account_id))
+        return convert_series(merge_value_timeseries(list(per_account.values())), currency)
+
+    def get_chart_series(
+        self, series: str = "value", period: str = "all", points: int = None,
+        currency: str = None, start_date=None, end_date=None,
+    ) -> dict:
+        """
+        Chart series of the combined portfolio (see BinanceService.get_chart_series),
+        cached until the data of any account changes.
+        """
+        from .binance.charts import get_chart_series
+        from .sync_utils import data_version
+
+        currency = normalize_currency(currency)
+        accounts = tuple(sorted(account.id for account in self.registry.all()))
+        return get_chart_series(
+            lambda: self._value_timeseries(currency),
+            scope=("accounts", accounts),
+            currency=currency,
+            version="|".join(data_version(account_id) for account_id in accounts),
+            series=series,
+            period=period,
+            points=points,
+            start=start_date,
+            end=end_date,
+        )
+
+    def get_attribution(
+        self, period: str = "all", currency: str = None, start_date=None, end_date=None, window: int = None,
+    ) -> dict:
+        """
+        Attribution and risk of the combined portfolio (see
+        BinanceService.get_attribution): the balances of every account are
+        summed per asset, cached until the data of any account changes.
+        """
+        from .binance.attribution import get_attribution
+        from .binance.performance import build_balance_frame
+        from .sync_utils import data_version
+
+        currency = normalize_currency(currency)
+        accounts = tuple(sorted(account.id for account in self.registry.all()))
+
+        def load_balances():
+            per_account = self._map(lambda service: build_balance_frame(service.db, service.account_id))
+            return list(per_account.values())
+
+        return get_attribution(
+            load_balances,
+            scope=("accounts", accounts),
+            currency=currency,
+            version="|".join(data_version(account_id) for account_id in accounts),
+            period=period,
+            start=start_date,
+            end=end_date,
+            window=window,
+        )
+
+    def get_tax_report(self, year: int, currency: str = None) -> dict:
+        """
+        Tax report of all accounts: realized gains and losses are computed
+        per account concurrently, then netted together.
+        """
+        from .binance.taxes import TAX_CURRENCY, build_report
+
+        currency = normalize_currency(currency or TAX_CURRENCY)
+        per_account = self._map(lambda service: service.get_tax_report(year, currency))
+        report = build_report(
+            year,
+            currency,
+            sum(r["realized_gains"] for r in per_account.values()),
+            sum(r["realized_losses"] for r in per_account.values()),
+        )
+        report["accounts"] = per_account
+        return report
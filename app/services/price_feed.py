@@ -0,0 +1,334 @@
+# app/services/price_feed.py
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Which background feed to run: "binance" (WebSocket streams), "local"
+# (in-process stand-in for tests and offline development) or "" (disabled)
+PRICE_STREAM = os.getenv("PRICE_STREAM", "").lower()
+
+# Prices older than this (seconds) are ignored and fetched over REST instead
+PRICE_MAX_AGE = float(os.getenv("PRICE_MAX_AGE", 60))
+
+STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+# Tick listener signature: callback(symbol, price)
+Listener = Callable[[str, float], None]
+
+
+class PriceTable:
+    """
+    In-memory table of the latest price per symbol.
+
+    Writers replace a whole (price, updated_at) tuple with a single dict
+    assignment and listeners are kept in an immutable tuple swapped on
+    change, so readers never take a lock: under the GIL they always see
+    either the old or the new entry, never a torn one.
+    """
+
+    def __init__(self):
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._listeners: Tuple[Listener, ...] = ()
+
+    def update(self, symbol: str, price: float) -> None:
+        """
+        Record a new price and notify listeners if it changed.
+        """
+        previous = self._prices.get(symbol)
+        self._prices[symbol] = (price, time.time())
+        if previous is not None and previous[0] == price:
+            return
+        for listener in self._listeners:
+            try:
+                listener(symbol, price)
+            except Exception:
+                logger.exception("Price listener failed for %s", symbol)
+
+    def update_many(self, prices: Dict[str, float]) -> None:
+        for symbol, price in prices.items():
+            self.update(symbol, price)
+
+    def get(self, symbol: str, max_age: Optional[float] = PRICE_MAX_AGE) -> Optional[float]:
+        """
+        Latest price for a symbol, or None if unknown or older than max_age seconds.
+        """
+        entry = self._prices.get(symbol)
+        if entry is None:
+            return None
+        price, updated_at = entry
+        if max_age is not None and time.time() - updated_at > max_age:
+            return None
+        return price
+
+    def get_many(self, symbols: Iterable[str], max_age: Optional[float] = PRICE_MAX_AGE) -> Dict[str, float]:
+        """
+        Fresh prices for the given symbols; unknown or stale symbols are omitted.
+        """
+        prices = {}
+        for symbol in symbols:
+            price = self.get(symbol, max_age)
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+    def add_listener(self, listener: Listener) -> None:
+        self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener: Listener) -> None:
+        self._listeners = tuple(l for l in self._listeners if l != listener)
+
+
+class PriceFeed(threading.Thread):
+    """
+    Base class for background threads feeding a PriceTable.
+    """
+
+    def __init__(self, table: PriceTable, symbols: Iterable[str] = ()):
+        super().__init__(daemon=True, name=type(self).__name__)
+        self.table = table
+        self.symbols = frozenset(symbols)
+        self._stop_event = threading.Event()
+
+    def set_symbols(self, symbols: Iterable[str]) -> None:
+        """
+        Change the subscribed symbols (takes effect on the next (re)connect).
+        """
+        self.symbols = frozenset(symbols)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+
+class BinanceStreamFeed(PriceFeed):
+    """
+    Consume Binance miniTicker and bookTicker market streams for a set of
+    symbols. bookTicker updates (mid of best bid/ask) arrive in real time,
+    miniTicker (last trade price) every second as a fallback.
+
+    The connection is re-established with exponential backoff, and while
+    it is down the table is refreshed from REST snapshots so readers keep
+    getting recent prices. Requires the optional `websocket-client` package.
+    """
+
+    def __init__(
+        self,
+        table: PriceTable,
+        symbols: Iterable[str] = (),
+        rest_client=None,
+        max_backoff: float = 60.0,
+    ):
+        super().__init__(table, symbols)
+        self._rest_client = rest_client
+        self.max_backoff = max_backoff
+        self._ws = None
+        self._subscribed = frozenset()
+
+    def set_symbols(self, symbols: Iterable[str]) -> None:
+        super().set_symbols(symbols)
+        # Drop the connection so run() resubscribes with the new streams
+        if self._ws is not None and self.symbols != self._subscribed:
+            self._ws.close()
+
+    def stop(self) -> None:
+        super().stop()
+        if self._ws is not None:
+            self._ws.close()
+
+    def _stream_url(self) -> str:
+        streams = []
+        for symbol in sorted(self.symbols):
+            streams.append(f"{symbol.lower()}@miniTicker")
+            streams.append(f"{symbol.lower()}@bookTicker")
+        return f"{STREAM_URL}?streams={'/'.join(streams)}"
+
+    def _on_message(self, _ws, message: str) -> None:
+        data = json.loads(message).get("data", {})
+        if "b" in data and "a" in data:
+            # bookTicker: {"s": symbol, "b": best bid, "a": best ask, ...}
+            price = (float(data["b"]) + float(data["a"])) / 2
+        elif "c" in data:
+            # miniTicker: {"s": symbol, "c": close price, ...}
+            price = float(data["c"])
+        else:
+            return
+        self.table.update(data["s"], price)
+
+    def _rest_snapshot(self) -> None:
+        """
+        Refresh every subscribed symbol from one REST ticker request.
+        """
+        if not self.symbols:
+            return
+        if self._rest_client is None:
+            from .binance.api_client import BinanceClient
+            self._rest_client = BinanceClient()
+        try:
+            tickers = self._rest_client.get_symbol_prices(sorted(self.symbols))
+        except RuntimeError as e:
+            logger.warning("REST price snapshot failed: %s", e)
+            return
+        self.table.update_many({t["symbol"]: float(t["price"]) for t in tickers})
+
+    def run(self) -> None:
+        import websocket
+
+        backoff = 1.0
+        while not self.stopped:
+            # Seed (or refresh, after a disconnect) the table over REST
+            self._rest_snapshot()
+            if not self.symbols:
+                self._stop_event.wait(PRICE_MAX_AGE / 2)
+                continue
+
+            self._subscribed = self.symbols
+            self._ws = websocket.WebSocketApp(
+                self._stream_url(),
+                on_message=self._on_message,
+                on_open=lambda _ws: logger.info("Price stream connected"),
+            )
+            started = time.time()
+            self._ws.run_forever(ping_interval=180, ping_timeout=10)
+            self._ws = None
+            if self.stopped:
+                break
+
+            # Reset the backoff after a connection that held for a while
+            if time.time() - started > 60:
+                backoff = 1.0
+            logger.warning("Price stream disconnected, reconnecting in %.0fs", backoff)
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+
+def _seed_prices(table: PriceTable, symbols: Iterable[str]) -> Dict[str, float]:
+    """
+    Starting price of each symbol for LocalPriceFeed: the table's last
+    price, else one REST ticker request for the others. Symbols left
+    unpriced (offline) are omitted rather than guessed, since the table
+    is what pricing trusts first.
+    """
+    symbols = list(symbols)
+    prices = {s: p for s in symbols if (p := table.get(s, max_age=None)) is not None}
+    missing = sorted(set(symbols) - set(prices))
+    if missing:
+        from .pricing import _get_client
+
+        try:
+            tickers = _get_client().get_symbol_prices(missing)
+        except Exception as e:
+            logger.warning("Local price feed: no seed price for %s (%s)", ", ".join(missing), e)
+        else:
+            prices.update({t["symbol"]: float(t["price"]) for t in tickers if t["symbol"] in missing})
+    return prices
+
+
+class LocalPriceFeed(PriceFeed):
+    """
+    Stand-in feed for tests and offline development: replays the given
+    (symbol, price) ticks, or random-walks the seed prices when no ticks
+    are given. Symbols without a seed price are never published.
+    """
+
+    def __init__(
+        self,
+        table: PriceTable,
+        prices: Optional[Dict[str, float]] = None,
+        ticks: Optional[Iterable[Tuple[str, float]]] = None,
+        interval: float = 1.0,
+        volatility: float = 0.001,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(table, (prices or {}).keys())
+        self.prices = dict(prices or {})
+        self.ticks = ticks
+        self.interval = interval
+        self.volatility = volatility
+        self._random = random.Random(seed)
+        table.update_many(self.prices)
+
+    def set_symbols(self, symbols: Iterable[str]) -> None:
+        super().set_symbols(symbols)
+        new = [symbol for symbol in self.symbols if symbol not in self.prices]
+        if new:
+            seeds = _seed_prices(self.table, new)
+            self.prices.update(seeds)
+            self.table.update_many(seeds)
+
+    def run(self) -> None:
+        if self.ticks is not None:
+            for symbol, price in self.ticks:
+                if self.stopped:
+                    return
+                self.table.update(symbol, price)
+                self._stop_event.wait(self.interval)
+            return
+
+        while not self._stop_event.wait(self.interval):
+            for symbol in list(self.prices):
+                self.prices[symbol] *= 1 + self._random.gauss(0, self.volatility)
+                self.table.update(symbol, self.prices[symbol])
+
+
+# Shared table and feed, created on first use
+_price_table = PriceTable()
+_feed: Optional[PriceFeed] = None
+_feed_lock = threading.Lock()
+
+
+def get_price_table() -> PriceTable:
+    """
+    Return the process-wide PriceTable.
+    """
+    return _price_table
+
+
+def get_price_feed() -> Optional[PriceFeed]:
+    """
+    Return the running price feed, or None if no feed is active.
+    """
+    feed = _feed
+    return feed if feed is not None and feed.is_alive() else None
+
+
+def start_price_feed(symbols: Iterable[str], kind: str = PRICE_STREAM) -> Optional[PriceFeed]:
+    """
+    Start the background price feed (or update its symbols if it already runs).
+
+    :param symbols: Symbols to keep live, e.g. ['BTCUSDT', 'EURUSDT']
+    :param kind: "binance", "local" or "" to keep the feed disabled
+    :return: The running feed, or None when disabled
+    """
+    global _feed
+    if not kind:
+        return None
+    with _feed_lock:
+        if _feed is not None and _feed.is_alive():
+            _feed.set_symbols(symbols)
+            return _feed
+        if kind == "binance":
+            _feed = BinanceStreamFeed(_price_table, symbols)
+        elif kind == "local":
+            _feed = LocalPriceFeed(_price_table, _seed_prices(_price_table, symbols))
+        else:
+            raise ValueError(f"Unknown price stream: {kind}")
+        _feed.start()
+        return _feed
+
+
+def stop_price_feed() -> None:
+    global _feed
+    with _feed_lock:
+        if _feed is not None:
+            _feed.stop()
+            _feed = None
@@ -0,0 +1,116 @@
+# app/services/price_history.py
+
+import time
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import func
+
+from .bulk import bulk_upsert
+from .db import Kline, SessionLocal, run_write
+from .pricing import _get_client
+
+if TYPE_CHECKING:  # pandas is imported lazily, on first computation
+    import pandas as pd
+
+# Candle duration in milliseconds for the intervals we store
+INTERVAL_MS = {
+    "1m": 60_000,
+    "1h": 3_600_000,
+    "1d": 86_400_000,
+}
+
+# Binance returns at most 1000 candles per request
+KLINES_PAGE_SIZE = 1000
+
+
+def sync_klines(
+    symbol: str,
+    interval: str = "1d",
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    session=None,
+) -> int:
+    """
+    Download the closed candles missing from the local store for a symbol.
+    Only candles newer than the last stored one (or start_time) are fetched.
+
+    :param symbol: Symbol string, e.g. 'EURUSDT'
+    :param interval: Kline interval, one of INTERVAL_MS
+    :param start_time: First open time to fetch (ms) when nothing is stored yet
+    :param end_time: Last open time to fetch (ms), defaults to now
+    :param session: Optional SQLAlchemy session used to read the store. If not provided, a new session is created and closed internally.
+    :return: Number of candles inserted
+    """
+    step = INTERVAL_MS[interval]
+    own_session = False
+    if session is None:
+        session = SessionLocal()
+        own_session = True
+    try:
+        last = session.query(func.max(Kline.open_time)).filter_by(
+            symbol=symbol, interval=interval
+        ).scalar()
+        cursor = last + step if last is not None else (start_time or 0)
+        # Never store the candle that is still open
+        now = int(time.time() * 1000)
+        end = min(end_time or now, now - step)
+
+        inserted = 0
+        while cursor <= end:
+            klines = _get_client().get_klines(
+                symbol,
+                interval=interval,
+                start_time=cursor,
+                end_time=end,
+                limit=KLINES_PAGE_SIZE,
+            )
+            if not klines:
+                break
+            rows = [
+                {"symbol": symbol, "interval": interval, "open_time": int(k[0]), "close": float(k[4])}
+                for k in klines
+            ]
+            run_write(lambda write_session: bulk_upsert(write_session, Kline, rows))
+            inserted += len(klines)
+            cursor = int(klines[-1][0]) + step
+        return inserted
+    finally:
+        if own_session:
+            session.close()
+
+
+def load_klines(
+    symbol: str,
+    interval: str = "1d",
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    session=None,
+) -> "pd.DataFrame":
+    """
+    Read stored candles as a DataFrame with int64 columns 'open_time',
+    'close_time' (ms) and float column 'close', sorted by time.
+    """
+    import pandas as pd
+
+    own_session = False
+    if session is None:
+        session = SessionLocal()
+        own_session = True
+    try:
+        query = session.query(Kline.open_time, Kline.close).filter_by(
+            symbol=symbol, interval=interval
+        )
+        if start_time is not None:
+            query = query.filter(Kline.open_time >= start_time)
+        if end_time is not None:
+            query = query.filter(Kline.open_time <= end_time)
+        rows = query.order_by(Kline.open_time).all()
+    finally:
+        if own_session:
+            session.close()
+
+    df = pd.DataFrame(rows, columns=["open_time", "close"])
+    df["open_time"] = df["open_time"].astype("int64")
+    df["close"] = df["close"].astype("float64")
+    df["close_time"] = df["open_time"] + INTERVAL_MS[interval] - 1
+    return df
@@ -1,10 +1,36 @@
+import os
 import time
-from typing import Optional
+from typing import Dict, Iterable, Optional, Set, Tuple
 
 from .binance.api_client import BinanceClient
+from .binance.symbols import get_symbol_registry
+from .price_feed import get_price_table
+from .resilience import SingleFlight, get_refresher, note_stale
 
-# Shared Binance client instance
-_client = BinanceClient()
+# REST tickers younger than this (seconds) are reused as is
+TICKER_MAX_AGE = float(os.getenv("TICKER_MAX_AGE", 5))
+# Older tickers up to this age are served at once (flagged stale) while a
+# background refresh runs. When Binance is unavailable, the last known
+# ticker is served whatever its age.
+TICKER_STALE_SECONDS = float(os.getenv("TICKER_STALE_SECONDS", 900))
+
+# Shared Binance client instance, created on first use
+_client: Optional[BinanceClient] = None
+
+# symbol -> (price, fetched_at) of the last successful REST fetch
+_tickers: Dict[str, Tuple[float, float]] = {}
+# Concurrent fetches of the same symbol share one request
+_ticker_flight = SingleFlight()
+
+
+def _get_client() -> BinanceClient:
+    """
+    Return the shared Binance client, building it on first call.
+    """
+    global _client
+    if _client is None:
+        _client = BinanceClient()
+    return _client
 
 
 def get_current_price(symbol: str) -> float:
@@ -14,13 +40,67 @@ def get_current_price(symbol: str) -> float:
     :param symbol: Symbol string, e.g., 'ETHUSDT'
     :return: Current price as float
     """
+    # Served from the live price table when a stream keeps it fresh
+    price = get_price_table().get(symbol)
+    if price is not None:
+        return price
     # Binance’s public endpoint for current price
-    data = _client._signed_request(
-        method="GET",
-        path="/api/v3/ticker/price",
-        params={"symbol": symbol}
-    )
-    return float(data.get("price", 0.0))
+    return get_ticker_prices([symbol]).get(symbol, 0.0)
+
+
+def _fetch_tickers(symbols: Set[str]) -> Dict[str, float]:
+    """
+    Fetch tickers in one request and remember them as last known good.
+    """
+    tickers = _get_client().get_symbol_prices(sorted(symbols))
+    fetched_at = time.time()
+    prices = {t["symbol"]: float(t["price"]) for t in tickers}
+    for symbol, price in prices.items():
+        _tickers[symbol] = (price, fetched_at)
+    return prices
+
+
+def get_ticker_prices(symbols: Iterable[str]) -> Dict[str, float]:
+    """
+    Current REST tickers, stale-while-revalidate:
+    - younger than TICKER_MAX_AGE: reused;
+    - younger than TICKER_STALE_SECONDS: served at once, flagged stale
+      (resilience.note_stale), and refreshed by one background fetch;
+    - otherwise fetched now, concurrent callers of a symbol sharing one
+      request. If that fails (Binance down, circuit open), the last known
+      tickers are served, flagged stale.
+    Symbols Binance does not know are omitted.
+
+    :raises RuntimeError: if a fetch failed for a symbol never fetched before
+    """
+    now = time.time()
+    prices, stale, missing = {}, set(), set()
+    for symbol in set(symbols):
+        known = _tickers.get(symbol)
+        if known is None or now - known[1] >= TICKER_STALE_SECONDS:
+            missing.add(symbol)
+            continue
+        prices[symbol] = known[0]
+        if now - known[1] >= TICKER_MAX_AGE:
+            stale.add(symbol)
+            note_stale(known[1])
+
+    if stale:
+        get_refresher().submit(
+            {("ticker", symbol) for symbol in stale},
+            lambda keys: _ticker_flight.do_many({symbol for _, symbol in keys}, _fetch_tickers),
+        )
+    if missing:
+        try:
+            prices.update(_ticker_flight.do_many(missing, _fetch_tickers))
+        except RuntimeError:
+            if any(symbol not in _tickers for symbol in missing):
+                raise
+            for symbol in missing:
+                price, fetched_at = _tickers[symbol]
+                prices[symbol] = price
+                note_stale(fetched_at)
+    return prices
 
 
 def get_price_at(symbol: str, timestamp: int) -> Optional[float]:
@@ -32,19 +112,79 @@ def get_price_at(symbol: str, timestamp: int) -> Optional[float]:
     :return: Closing price as float, or None if unavailable
     """
     # Query Binance Klines endpoint with interval=1m starting at the timestamp
-    params = {
-        "symbol": symbol,
-        "interval": "1m",
-        "startTime": timestamp,
-        "limit": 1
-    }
-    klines = _client._signed_request(
-        method="GET",
-        path="/api/v3/klines",
-        params=params
+    klines = _get_client().get_klines(
+        symbol,
+        interval="1m",
+        start_time=timestamp,
+        limit=1,
     )
     if not klines:
         return None
     # Kline format: [openTime, open, high, low, close, ...]
     close_price = float(klines[0][4])
-    return close_price
\ No newline at end of file
+    return close_price
+
+def _resolve_legs(legs, prices: Dict[str, float]) -> Optional[float]:
+    """
+    Multiply the leg prices of a conversion path, inverting where needed.
+    Returns None if any leg price is missing or zero.
+    """
+    value = 1.0
+    for symbol, inverted in legs:
+        price = prices.get(symbol)
+        if not price:
+            return None
+        value = value / price if inverted else value * price
+    return value
+
+
+def get_asset_prices(assets: Iterable[str]) -> Dict[str, Optional[float]]:
+    """
+    Current price of each asset in the registry's quote asset (USDT), resolved
+    through the cheapest market path (e.g. X->BTC->USDT) when there is no
+    direct market. Tickers come from the live price table when available,
+    the rest are fetched in a single request (see get_ticker_prices: last
+    known prices are served while Binance is unavailable), and assets
+    without any path get None without touching the network.
+
+    :param assets: Asset codes, e.g. ['BTC', 'ETH']
+    :return: Mapping asset -> price (None if unavailable)
+    """
+    registry = get_symbol_registry()
+    paths = {asset: registry.path_to_quote(asset) for asset in set(assets)}
+    symbols = {symbol for legs in paths.values() if legs for symbol, _ in legs}
+
+    # Live prices first; only symbols the price table lacks go over REST
+    prices: Dict[str, float] = get_price_table().get_many(symbols)
+    missing = symbols - prices.keys()
+    if missing:
+        prices.update(get_ticker_prices(missing))
+
+    return {
+        asset: None if legs is None else _resolve_legs(legs, prices)
+        for asset, legs in paths.items()
+    }
+
+
+def get_asset_price(asset: str) -> Optional[float]:
+    """
+    Current price of a single asset in USDT, see get_asset_prices().
+    """
+    return get_asset_prices([asset])[asset]
+
+
+def get_asset_price_at(asset: str, timestamp: int) -> Optional[float]:
+    """
+    Historical price of an asset in USDT at the given timestamp (ms),
+    resolved through the same path as get_asset_prices().
+    """
+    legs = get_symbol_registry().path_to_quote(asset)
+    if legs is None:
+        return None
+    prices = {}
+    for symbol, _ in legs:
+        price = get_price_at(symbol, timestamp)
+        if price is None:
+            return None
+        prices[symbol] = price
+    return _resolve_legs(legs, prices)
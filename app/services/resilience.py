@@ -0,0 +1,319 @@
+# app/services/resilience.py
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures of an endpoint that open its circuit
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 3))
+# Seconds an open circuit fails fast before letting one probe call through
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", 30))
+# Background refreshes running at once (stale-while-revalidate)
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", 4))
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling an endpoint whose circuit is open. A
+    RuntimeError like the upstream errors it stands for, so existing error
+    handling applies; it is raised immediately, without waiting for a timeout.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one upstream endpoint.
+
+    closed: calls go through; `failure_threshold` consecutive failures open it.
+    open: calls fail fast with CircuitOpenError for `reset_timeout` seconds.
+    half-open: then a single probe call goes through (the others still fail
+    fast); its success closes the circuit, its failure opens it again. A
+    probe that never reports back (e.g. its caller was cancelled) is
+    replaced by a new one after another reset_timeout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _can_probe(self, now: float) -> bool:
+        return now - self._opened_at >= self.reset_timeout and (
+            self._probe_at is None or now - self._probe_at >= self.reset_timeout
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probe_at is not None or self._can_probe(time.monotonic()):
+                return "half-open"
+            return "open"
+
+    def before_call(self) -> bool:
+        """
+        Check that a call may go through (and claim the probe when half-open).
+        Returns True if the call is the probe.
+
+        :raises CircuitOpenError: while the circuit is open
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            now = time.monotonic()
+            if self._can_probe(now):
+                self._probe_at = now
+                return True
+            retry_in = max(0.0, self.reset_timeout - (now - (self._probe_at or self._opened_at)))
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._probe_at = None
+
+    def release_probe(self) -> None:
+        """
+        Give up the probe claimed by a call that ended without an outcome
+        (cancelled): the next call may probe right away.
+        """
+        with self._lock:
+            self._probe_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_at is not None or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    logger.warning("Circuit %s opened after %d failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+                self._probe_at = None
+
+    def call(self, fn: Callable, *args, is_failure: Callable[[BaseException], bool] = None, **kwargs):
+        """
+        Run fn through the breaker. Exceptions for which is_failure returns
+        False (e.g. a 4xx answer: the endpoint is up) count as successes.
+        """
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            if is_failure is None or is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+def is_upstream_failure(status: Optional[int]) -> bool:
+    """
+    Whether an HTTP outcome counts against the endpoint's breaker: no
+    answer (timeout, connection error), a 5xx, or a rate limit ban
+    (418 / 429). Other 4xx answers mean the endpoint is up.
+    """
+    return status is None or status >= 500 or status in (418, 429)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Process-wide breaker of an endpoint, created on first use.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_states() -> Dict[str, str]:
+    """
+    {endpoint: "closed" | "open" | "half-open"} of every breaker in use.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.state for b in breakers}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent fetches of the same keys: a key already being
+    fetched by another thread is awaited, not requested again.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do_many(
+        self, keys: Iterable[Hashable], fetch: Callable[[Set[Hashable]], dict], timeout: Optional[float] = None
+    ) -> dict:
+        """
+        {key: value} for every key: the keys nobody is fetching are fetched
+        with one fetch(keys) call (returning a dict, possibly missing some
+        keys), the others are taken from the fetches in flight.
+        Errors of any fetch this call depends on are raised.
+        """
+        keys = set(keys)
+        with self._lock:
+            waiting = {key: self._in_flight[key] for key in keys if key in self._in_flight}
+            own = keys - waiting.keys()
+            future = Future() if own else None
+            for key in own:
+                self._in_flight[key] = future
+
+        results = {}
+        if own:
+            try:
+                fetched = fetch(own)
+                future.set_result(fetched)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    for key in own:
+                        self._in_flight.pop(key, None)
+            results.update({key: fetched[key] for key in own if key in fetched})
+        for key, pending in waiting.items():
+            fetched = pending.result(timeout)
+            if key in fetched:
+                results[key] = fetched[key]
+        return results
+
+    def do(self, key: Hashable, fetch: Callable[[], object], timeout: Optional[float] = None):
+        """
+        Result of fetch() for one key, shared with concurrent callers.
+        """
+        return self.do_many([key], lambda _: {key: fetch()}, timeout)[key]
+
+
+class BackgroundRefresher:
+    """
+    Runs refreshes off the request path, at most one in flight per key.
+    """
+
+    def __init__(self, max_workers: int = REFRESH_WORKERS):
+        self.max_workers = max_workers
+        self._running: Set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def running(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._running
+
+    def submit(self, keys: Iterable[Hashable], refresh: Callable[[Set[Hashable]], object]) -> bool:
+        """
+        Schedule refresh(keys) for the keys not already being refreshed.
+        Returns False if there were none. Failures are logged only: the
+        stale values stay in place until a refresh succeeds.
+        """
+        with self._lock:
+            keys = set(keys) - self._running
+            if not keys:
+                return False
+            self._running |= keys
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="refresh")
+
+        def run():
+            try:
+                refresh(keys)
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %s", sorted(map(str, keys)), e)
+            finally:
+                with self._lock:
+                    self._running -= keys
+
+        self._executor.submit(run)
+        return True
+
+
+_refresher = BackgroundRefresher()
+
+
+def get_refresher() -> BackgroundRefresher:
+    """
+    Process-wide background refresher.
+    """
+    return _refresher
+
+
+# Oldest fetch time (time.time()) of the stale values served in the current
+# scope, in a mutable holder shared by copies of the context (worker threads)
+_stale_scope: contextvars.ContextVar = contextvars.ContextVar("stale_scope", default=None)
+
+
+def note_stale(fetched_at: float) -> None:
+    """
+    Record that a last-known-good value fetched at `fetched_at` was served
+    instead of a fresh one (no-op outside of a staleness scope).
+    """
+    scope = _stale_scope.get()
+    if scope is not None and (scope[0] is None or fetched_at < scope[0]):
+        scope[0] = fetched_at
+
+
+def stale_since() -> Optional[float]:
+    """
+    Fetch time of the oldest stale value served in the current scope, or
+    None if everything was fresh.
+    """
+    scope = _stale_scope.get()
+    return None if scope is None else scope[0]
+
+
+def open_stale_scope() -> contextvars.Token:
+    """
+    Start collecting staleness (Flask before_request); pass the returned
+    token to close_stale_scope().
+    """
+    return _stale_scope.set([None])
+
+
+def close_stale_scope(token: contextvars.Token) -> None:
+    try:
+        _stale_scope.reset(token)
+    except ValueError:
+        # Closed from another context (e.g. after a streamed response)
+        _stale_scope.set(None)
+
+
+__all__ = [
+    "CircuitOpenError",
+    "CircuitBreaker",
+    "is_upstream_failure",
+    "get_breaker",
+    "breaker_states",
+    "SingleFlight",
+    "BackgroundRefresher",
+    "get_refresher",
+    "note_stale",
+    "stale_since",
+    "open_stale_scope",
+    "close_stale_scope",
+]
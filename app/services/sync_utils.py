@@ -1,18 +1,18 @@
 # app/services/sync_utils.py
 
-from .db import SessionLocal, SyncMeta
+from .db import DEFAULT_ACCOUNT_ID, SessionLocal, SyncMeta
 
 
-def get_last_sync(key: str = "binance") -> int:
+def get_last_sync(key: str = "binance", account_id: int = DEFAULT_ACCOUNT_ID) -> int:
     """
-    Récupère le timestamp (en ms) du dernier sync pour la clé donnée.
+    Récupère le timestamp (en ms) du dernier sync pour la clé et le compte donnés.
     Si aucune entrée n'existe, initialise à 0.
     """
     db = SessionLocal()
     try:
-        meta = db.query(SyncMeta).filter_by(key=key).first()
+        meta = db.query(SyncMeta).filter_by(key=key, account_id=account_id).first()
         if meta is None:
-            meta = SyncMeta(key=key, value=0)
+            meta = SyncMeta(key=key, account_id=account_id, value=0)
             db.add(meta)
             db.commit()
         return meta.value
@@ -20,19 +20,93 @@ def get_last_sync(key: str = "binance") -> int:
         db.close()
 
 
-def set_last_sync(ts: int, key: str = "binance") -> None:
+def set_last_sync(ts: int, key: str = "binance", account_id: int = DEFAULT_ACCOUNT_ID) -> None:
     """
-    Met à jour le timestamp (en ms) du dernier sync pour la clé donnée.
+    Met à jour le timestamp (en ms) du dernier sync pour la clé et le compte donnés.
     """
     db = SessionLocal()
     try:
-        meta = db.query(SyncMeta).filter_by(key=key).first()
+        meta = db.query(SyncMeta).filter_by(key=key, account_id=account_id).first()
         if meta is None:
             # Au cas où get_last_sync n'aurait pas encore été appelé
-            meta = SyncMeta(key=key, value=ts)
+            meta = SyncMeta(key=key, account_id=account_id, value=ts)
             db.add(meta)
         else:
             meta.value = ts
         db.commit()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_sync_marks(prefix: str, account_id: int = DEFAULT_ACCOUNT_ID) -> dict:
+    """
+    Return {suffix: value} for every sync marker of the account whose key
+    starts with `prefix`, e.g. the per-symbol trade marks "trades:BTCUSDT".
+    Markers that were never set are simply absent.
+    """
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(SyncMeta.key, SyncMeta.value)
+            .filter(SyncMeta.account_id == account_id, SyncMeta.key.startswith(prefix, autoescape=True))
+            .all()
+        )
+        return {key[len(prefix):]: value for key, value in rows}
+    finally:
+        db.close()
+
+
+def set_sync_marks(prefix: str, marks: dict, account_id: int = DEFAULT_ACCOUNT_ID) -> None:
+    """
+    Store {suffix: value} as the sync markers `prefix + suffix` of the
+    account, in one transaction.
+    """
+    if not marks:
+        return
+    db = SessionLocal()
+    try:
+        existing = {
+            meta.key: meta
+            for meta in db.query(SyncMeta).filter(
+                SyncMeta.account_id == account_id,
+                SyncMeta.key.in_([prefix + suffix for suffix in marks]),
+            )
+        }
+        for suffix, value in marks.items():
+            meta = existing.get(prefix + suffix)
+            if meta is None:
+                db.add(SyncMeta(key=prefix + suffix, account_id=account_id, value=value))
+            else:
+                meta.value = value
+        db.commit()
+    finally:
+        db.close()
+
+
+def data_version(account_id: int = None, session=None) -> str:
+    """
+    Fingerprint of the stored data a computation depends on: row count and
+    latest time of the deposits, withdrawals and trades (of one account, or
+    of all accounts if account_id is None), and of the stored klines (FX
+    rates). It changes whenever a sync adds or re-times rows, so results
+    cached under it never outlive the data they were computed from.
+    """
+    from sqlalchemy import func
+
+    from .db import Deposit, Kline, Trade, Withdrawal
+
+    own_session = session is None
+    if own_session:
+        session = SessionLocal()
+    try:
+        parts = []
+        for model in (Deposit, Withdrawal, Trade):
+            query = session.query(func.count(), func.max(model.time))
+            if account_id is not None:
+                query = query.filter(model.account_id == account_id)
+            parts.append(query.one())
+        parts.append(session.query(func.count(), func.max(Kline.open_time)).one())
+        return "-".join(f"{count}.{latest or 0}" for count, latest in parts)
+    finally:
+        if own_session:
+            session.close()
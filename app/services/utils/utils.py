@@ -34,4 +34,31 @@ def from_timestamp(ts: int) -> datetime:
     # Convert milliseconds to seconds
     seconds = ts / 1000
     # Create datetime
-    return datetime.fromtimestamp(seconds)
\ No newline at end of file
+    return datetime.fromtimestamp(seconds)
+
+def to_timestamps(index) -> "np.ndarray":
+    """
+    Vectorized to_timestamp(): convert a pandas DatetimeIndex (naive local
+    time, as produced by from_timestamps) to an int64 array of milliseconds.
+    """
+    import numpy as np
+    import pandas as pd
+    from dateutil.tz import tzlocal
+
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize(tzlocal(), ambiguous="NaT", nonexistent="shift_forward")
+    delta = index.tz_convert("UTC") - pd.Timestamp(0, tz="UTC")
+    return np.asarray(delta // pd.Timedelta(milliseconds=1), dtype="int64")
+
+
+def from_timestamps(ts) -> "pd.DatetimeIndex":
+    """
+    Vectorized from_timestamp(): convert an array of millisecond timestamps
+    to a naive DatetimeIndex in local time.
+    """
+    import pandas as pd
+    from dateutil.tz import tzlocal
+
+    index = pd.to_datetime(ts, unit="ms", utc=True)
+    return pd.DatetimeIndex(index).tz_convert(tzlocal()).tz_localize(None)
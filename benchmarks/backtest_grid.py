@@ -0,0 +1,80 @@
+"""
+Time a parameter sweep of the allocation backtester on synthetic data
+(random-walk prices, monthly deposits): every combination of target
+weights, rebalance frequency and fee rate, simulated in process and
+across a process pool.
+
+    python benchmarks/backtest_grid.py --days 2000 --assets 6 --steps 11
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app.services.binance.backtest import DAY_MS, REBALANCE_UNITS, BacktestData, run_backtests  # noqa: E402
+
+FEE_RATES = [0.0, 0.00075, 0.001, 0.0025]
+
+
+def make_data(days: int, n_assets: int) -> BacktestData:
+    rng = np.random.default_rng(0)
+    start = 1_577_836_800_000 + DAY_MS - 1
+    times = np.arange(start, start + days * DAY_MS, DAY_MS, dtype="int64")
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.04, (days, n_assets)), axis=0))
+    flows = np.zeros(days)
+    flows[::30] = 500.0
+    return BacktestData(times, [f"A{i}" for i in range(n_assets)], prices, flows)
+
+
+def make_variants(assets: list, steps: int) -> list:
+    # the first two assets swept on a grid, the rest split the remainder
+    grid = np.linspace(0, 1, steps)
+    variants = []
+    for a, b in itertools.product(grid, grid):
+        if a + b > 1 + 1e-9:
+            continue
+        rest = max(1 - a - b, 0.0) / max(len(assets) - 2, 1)
+        weights = {asset: rest for asset in assets[2:]}
+        weights.update({assets[0]: a, assets[1]: b})
+        for rebalance, fee_rate in itertools.product(REBALANCE_UNITS, FEE_RATES):
+            variants.append({"weights": weights, "rebalance": rebalance, "fee_rate": fee_rate})
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=2000)
+    parser.add_argument("--assets", type=int, default=6)
+    parser.add_argument("--steps", type=int, default=11)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    data = make_data(args.days, args.assets)
+    variants = make_variants(data.assets, args.steps)
+    print(f"{len(variants)} variants, {args.days} days x {args.assets} assets")
+
+    started = time.perf_counter()
+    serial = run_backtests(variants, currency="USDT", processes=0, data=data)
+    elapsed = time.perf_counter() - started
+    print(f"in process:     {elapsed:6.2f}s ({elapsed / len(variants) * 1000:.2f} ms/variant)")
+
+    started = time.perf_counter()
+    pooled = run_backtests(variants, currency="USDT", processes=args.processes, data=data)
+    elapsed = time.perf_counter() - started
+    print(f"{args.processes:>2} processes:   {elapsed:6.2f}s ({elapsed / len(variants) * 1000:.2f} ms/variant)")
+
+    assert all(np.isclose(a["final_value"], b["final_value"]) for a, b in zip(serial, pooled))
+    best = max(serial, key=lambda r: r["final_value"])
+    print(f"best: {best['rebalance']} fee={best['fee_rate']} final_value={best['final_value']:.0f}"
+          f" invested={best['invested']:.0f} max_drawdown={best['max_drawdown']:.3f}")
+    print("OK: in-process and pooled results match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Time the JSON encoding of typical API payloads:
+- Flask's default provider (standard library json), which cannot encode
+  pandas objects: they are converted to columns first (conversion timed too)
+- FastJSONProvider (orjson when installed, columnar NumPy / pandas)
+- gzip compression of the result, as done for large /api/* responses
+
+    python benchmarks/json_encoding.py --rows 200000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app.encoding import JSON_GZIP_LEVEL, FastJSONProvider, _orjson, encode_columnar  # noqa: E402
+
+ASSETS = ["BTC", "ETH", "BNB", "SOL", "ADA", "XRP", "DOT", "AVAX"]
+
+
+def make_payloads(rows: int) -> dict:
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2020-01-01", periods=rows, freq="min")
+    positions = [
+        {
+            "asset": f"{ASSETS[i % len(ASSETS)]}{i}",
+            "quantity": float(rng.uniform(0, 10)),
+            "price": float(rng.uniform(0, 60000)),
+            "value": float(rng.uniform(0, 100000)),
+            "avg_entry_price": float(rng.uniform(0, 60000)),
+            "realized_pnl": float(rng.normal()),
+            "unrealized_pnl": None,
+        }
+        for i in range(rows // 100)
+    ]
+    ledger = pd.DataFrame({
+        "time": (times.asi8 // 1_000_000),
+        "asset": rng.choice(ASSETS, rows),
+        "amount": rng.normal(size=rows),
+    })
+    value = pd.Series(rng.normal(size=rows).cumsum() + 1000, index=times)
+    returns = value.pct_change()
+    return {
+        "positions": positions,
+        "ledger": {"ledger": ledger},
+        "timeseries": {"value_timeseries": value, "returns": returns, "max_drawdown": -0.42},
+    }
+
+
+def plain(obj):
+    # What a route must do before handing pandas objects to jsonify()
+    if isinstance(obj, dict):
+        return {k: plain(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [plain(v) for v in obj]
+    return encode_columnar(obj)
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    print(f"fast path: {'orjson' if _orjson() is not None else 'standard library (orjson not installed)'}")
+    print(f"{'payload':<12} {'default ms':>11} {'fast ms':>9} {'speedup':>8} {'size KiB':>9} {'gzip KiB':>9} {'gzip ms':>8}")
+
+    for name, payload in make_payloads(args.rows).items():
+        baseline = best_of(lambda: default.dumps(plain(payload)), args.repeat)
+        encoded = fast.dumps_bytes(payload)
+        faster = best_of(lambda: fast.dumps_bytes(payload), args.repeat)
+        compress = best_of(lambda: gzip.compress(encoded, compresslevel=JSON_GZIP_LEVEL, mtime=0), args.repeat)
+        assert json.loads(encoded) == json.loads(default.dumps(plain(payload)))
+        print(
+            f"{name:<12} {baseline * 1000:>11.1f} {faster * 1000:>9.1f} {baseline / faster:>7.1f}x"
+            f" {len(encoded) / 1024:>9.0f} {len(gzip.compress(encoded, JSON_GZIP_LEVEL)) / 1024:>9.0f}"
+            f" {compress * 1000:>8.1f}"
+        )
+    print("OK: both encoders produce the same documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Check and time the PostgreSQL mode against a local server:
+- bulk_upsert (COPY + ON CONFLICT) vs the former per-row ORM upsert
+- running balances computed in SQL (window function) vs pandas
+
+The target database is wiped (tables dropped and recreated), use a
+scratch one, e.g.:
+    createdb portfolio_bench
+    python benchmarks/postgres_ingest.py postgresql+psycopg://localhost/portfolio_bench
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.services.binance import performance  # noqa: E402
+from app.services.bulk import bulk_upsert  # noqa: E402
+from app.services.db import Base, Trade, create_db_engine  # noqa: E402
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT"]
+
+
+def make_rows(count: int, start_id: int = 0) -> list:
+    rows = []
+    for i in range(count):
+        price, qty = round(random.uniform(1, 60000), 2), round(random.uniform(-1, 1), 8)
+        rows.append({
+            "id": start_id + i,
+            "account_id": 1,
+            "orderId": start_id + i,
+            "symbol": random.choice(SYMBOLS),
+            "price": price,
+            "qty": qty,
+            # default scale of 8 decimals (the assets table is empty)
+            "qty_units": round(qty * 10 ** 8),
+            "quote_qty_units": round(qty * price * 10 ** 8),
+            "time": 1_600_000_000_000 + (start_id + i) * 1000,
+        })
+    return rows
+
+
+def timed(label: str, fn) -> None:
+    started = time.perf_counter()
+    fn()
+    print(f"{label:<40} {time.perf_counter() - started:>8.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", nargs="?", default=os.getenv("PG_TEST_URL"), help="PostgreSQL URL (or PG_TEST_URL)")
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+    if not args.url or not args.url.startswith("postgresql"):
+        parser.error("a postgresql:// URL is required")
+
+    engine = create_db_engine(args.url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    rows = make_rows(args.rows)
+
+    def orm_upsert():
+        with Session() as session:
+            for row in rows:
+                record = session.get(Trade, row["id"])
+                if record:
+                    for key, value in row.items():
+                        setattr(record, key, value)
+                else:
+                    session.add(Trade(**row))
+            session.commit()
+
+    def copy_upsert(batch):
+        with Session() as session:
+            bulk_upsert(session, Trade, batch)
+            session.commit()
+
+    timed(f"ORM upsert, {args.rows} new rows", orm_upsert)
+    with Session() as session:
+        session.query(Trade).delete()
+        session.commit()
+    timed(f"COPY upsert, {args.rows} new rows", lambda: copy_upsert(rows))
+    for row in rows:
+        for key in ("qty", "qty_units", "quote_qty_units"):
+            row[key] = -row[key]
+    timed(f"COPY upsert, {args.rows} updated rows", lambda: copy_upsert(rows))
+
+    with Session() as session:
+        assert session.query(Trade).count() == args.rows
+        assert session.get(Trade, 0).qty == rows[0]["qty"]
+
+        expected = {}
+        for row in rows:
+            base, quote = row["symbol"][:-4], row["symbol"][-4:]
+            expected[base] = expected.get(base, 0) + row["qty_units"]
+            expected[quote] = expected.get(quote, 0) - row["quote_qty_units"]
+
+        sql_balances = {}
+
+        def scan():
+            for _, asset, balance in performance._running_balances(session):
+                sql_balances[asset] = balance
+
+        timed("running balances (SQL window, streamed)", scan)
+        # fixed-point sums are exact: only the final float conversion may differ
+        for asset, units in expected.items():
+            assert sql_balances[asset] == units / 10 ** 8, asset
+    print("OK: upserted rows and SQL running balances match")
+
+
+if __name__ == "__main__":
+    main()
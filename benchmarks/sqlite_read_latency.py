@@ -0,0 +1,119 @@
+"""
+Dashboard read latency while a heavy sync is writing, default SQLite
+connection vs the tuned profile of app.services.db (WAL, pragmas,
+single writer queue).
+
+Usage:
+    python benchmarks/sqlite_read_latency.py [--rows 200000] [--batch 500]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.services.db import Base, Trade, WriteQueue, create_db_engine  # noqa: E402
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "ETHBTC"]
+
+
+def make_trades(start_id: int, count: int) -> list:
+    return [
+        Trade(
+            id=start_id + i,
+            account_id=1 + i % 4,
+            orderId=start_id + i,
+            symbol=random.choice(SYMBOLS),
+            price=random.uniform(1, 60000),
+            qty=random.uniform(-1, 1),
+            time=1_600_000_000_000 + (start_id + i) * 1000,
+        )
+        for i in range(count)
+    ]
+
+
+def run(tuned: bool, rows: int, batch: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}", tuned=tuned)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    queue = WriteQueue(Session) if tuned else None
+
+    # Existing history for the readers to aggregate
+    with Session() as session:
+        session.add_all(make_trades(0, 20_000))
+        session.commit()
+
+    done = threading.Event()
+    latencies, errors = [], 0
+
+    def writer():
+        next_id = 20_000
+        while next_id < 20_000 + rows:
+            trades = make_trades(next_id, batch)
+            next_id += batch
+            if queue is not None:
+                queue.run(lambda session: session.add_all(trades))
+            else:
+                with Session() as session:
+                    session.add_all(trades)
+                    session.commit()
+        done.set()
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        t0 = time.perf_counter()
+        try:
+            with Session() as session:
+                session.query(Trade.symbol, func.sum(Trade.qty * Trade.price)).filter(
+                    Trade.account_id == random.randint(1, 4)
+                ).group_by(Trade.symbol).all()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        except OperationalError:
+            errors += 1
+    thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else float("nan")
+    return {
+        "reads": len(latencies),
+        "errors": errors,
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": latencies[-1] if latencies else float("nan"),
+        "mean": statistics.fmean(latencies) if latencies else float("nan"),
+        "ingest_rows_per_s": rows / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="rows ingested during the measurement")
+    parser.add_argument("--batch", type=int, default=500, help="rows per write transaction")
+    args = parser.parse_args()
+
+    print(f"{'profile':>8} {'reads':>7} {'locked':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'ingest rows/s':>14}")
+    for tuned in (False, True):
+        r = run(tuned, args.rows, args.batch)
+        print(f"{'tuned' if tuned else 'default':>8} {r['reads']:>7} {r['errors']:>7} {r['p50']:>8.2f} "
+              f"{r['p95']:>8.2f} {r['p99']:>8.2f} {r['max']:>8.2f} {r['ingest_rows_per_s']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
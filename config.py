@@ -22,4 +22,14 @@ class Config:
         'DATABASE_URL',
         f"sqlite:///{os.path.join(basedir, DATABASE_NAME)}"
     )
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Live price feed: "binance" (WebSocket streams, needs websocket-client),
+    # "local" (offline stand-in for tests) or empty to poll REST only
+    PRICE_STREAM = os.getenv('PRICE_STREAM', '').lower()
+
+    # Service settings (REPORTING_CURRENCY, BINANCE_ACCOUNTS_FILE,
+    # SYNC_WORKERS, COST_BASIS_METHOD, CHART_*, ANALYTICS_*, BREAKER_*,
+    # JOB_*, ...) are environment variables read by the service modules
+    # themselves (see the constants at the top of each module), so they
+    # also apply to CLI jobs and worker processes outside of the app.
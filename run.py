@@ -6,15 +6,10 @@ load_dotenv()
 
 # Importer l'usine à application
 from app import create_app
-# Importer le blueprint Binance (au cas où create_app ne l'enregistre pas automatiquement)
-from app.routes.binance_routes import bp as binance_bp
 
 # Créer l'application
 app = create_app()
 
-# Enregistrer le blueprint Binance sous le préfixe /api/binance
-app.register_blueprint(binance_bp, url_prefix="/api/binance")
-
 if __name__ == "__main__":
     # Mode debug si FLASK_DEBUG est défini à true dans l'environnement
     debug = os.getenv("FLASK_DEBUG", "true").lower() in ("1", "true", "yes")
@@ -0,0 +1,14 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+# Settings are read from the environment at import time: point the store
+# and the caches at a scratch directory before any app module is imported
+_scratch = tempfile.mkdtemp(prefix="portfolio-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'portfolio.db')}")
+os.environ.setdefault("CACHE_DIR", os.path.join(_scratch, "cache"))
+os.environ.setdefault("ANALYTICS_CACHE_DIR", os.path.join(_scratch, "analytics"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+# tests/test_amounts.py
+
+from decimal import Decimal
+
+import pytest
+
+from app.services.amounts import format_amount, format_units, to_units, units_to_float
+
+
+@pytest.mark.parametrize("value, decimals, units", [
+    ("0.015", 8, 1_500_000),
+    ("1", 0, 1),
+    ("-2.5", 2, -250),
+    (Decimal("0.00000001"), 8, 1),
+    (7, 3, 7000),
+])
+def test_to_units_is_exact(value, decimals, units):
+    assert to_units(value, decimals) == units
+
+
+def test_to_units_uses_the_shortest_float_repr():
+    # 0.1 + 0.2 == 0.30000000000000004: the stray digits are below the scale
+    assert to_units(0.1, 8) == 10_000_000
+    assert to_units(0.1 + 0.2, 8) == 30_000_000
+
+
+@pytest.mark.parametrize("value, units", [
+    # sub-unit remainders round half to even
+    ("0.000000005", 0),
+    ("0.000000015", 2),
+    ("0.000000025", 2),
+    ("0.0000000251", 3),
+    ("-0.000000015", -2),
+])
+def test_to_units_rounds_sub_unit_amounts_half_even(value, units):
+    assert to_units(value, 8) == units
+
+
+@pytest.mark.parametrize("units, decimals, text", [
+    (1_500_000, 8, "0.01500000"),
+    (-5, 8, "-0.00000005"),
+    (0, 8, "0.00000000"),
+    (123, 0, "123"),
+    (-123, 0, "-123"),
+    (10 ** 20, 2, "1000000000000000000.00"),
+])
+def test_format_units(units, decimals, text):
+    assert format_units(units, decimals) == text
+
+
+@pytest.mark.parametrize("text", ["0.00000001", "-12.34567890", "98765432.10000000"])
+def test_format_units_round_trips(text):
+    assert format_units(to_units(text, 8), 8) == text
+
+
+def test_format_amount_rounds_floats_to_the_scale():
+    assert format_amount(6000.1500000001, 2) == "6000.15"
+    assert format_amount(0.125, 2) == "0.12"
+    assert format_amount(None, 8) is None
+
+
+def test_units_to_float():
+    assert units_to_float(1_500_000, 8) == pytest.approx(0.015)
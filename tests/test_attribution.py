@@ -0,0 +1,35 @@
+# tests/test_attribution.py
+
+import numpy as np
+import pytest
+
+from app.services.binance.attribution import correlation, rolling_covariance
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(42)
+    return rng.normal(scale=0.02, size=(120, 4))
+
+
+def test_rolling_covariance_matches_np_cov(returns):
+    window = 30
+    covariance = rolling_covariance(returns, window)
+    assert covariance.shape == (120, 4, 4)
+    assert np.isnan(covariance[: window - 1]).all()
+    for t in range(window - 1, len(returns)):
+        expected = np.cov(returns[t - window + 1: t + 1], rowvar=False)
+        np.testing.assert_allclose(covariance[t], expected, rtol=1e-9, atol=1e-15)
+
+
+def test_rolling_covariance_too_short(returns):
+    assert np.isnan(rolling_covariance(returns[:10], 30)).all()
+    assert np.isnan(rolling_covariance(returns, 1)).all()
+
+
+def test_correlation_is_nan_without_variance(returns):
+    returns = returns.copy()
+    returns[:, 3] = 0.0  # a stablecoin
+    corr = correlation(np.cov(returns, rowvar=False))
+    np.testing.assert_allclose(corr[:3, :3], np.corrcoef(returns[:, :3], rowvar=False))
+    assert np.isnan(corr[3]).all() and np.isnan(corr[:, 3]).all()
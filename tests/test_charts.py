@@ -0,0 +1,75 @@
+# tests/test_charts.py
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.binance.charts import lttb, select_range
+
+
+def test_lttb_keeps_everything_below_the_threshold():
+    x = np.arange(10)
+    assert lttb(x, x * 2.0, 10).tolist() == list(range(10))
+    assert lttb(x, x * 2.0, 50).tolist() == list(range(10))
+
+
+def test_lttb_returns_sorted_indices_with_both_ends():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000)
+    y = rng.normal(size=1000).cumsum()
+    indices = lttb(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_keeps_peaks_and_troughs():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[137], y[350] = 10.0, -10.0
+    indices = lttb(x, y, 20)
+    assert 137 in indices and 350 in indices
+
+
+def test_lttb_ignores_non_finite_values():
+    x = np.arange(200)
+    y = np.sin(x / 10.0)
+    y[50:60] = np.nan
+    y[120] = np.inf
+    indices = lttb(x, y, 30)
+    assert len(indices) == 30
+    assert (np.diff(indices) > 0).all()
+
+
+@pytest.fixture
+def daily():
+    index = pd.date_range("2023-06-01", "2024-03-31", freq="D")
+    return pd.Series(np.arange(len(index), dtype="float64"), index=index)
+
+
+def test_select_range_counts_back_from_the_last_point(daily):
+    week = select_range(daily, "1w")
+    assert week.index[0] == datetime(2024, 3, 24)
+    assert week.index[-1] == datetime(2024, 3, 31)
+
+
+def test_select_range_ytd_and_all(daily):
+    assert select_range(daily, "ytd").index[0] == datetime(2024, 1, 1)
+    assert select_range(daily, "all").equals(daily)
+
+
+def test_select_range_explicit_bounds_win(daily):
+    picked = select_range(daily, "1w", start=datetime(2023, 7, 1), end=datetime(2023, 7, 3))
+    assert list(picked.index) == list(pd.date_range("2023-07-01", "2023-07-03"))
+
+
+def test_select_range_empty_series():
+    empty = pd.Series([], index=pd.DatetimeIndex([]), dtype="float64")
+    assert select_range(empty, "1m").empty
+
+
+def test_select_range_rejects_unknown_ranges(daily):
+    with pytest.raises(ValueError):
+        select_range(daily, "2w")
@@ -0,0 +1,75 @@
+# tests/test_lots.py
+
+import pytest
+
+from app.services.binance.lots import LotBook
+
+BTC = 10 ** 8  # one BTC in units (8 decimals)
+
+
+def lots_of(book, asset="BTC"):
+    return [tuple(lot) for lot in book.lots.get(asset, ())]
+
+
+def test_fifo_disposes_oldest_lots_first():
+    book = LotBook("fifo")
+    book.acquire("BTC", BTC, 100.0)
+    book.acquire("BTC", BTC, 200.0)
+    realized = book.dispose("BTC", BTC + BTC // 2, 300.0)
+    assert realized == pytest.approx(200.0 + 50.0)
+    assert lots_of(book) == [(BTC // 2, 200.0)]
+
+
+def test_lifo_disposes_newest_lots_first():
+    book = LotBook("lifo")
+    book.acquire("BTC", BTC, 100.0)
+    book.acquire("BTC", BTC, 200.0)
+    realized = book.dispose("BTC", BTC + BTC // 2, 300.0)
+    assert realized == pytest.approx(100.0 + 100.0)
+    assert lots_of(book) == [(BTC // 2, 100.0)]
+
+
+def test_average_keeps_one_reaveraged_lot():
+    book = LotBook("average")
+    book.acquire("BTC", BTC, 100.0)
+    book.acquire("BTC", 3 * BTC, 200.0)
+    assert lots_of(book) == [(4 * BTC, 175.0)]
+    assert book.dispose("BTC", 2 * BTC, 200.0) == pytest.approx(50.0)
+    assert lots_of(book) == [(2 * BTC, 175.0)]
+
+
+def test_overselling_realizes_only_the_open_lots():
+    book = LotBook("fifo")
+    book.acquire("BTC", BTC, 100.0)
+    # half a BTC more than the lots hold (e.g. deposited coins): no cost basis
+    realized = book.dispose("BTC", BTC + BTC // 2, 150.0)
+    assert realized == pytest.approx(50.0)
+    assert lots_of(book) == []
+    position = book.position("BTC", price=150.0)
+    assert position["lot_quantity"] == 0.0
+    assert position["cost_basis"] == 0.0
+    assert position["avg_entry_price"] is None
+    assert position["realized_pnl"] == pytest.approx(50.0)
+    # a later buy opens a fresh lot, untouched by the oversold quantity
+    book.acquire("BTC", BTC, 120.0)
+    assert lots_of(book) == [(BTC, 120.0)]
+
+
+def test_selling_without_lots_realizes_nothing():
+    book = LotBook("lifo")
+    assert book.dispose("ETH", BTC, 2000.0) == 0.0
+    assert book.assets() == set()
+
+
+def test_position_uses_the_asset_scale():
+    book = LotBook("fifo", decimals={"USDC": 6})
+    book.acquire("USDC", 2_500_000, 1.0)
+    position = book.position("USDC", price=1.01)
+    assert position["lot_quantity"] == pytest.approx(2.5)
+    assert position["cost_basis"] == pytest.approx(2.5)
+    assert position["unrealized_pnl"] == pytest.approx(0.025)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        LotBook("hifo")
@@ -0,0 +1,115 @@
+# tests/test_resilience.py
+
+import threading
+
+import pytest
+
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, CircuitOpenError, SingleFlight
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def failing():
+    raise RuntimeError("upstream down")
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(failing)
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = open_breaker(clock)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never called")
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    assert breaker.state == "half-open"
+    assert breaker.before_call() is True
+    # the probe is in flight: everybody else still fails fast
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    with pytest.raises(RuntimeError):
+        breaker.call(failing)
+    assert breaker.state == "open"
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_released_probe_can_be_claimed_again(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    assert breaker.before_call() is True
+    breaker.release_probe()
+    assert breaker.before_call() is True
+
+
+def test_lost_probe_is_replaced_after_the_timeout(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    assert breaker.before_call() is True
+    clock[0] += 30
+    assert breaker.before_call() is True
+
+
+def test_non_failures_do_not_open_the_circuit(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    with pytest.raises(ValueError):
+        breaker.call(lambda: int("x"), is_failure=lambda e: not isinstance(e, ValueError))
+    assert breaker.state == "closed"
+
+
+def test_single_flight_coalesces_concurrent_fetches():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_fetch(keys):
+        calls.append(set(keys))
+        started.set()
+        release.wait(5)
+        return {key: key * 2 for key in keys}
+
+    results = {}
+    leader = threading.Thread(target=lambda: results.update(first=flight.do_many([1, 2], slow_fetch)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.update(second=flight.do_many([2, 3], slow_fetch)))
+    follower.start()
+    # the follower only fetches the key nobody is fetching
+    while len(calls) < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert calls == [{1, 2}, {3}]
+    assert results == {"first": {1: 2, 2: 4}, "second": {2: 4, 3: 6}}
+
+
+def test_single_flight_shares_errors_and_forgets_them():
+    flight = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do("key", failing)
+    assert flight.do("key", lambda: 42) == 42